@@ -33,11 +33,27 @@ import babelsubs.parsers as parsers
 from babelsubs.parsers.base import ParserList, SubtitleParserError
 from babelsubs.generators.base import GeneratorList
 import babelsubs.generators as generators
+from babelsubs.compact import ExtractedSubtitles
+from babelsubs import stats as _stats
 
 def get_available_formats():
     return sorted(list(set(ParserList.keys()).intersection(set(GeneratorList.keys()))))
 
-def load_from(sub_from, type=None, language=None):
+def load_from(sub_from, type=None, language=None, workers=None, stats=None):
+    """
+    Returns a parser for sub_from, with its subtitles already parsed.
+    If stats (a babelsubs.stats.Stats) is given, the work is collected
+    on it.
+    """
+    with _stats.using(stats):
+        parser, sub_from = _get_parser(sub_from, type)
+        return parser.parse(sub_from, language=language, workers=workers)
+
+def _get_parser(sub_from, type):
+    """
+    Returns the parser class for sub_from and its contents, read if it's a
+    file and decoded (or encoded) as that parser expects.
+    """
     if hasattr(sub_from, 'read'):
         if type is None and not getattr(sub_from, 'name', None):
             raise TypeError("Couldn't find out the type by myself. Care to specify?")
@@ -63,30 +79,110 @@ def load_from(sub_from, type=None, language=None):
 
     no_unicode = getattr(parser, 'no_unicode', False)
 
-    if not isinstance(sub_from, unicode):
-        if not no_unicode:
-            sub_from = sub_from.decode("utf-8")
-    else:
-        if no_unicode:
-            sub_from = sub_from.encode("utf-8")
+    with _stats.stage('decode'):
+        if not isinstance(sub_from, unicode):
+            _stats.count('input_bytes', len(sub_from))
+            if not no_unicode:
+                sub_from = sub_from.decode("utf-8")
+        else:
+            _stats.count('input_chars', len(sub_from))
+            if no_unicode:
+                sub_from = sub_from.encode("utf-8")
 
-    return parser.parse(sub_from, language=language)
+    return parser, sub_from
 
-def load_from_file(filename, type=None, language=None):
+def load_from_file(filename, type=None, language=None, stats=None):
     if not os.path.isfile(filename):
         raise ValueError('Invalid filename "%s".' % filename)
 
     with open(filename) as f:
-        return load_from(f, type, language)
+        return load_from(f, type, language, stats=stats)
+
 
+def _generate(Generator, subs, language):
+    with _stats.stage('generate'):
+        output = Generator.generate(subs, language=language)
+    _stats.count('output_chars', len(output))
+    return output
 
-def to(subs, type, language=None):
+def to(subs, type, language=None, stats=None):
     Generator = generators.discover(type)
 
     if not Generator:
         raise TypeError("Could not find a type %s" % type)
 
-    return Generator.generate(subs, language=language)
+    with _stats.using(stats):
+        return _generate(Generator, subs, language)
+
+def to_file(subs, type, path_or_file, language=None, encoding='utf-8', stats=None):
+    """
+    Generates subs as type straight into a file, given either as a path or
+    an open file object. The output is encoded and written as it's
+    generated, instead of being built as a whole first.
+    """
+    Generator = generators.discover(type)
 
+    if not Generator:
+        raise TypeError("Could not find a type %s" % type)
 
-__all__ = ['load_from', 'load_from_file', 'to', 'get_available_formats']
+    generator = Generator(subs, language=language)
+    with _stats.using(stats), _stats.stage('generate'):
+        if hasattr(path_or_file, 'write'):
+            generator.write_to(path_or_file, encoding=encoding)
+        else:
+            with open(path_or_file, 'wb') as f:
+                generator.write_to(f, encoding=encoding)
+
+def convert(sub_from, from_type, to_type, language=None, use_subtitle_set=False,
+            workers=None, stats=None):
+    """
+    Converts subtitles from one format to another, the same as
+    load_from(sub_from, from_type, language).to(to_type) would.
+
+    Unless one of the formats is DFXP (or use_subtitle_set is True) the
+    subtitles never go through a SubtitleSet, they're kept on a
+    CompactSubtitleSet, which skips building and walking the TTML tree.
+
+    Big inputs can be parsed on several processes, see BaseTextParser.parse.
+    """
+    Generator = generators.discover(to_type)
+
+    if not Generator:
+        raise TypeError("Could not find a type %s" % to_type)
+
+    with _stats.using(stats):
+        Parser, sub_from = _get_parser(sub_from, from_type)
+        parser = Parser.parse(sub_from, language=language, eager_parse=False,
+                              workers=workers)
+        if (use_subtitle_set or Parser.uses_subtitle_set or
+                Generator.uses_subtitle_set):
+            subs = parser.to_internal()
+        else:
+            subs = parser.to_compact()
+        return _generate(Generator, subs, language)
+
+def to_many(subs, types, language=None):
+    """
+    Generates several formats at once, returns a dict of type -> output.
+
+    The subtitles are extracted from the set only once and every generator
+    renders from that, which is a lot cheaper than calling to() for each.
+    """
+    generator_classes = []
+    for type in types:
+        Generator = generators.discover(type)
+        if not Generator:
+            raise TypeError("Could not find a type %s" % type)
+        generator_classes.append((type, Generator))
+
+    extracted = ExtractedSubtitles(subs)
+    return dict((type, _generate(Generator, extracted, language))
+                for type, Generator in generator_classes)
+
+# needs the functions above
+from babelsubs.batch import convert_many
+from babelsubs.jobs import convert_incremental
+
+
+__all__ = ['load_from', 'load_from_file', 'to', 'to_file', 'to_many', 'convert',
+           'convert_many', 'convert_incremental', 'get_available_formats']
@@ -0,0 +1,5 @@
+import sys
+
+from babelsubs.cli import main
+
+sys.exit(main())
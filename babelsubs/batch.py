@@ -0,0 +1,184 @@
+"""
+Converting many files at once, spread over a pool of worker processes.
+
+    for result in convert_many(jobs, workers=4):
+        if result.error:
+            ...
+
+Each job is a ConversionJob (or a tuple with its fields, in order). The
+input file's type is guessed from its extension unless from_type is
+given. If output_path is given the result is written there, else it's
+sent back on the result.
+
+Results come back as soon as each job is done, not in the order of the
+jobs. Parsing errors don't stop the batch, they are returned on the
+result (as a SubtitleParserError) instead.
+
+Parsing DFXP is mostly lxml work, which releases the GIL, so a batch of
+DFXP files can use threads=True to run on a thread pool instead.
+"""
+
+import time
+import hashlib
+from collections import namedtuple
+
+import babelsubs
+from babelsubs.parsers.base import ParserList, SubtitleParserError
+from babelsubs.generators.base import GeneratorList
+
+ConversionJob = namedtuple("ConversionJob",
+                           ['path', 'to_type', 'from_type', 'output_path', 'language'])
+ConversionJob.__new__.__defaults__ = (None, None, None)
+
+# hash is the sha1 hex digest of the input that was converted
+ConversionResult = namedtuple("ConversionResult",
+                              ['job', 'output', 'error', 'size', 'seconds', 'hash'])
+ConversionResult.__new__.__defaults__ = (None, )
+
+
+def _from_type(job):
+    return job.from_type or job.path.split(".")[-1]
+
+
+def _init_worker(from_types=None, to_types=None):
+    """
+    Imports the parsers and generators for the given types (every one if
+    they're None) once per worker, not on its first job.
+    """
+    for registry, types in [(ParserList, from_types), (GeneratorList, to_types)]:
+        for type in (registry.keys() if types is None else types):
+            try:
+                registry.get(type)
+            except ImportError:
+                # the jobs that need it will fail with this error, not
+                # the whole pool
+                pass
+
+
+def _picklable(error):
+    """
+    Errors travel back from the workers pickled, the way multiprocessing
+    does it, but the errors they carry, on original_error or args, might
+    not survive that (lxml's don't), so keep their repr instead.
+    """
+    import cPickle
+    try:
+        cPickle.loads(cPickle.dumps(error, 2))
+        return error
+    except Exception:
+        args = [arg if isinstance(arg, basestring) else repr(arg)
+                for arg in error.args]
+        original_error = error.original_error
+        if original_error is not None:
+            original_error = repr(original_error)
+        return SubtitleParserError(*args, original_error=original_error)
+
+
+def run_job(job):
+    """Runs one ConversionJob, returning its ConversionResult."""
+    job = ConversionJob(*job)
+    started = time.time()
+    output = error = hash = None
+    size = 0
+    try:
+        with open(job.path, 'rb') as f:
+            data = f.read()
+        size = len(data)
+        hash = hashlib.sha1(data).hexdigest()
+        from_type = _from_type(job)
+        output = babelsubs.convert(data, from_type, job.to_type, job.language)
+        if job.output_path:
+            with open(job.output_path, 'wb') as f:
+                f.write(output.encode('utf-8'))
+            output = None
+    except Exception as e:
+        if not isinstance(e, SubtitleParserError):
+            e = SubtitleParserError(original_error=e)
+        error = _picklable(e)
+    return ConversionResult(job, output, error, size, time.time() - started, hash)
+
+
+class BatchConversion(object):
+    """
+    Iterating over it runs the jobs and yields their results. Meanwhile it
+    counts what's done, see throughput.
+    """
+
+    def __init__(self, jobs, workers=None, chunksize=1, threads=False):
+        # multiprocessing is only imported when a batch is run, it's not
+        # cheap and most uses of babelsubs never need it
+        import multiprocessing
+        self.jobs = jobs
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunksize = chunksize
+        self.threads = threads
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = None
+        self.finished = None
+
+    def _get_pool(self):
+        import multiprocessing
+        from multiprocessing.pool import ThreadPool
+        if isinstance(self.jobs, (list, tuple)):
+            jobs = [ConversionJob(*job) for job in self.jobs]
+            types = (sorted(set(_from_type(job) for job in jobs)),
+                     sorted(set(job.to_type for job in jobs)))
+        else:
+            # we can't look at the jobs before running them
+            types = (None, None)
+        if self.threads:
+            return ThreadPool(self.workers, _init_worker, types)
+        return multiprocessing.Pool(self.workers, _init_worker, types)
+
+    def __iter__(self):
+        self.started = time.time()
+        if self.workers == 1:
+            for result in (run_job(job) for job in self.jobs):
+                yield self._count(result)
+        else:
+            pool = self._get_pool()
+            done = False
+            try:
+                for result in pool.imap_unordered(run_job, self.jobs, self.chunksize):
+                    yield self._count(result)
+                done = True
+            finally:
+                # if we were stopped halfway, don't wait for the rest
+                if done:
+                    pool.close()
+                else:
+                    pool.terminate()
+                pool.join()
+        self.finished = time.time()
+
+    def _count(self, result):
+        if result.error is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.bytes += result.size
+        return result
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def throughput(self):
+        """Returns the files and input bytes done per second so far."""
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0, 0.0
+        return (self.succeeded + self.failed) / elapsed, self.bytes / elapsed
+
+
+def convert_many(jobs, workers=None, chunksize=1, threads=False):
+    """
+    Returns a BatchConversion that runs jobs over workers processes (one
+    per cpu by default), sending them chunksize jobs at a time.
+    """
+    return BatchConversion(jobs, workers, chunksize, threads)
@@ -0,0 +1,209 @@
+"""
+The babelsubs command:
+
+    babelsubs convert [-f FROM] [-t TO] [-o OUTPUT] [INPUT]
+    babelsubs batch -t TO [-j WORKERS] [-g GLOB] [-m MANIFEST] SOURCE_DIR TARGET_DIR
+    babelsubs info [-f FROM] INPUT
+
+convert reads from stdin and writes to stdout when no files are given.
+SRT, SBV, SSA and DFXP input is read as it comes and every output format is
+written as it's generated, so it can sit in a pipeline on large files.
+DFXP to DFXP goes through a SubtitleSet, to keep the document as it was.
+"""
+
+import os
+import sys
+import fnmatch
+import argparse
+
+import babelsubs
+from babelsubs import parsers, generators
+from babelsubs.batch import ConversionJob
+from babelsubs.compact import CompactSubtitleSet
+from babelsubs.parsers.base import SubtitleParserError
+
+
+def _type_from_name(file_name):
+    if file_name and file_name != '-' and '.' in file_name:
+        extension = file_name.rsplit('.', 1)[-1].lower()
+        if extension in babelsubs.get_available_formats():
+            return extension
+    return None
+
+
+def _load(fileobj, from_type, language, to_type=None):
+    """
+    Returns a CompactSubtitleSet with the subtitles in fileobj, read
+    incrementally if the parser can, or a SubtitleSet if both from_type
+    and to_type use one (i.e. DFXP to DFXP).
+    """
+    Parser = parsers.discover(from_type)
+    Generator = generators.discover(to_type) if to_type else None
+    use_subtitle_set = (Parser.uses_subtitle_set and Generator is not None and
+                        Generator.uses_subtitle_set)
+    if hasattr(Parser, 'iter_cues') and not use_subtitle_set:
+        try:
+            subs = CompactSubtitleSet.from_list(language, Parser.iter_cues(fileobj, language))
+            if not len(subs):
+                raise ValueError("No subs found")
+        except Exception as e:
+            raise SubtitleParserError(original_error=e)
+        return subs
+    Parser, text = babelsubs._get_parser(fileobj.read(), from_type)
+    parser = Parser.parse(text, language, eager_parse=False)
+    if Parser.uses_subtitle_set:
+        return parser.to_internal()
+    return parser.to_compact()
+
+
+def convert(args, stdin, stdout):
+    from_type = args.from_type or _type_from_name(args.input)
+    to_type = args.to_type or _type_from_name(args.output)
+    if not from_type:
+        raise SystemExit("Can't tell the input format, use --from")
+    if not to_type:
+        raise SystemExit("Can't tell the output format, use --to")
+
+    if args.input == '-':
+        subs = _load(stdin, from_type, args.language, to_type)
+    else:
+        with open(args.input, 'rb') as f:
+            subs = _load(f, from_type, args.language, to_type)
+
+    if args.output == '-':
+        babelsubs.to_file(subs, to_type, stdout, language=args.language)
+    else:
+        babelsubs.to_file(subs, to_type, args.output, language=args.language)
+    return 0
+
+
+def _find_jobs(args):
+    patterns = args.glob or ['*.%s' % t for t in babelsubs.get_available_formats()]
+    for directory, _, file_names in os.walk(args.source):
+        for file_name in sorted(file_names):
+            if not any(fnmatch.fnmatch(file_name, p) for p in patterns):
+                continue
+            path = os.path.join(directory, file_name)
+            target = os.path.join(args.target, os.path.relpath(path, args.source))
+            target = '%s.%s' % (os.path.splitext(target)[0], args.to_type)
+            yield ConversionJob(path, args.to_type, args.from_type, target,
+                                args.language)
+
+
+def batch(args, stdin, stdout, stderr):
+    jobs = list(_find_jobs(args))
+    for job in jobs:
+        directory = os.path.dirname(job.output_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    if args.manifest:
+        incremental = babelsubs.convert_incremental(jobs, args.manifest,
+                                                    workers=args.workers,
+                                                    chunksize=args.chunksize,
+                                                    threads=args.threads)
+        results = iter(incremental)
+    else:
+        conversion = babelsubs.convert_many(jobs, workers=args.workers,
+                                            chunksize=args.chunksize,
+                                            threads=args.threads)
+        results = iter(conversion)
+
+    failures = []
+    for i, result in enumerate(results):
+        if result.error is not None:
+            failures.append(result)
+        if not args.quiet:
+            # unchanged jobs are all skipped before the first result
+            total = len(jobs) - (incremental.skipped if args.manifest else 0)
+            stderr.write("[%s/%s] %s %s\n" % (
+                i + 1, total, 'FAILED' if result.error else 'ok', result.job.path))
+
+    if args.manifest:
+        conversion = incremental.batch
+        stdout.write("%s unchanged, skipped\n" % incremental.skipped)
+    files_per_second, bytes_per_second = conversion.throughput
+    stdout.write("%s converted, %s failed in %.1fs (%.1f files/s, %.1f KB/s)\n" % (
+        conversion.succeeded, conversion.failed, conversion.elapsed,
+        files_per_second, bytes_per_second / 1024))
+    for result in failures:
+        error = result.error
+        stdout.write("failed: %s: %r\n" % (result.job.path,
+                                           error.original_error or error))
+    return 1 if failures else 0
+
+
+def info(args, stdin, stdout):
+    from_type = args.from_type or _type_from_name(args.input)
+    if not from_type:
+        raise SystemExit("Can't tell the input format, use --from")
+    with open(args.input, 'rb') as f:
+        subs = _load(f, from_type, None)
+
+    items = subs.subtitle_items()
+    starts = [item.start_time for item in items if item.start_time is not None]
+    ends = [item.end_time for item in items if item.end_time is not None]
+    duration = max(ends) - min(starts) if starts and ends else 0
+    stdout.write("format: %s\n" % from_type)
+    stdout.write("subtitles: %s\n" % len(items))
+    stdout.write("synced: %s\n" % ('yes' if subs.fully_synced else 'no'))
+    stdout.write("start: %s\n" % (min(starts) if starts else '-'))
+    stdout.write("end: %s\n" % (max(ends) if ends else '-'))
+    stdout.write("duration: %.3fs\n" % (duration / 1000.0))
+    return 0
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(
+        prog='babelsubs', description="Converts subtitles between formats.")
+    commands = parser.add_subparsers(dest='command')
+
+    convert_parser = commands.add_parser('convert', help="convert one file")
+    convert_parser.add_argument('input', nargs='?', default='-')
+    convert_parser.add_argument('-o', '--output', default='-')
+    convert_parser.add_argument('-f', '--from', dest='from_type')
+    convert_parser.add_argument('-t', '--to', dest='to_type')
+    convert_parser.add_argument('-l', '--language')
+
+    batch_parser = commands.add_parser('batch', help="convert a directory tree")
+    batch_parser.add_argument('source')
+    batch_parser.add_argument('target')
+    batch_parser.add_argument('-t', '--to', dest='to_type', required=True)
+    batch_parser.add_argument('-f', '--from', dest='from_type')
+    batch_parser.add_argument('-l', '--language')
+    batch_parser.add_argument('-g', '--glob', action='append',
+                              help="only convert matching file names, can be repeated")
+    batch_parser.add_argument('-j', '--workers', type=int)
+    batch_parser.add_argument('--chunksize', type=int, default=1)
+    batch_parser.add_argument('--threads', action='store_true',
+                              help="use threads instead of processes")
+    batch_parser.add_argument('-m', '--manifest',
+                              help="SQLite file recording what was converted, "
+                                   "unchanged files are skipped on later runs")
+    batch_parser.add_argument('-q', '--quiet', action='store_true')
+
+    info_parser = commands.add_parser('info', help="describe a file")
+    info_parser.add_argument('input')
+    info_parser.add_argument('-f', '--from', dest='from_type')
+    return parser
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    args = get_argument_parser().parse_args(argv)
+    try:
+        if args.command == 'convert':
+            return convert(args, stdin, stdout)
+        elif args.command == 'batch':
+            return batch(args, stdin, stdout, stderr)
+        else:
+            return info(args, stdin, stdout)
+    except SubtitleParserError as e:
+        stderr.write("babelsubs: can't parse the input: %r\n" % (e.original_error or e))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
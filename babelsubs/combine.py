@@ -0,0 +1,74 @@
+"""
+Stitching subtitle sets together, see SubtitleSet.concat and merge.
+
+Both work from the sets' extracted cues, so the markup is kept as is,
+and produce the subtitle tuples append_subtitles takes (with escape=False)
+lazily, one at a time.
+"""
+
+from heapq import merge as heap_merge
+from itertools import izip_longest
+
+from babelsubs import markup
+from babelsubs.timeindex import is_synced_time
+
+
+def _offset(ms, offset):
+    # unsynced times, None or the sentinel, are left alone
+    return ms + offset if is_synced_time(ms) else ms
+
+
+def _to_subtitle(from_ms, to_ms, parsed, new_paragraph):
+    return (from_ms, to_ms, markup.markup_to_content(parsed),
+            {'new_paragraph': new_paragraph})
+
+
+def _no_leading_paragraph(subtitles):
+    """
+    Clears the new paragraph flag of the first subtitle, which starts one
+    anyway: set, it would leave the new set's initial <div> empty.
+    """
+    for i, subtitle in enumerate(subtitles):
+        if i == 0:
+            subtitle[3]['new_paragraph'] = False
+        yield subtitle
+
+
+def concat_cues(parts, offsets=None):
+    """
+    Yields the subtitles of each part in turn, with that part's offset (ms)
+    added to its times. Every part starts a new paragraph.
+    """
+    return _no_leading_paragraph(_concat_cues(parts, offsets))
+
+
+def _concat_cues(parts, offsets):
+    for part, offset in izip_longest(parts, offsets or []):
+        if part is None:
+            raise ValueError("More offsets than parts")
+        offset = offset or 0
+        for i, (from_ms, to_ms, parsed, new_paragraph) in enumerate(part._extract_cues()):
+            yield _to_subtitle(_offset(from_ms, offset), _offset(to_ms, offset),
+                               parsed, new_paragraph or i == 0)
+
+
+def _sorted_cues(set_index, subtitle_set):
+    """
+    Returns (sort key, cue) for the cues of a set, by start time. Unsynced
+    ones go after all the synced ones, in document order.
+    """
+    keyed = [((cue[0] is None, cue[0], set_index, i), cue)
+             for i, cue in enumerate(subtitle_set._extract_cues())]
+    # sets are usually sorted already, which makes this linear
+    keyed.sort()
+    return keyed
+
+
+def merge_cues(sets):
+    """
+    Yields the subtitles of all sets sorted by start time, with a k-way
+    merge. Subtitles starting together keep the order of the sets, and each
+    one keeps its own paragraph flag.
+    """
+    cues = heap_merge(*[_sorted_cues(i, s) for i, s in enumerate(sets)])
+    return _no_leading_paragraph(_to_subtitle(*cue) for key, cue in cues)
@@ -0,0 +1,339 @@
+"""
+A compact, column oriented alternative to SubtitleSet.
+
+A SubtitleSet is a full lxml tree, which is what we want when editing or
+producing DFXP, but it's a lot of memory and work when all we do is read
+one text format and write another. The CompactSubtitleSet keeps the same
+data in columns:
+
+    - start and end times on arrays of machine integers (-1 means unsynced)
+    - the markup of each subtitle, as the xml string we'd put in the <p>
+    - the new paragraph flags as a bitmap
+
+and only builds the TTML tree when it's needed, i.e. to_xml() or
+to_subtitle_set() are called.
+
+It quacks enough like a SubtitleSet for parsers, generators and diff().
+"""
+
+from array import array
+
+from babelsubs import markup, timecode, combine, stats
+from babelsubs.timeindex import TimeQueries, is_synced_time
+from babelsubs.markup import escape_xml
+from babelsubs.items import SubtitleLine, NEW_PARAGRAPH_META_KEY, mappings_key
+
+# array typecode for the time columns, 'l' is at least 32 bits, more
+# than enough for UNSYNCED_TIME_FULL
+TIME_TYPECODE = 'l'
+NO_TIME = -1
+
+
+class CompactSubtitleSet(TimeQueries):
+
+    def __init__(self, language_code, title=None, description=None):
+        self.language_code = language_code
+        self.title = title
+        self.description = description
+        self._starts = array(TIME_TYPECODE)
+        self._ends = array(TIME_TYPECODE)
+        self._texts = []
+        self._paragraphs = bytearray()
+        # text found after a </p> on the original document, which shows up
+        # on formatted output. Rare enough to keep apart: {index: tail}
+        self._tails = {}
+        # subtitle_items results per mappings, see _get_items
+        self._items_cache = {}
+        self._version = 0
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __nonzero__(self):
+        return bool(self._texts)
+
+    def __getitem__(self, key):
+        return self._get_items(None)[key]
+
+    def __iter__(self):
+        return iter(self._get_items(None))
+
+    def __eq__(self, other):
+        if type(self) == type(other):
+            return (self.language_code == other.language_code and
+                    self._starts == other._starts and
+                    self._ends == other._ends and
+                    self._texts == other._texts and
+                    self._paragraphs == other._paragraphs and
+                    self._tails == other._tails)
+        else:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def append_subtitle(self, from_ms, to_ms, content, new_paragraph=False,
+                        escape=True):
+        """Append a subtitle to the end of the list.
+
+        Same as SubtitleSet.append_subtitle, content is validated right away,
+        so bad markup fails here like it would on a SubtitleSet.
+        """
+        self.append_subtitles(
+            [(from_ms, to_ms, content, {'new_paragraph': new_paragraph})],
+            escape=escape)
+
+    def append_subtitles(self, subtitles, escape=True):
+        """
+        Append many subtitles, see SubtitleSet.append_subtitles. The dict
+        can also have the tail, the text after the </p> on the original
+        document (see DFXPParser.iter_cues), which SubtitleSet ignores.
+        """
+        for s in subtitles:
+            new_paragraph, item_escape, tail = False, escape, None
+            if len(s) > 3:
+                new_paragraph = s[3].get('new_paragraph', False)
+                item_escape = s[3].get('escape', escape)
+                tail = s[3].get('tail')
+            from_ms, to_ms, content = s[:3]
+            if item_escape:
+                content = escape_xml(content)
+            markup.parse_markup(content)
+            if tail and tail.strip():
+                self._tails[len(self._texts)] = tail
+            self._append(from_ms, to_ms, content, new_paragraph)
+        self._changed()
+
+    def _append(self, from_ms, to_ms, content, new_paragraph):
+        index = len(self._texts)
+        self._starts.append(NO_TIME if from_ms is None else int(from_ms))
+        self._ends.append(NO_TIME if to_ms is None else int(to_ms))
+        self._texts.append(content)
+        if index & 7 == 0:
+            self._paragraphs.append(0)
+        if new_paragraph:
+            self._paragraphs[index >> 3] |= 1 << (index & 7)
+
+    def _changed(self):
+        """
+        Must be called by every method that changes subtitles, so cached
+        subtitle_items are not used anymore.
+        """
+        self._version += 1
+
+    def _starts_paragraph(self, index):
+        """
+        Was the subtitle appended with new_paragraph? Note that the first
+        one always starts a paragraph, see is_new_paragraph.
+        """
+        return bool(self._paragraphs[index >> 3] & (1 << (index & 7)))
+
+    def is_new_paragraph(self, index):
+        return index == 0 or self._starts_paragraph(index)
+
+    def _get_time(self, column, index):
+        value = column[index]
+        return None if value == NO_TIME else value
+
+    def _get_markup(self, index):
+        parsed = markup.parse_markup(self._texts[index])
+        if index in self._tails:
+            parsed = parsed._replace(tail=self._tails[index])
+        return parsed
+
+    def _extract_cues(self, positions=None):
+        """See SubtitleSet._extract_cues"""
+        if positions is None:
+            positions = xrange(len(self))
+        return [(self._get_time(self._starts, i), self._get_time(self._ends, i),
+                 self._get_markup(i), self.is_new_paragraph(i))
+                for i in positions]
+
+    def _item(self, index, mappings=None):
+        return SubtitleLine(
+            self._get_time(self._starts, index),
+            self._get_time(self._ends, index),
+            markup.render(self._get_markup(index), mappings),
+            {NEW_PARAGRAPH_META_KEY: self.is_new_paragraph(index)})
+
+    def subtitle_items(self, mappings=None):
+        """
+        Return a list of (from_ms, to_ms, content, meta) tuples, exactly as
+        SubtitleSet.subtitle_items would, and cached the same way.
+        """
+        return list(self._get_items(mappings))
+
+    def _get_items(self, mappings):
+        key = mappings_key(mappings)
+        cached = self._items_cache.get(key)
+        if cached is not None and cached[0] == self._version:
+            stats.count('items_cache_hits')
+            return cached[1]
+        stats.count('items_cache_misses')
+        with stats.stage('items'):
+            result = [self._item(i, mappings) for i in xrange(len(self))]
+        self._items_cache[key] = (self._version, result)
+        return result
+
+    @property
+    def fully_synced(self):
+        return NO_TIME not in self._starts and NO_TIME not in self._ends
+
+    def update(self, subtitle_index, from_ms=None, to_ms=None):
+        """Updates the subtitle on index subtitle_index with the
+        new timing data. (in place)
+        """
+        if from_ms is not None:
+            self._starts[subtitle_index] = int(from_ms)
+        if to_ms is not None:
+            self._ends[subtitle_index] = int(to_ms)
+        self._changed()
+
+    def shift(self, offset_ms, start=None, end=None):
+        """See SubtitleSet.shift"""
+        self._retime(lambda t: max(0, int(t + offset_ms)), start, end)
+
+    def scale(self, factor, anchor_ms=0):
+        """See SubtitleSet.scale"""
+        self._retime(lambda t: max(0, int(round(anchor_ms + (t - anchor_ms) * factor))))
+
+    def remap(self, mapping):
+        """See SubtitleSet.remap"""
+        fn = timecode.mapping_function(mapping)
+        self._retime(lambda t: max(0, int(round(fn(t)))))
+
+    def _retime(self, fn, start=None, end=None):
+        """
+        Runs the synced times through fn, only those of subtitles beginning
+        in [start, end) if those are given, like SubtitleSet._retime.
+        """
+        starts, ends = self._starts, self._ends
+        limited = start is not None or end is not None
+        for i in xrange(len(self._texts)):
+            begin = self._get_time(starts, i)
+            synced = is_synced_time(begin)
+            if limited and not (synced and (start is None or begin >= start) and
+                                (end is None or begin < end)):
+                continue
+            if synced:
+                starts[i] = fn(begin)
+            finish = self._get_time(ends, i)
+            if is_synced_time(finish):
+                ends[i] = fn(finish)
+        self._changed()
+
+    @classmethod
+    def from_list(cls, language_code, subtitles, escape=False):
+        """Return a CompactSubtitleSet from a list of subtitle tuples.
+
+        See SubtitleSet.from_list
+        """
+        subs = cls(language_code)
+        subs.append_subtitles(subtitles, escape=escape)
+        return subs
+
+    @classmethod
+    def concat(cls, parts, offsets=None, language_code=None):
+        """Return a CompactSubtitleSet with the subtitles of all parts, one after the
+        other.
+
+        offsets are the ms to add to the times of each part, e.g. where
+        each part starts on the whole video. Each part starts a paragraph.
+        """
+        subs = cls(language_code or parts[0].language_code)
+        subs.append_subtitles(combine.concat_cues(parts, offsets), escape=False)
+        return subs
+
+    @classmethod
+    def merge(cls, sets, language_code=None):
+        """Return a CompactSubtitleSet with the subtitles of all sets, sorted by start
+        time, e.g. to mix captions with a sound effects track.
+
+        Unsynced subtitles go last.
+        """
+        subs = cls(language_code or sets[0].language_code)
+        subs.append_subtitles(combine.merge_cues(sets), escape=False)
+        return subs
+
+    @classmethod
+    def from_subtitle_set(cls, subtitle_set):
+        """Copies the subtitles of a SubtitleSet."""
+        subs = cls(subtitle_set.language_code)
+        # the elements are only read, get_subtitles would drop its cache
+        els = subtitle_set._els
+        begins = timecode.parse_time_expressions([el.get('begin') for el in els])
+        ends = timecode.parse_time_expressions([el.get('end') for el in els])
+        for i, el in enumerate(els):
+            parsed = markup.markup_from_element(el)
+            subs._append(begins[i], ends[i], markup.markup_to_content(parsed),
+                         i > 0 and el.getprevious() is None)
+            if parsed.tail and parsed.tail.strip():
+                subs._tails[i] = parsed.tail
+        subs._changed()
+        return subs
+
+    def to_subtitle_set(self):
+        """Builds the equivalent SubtitleSet."""
+        from babelsubs.storage import SubtitleSet
+        subs = SubtitleSet(self.language_code, title=self.title,
+                           description=self.description)
+        subs.append_subtitles([
+            (self._get_time(self._starts, i), self._get_time(self._ends, i),
+             self._texts[i], {'new_paragraph': self._starts_paragraph(i)})
+            for i in xrange(len(self))], escape=False)
+        return subs
+
+    def to_xml(self):
+        return self.to_subtitle_set().to_xml()
+
+
+class ExtractedSubtitles(object):
+    """
+    A read only snapshot of a set's subtitles, with the timing and parsed
+    markup of each one extracted once. Generators can use it as they'd use
+    the set, rendering the text for their own mappings straight from the
+    markup instead of walking the set again. See babelsubs.to_many.
+
+    DFXP output is delegated to the original set.
+    """
+
+    def __init__(self, subtitle_set):
+        self.subtitle_set = subtitle_set
+        self._cues = subtitle_set._extract_cues()
+        self._items_cache = {}
+
+    def __len__(self):
+        return len(self._cues)
+
+    def __nonzero__(self):
+        return bool(self._cues)
+
+    def __getitem__(self, key):
+        return self._get_items(None)[key]
+
+    def __iter__(self):
+        return iter(self._get_items(None))
+
+    def subtitle_items(self, mappings=None):
+        return list(self._get_items(mappings))
+
+    def _get_items(self, mappings):
+        key = mappings_key(mappings)
+        if key in self._items_cache:
+            stats.count('items_cache_hits')
+        else:
+            stats.count('items_cache_misses')
+            with stats.stage('items'):
+                self._items_cache[key] = [
+                    SubtitleLine(from_ms, to_ms, markup.render(parsed, mappings),
+                                 {NEW_PARAGRAPH_META_KEY: new_paragraph})
+                    for from_ms, to_ms, parsed, new_paragraph in self._cues]
+        return self._items_cache[key]
+
+    @property
+    def fully_synced(self):
+        return all(from_ms is not None and to_ms is not None
+                   for from_ms, to_ms, _, _ in self._cues)
+
+    def to_xml(self):
+        return self.subtitle_set.to_xml()
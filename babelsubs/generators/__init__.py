@@ -1,9 +1,13 @@
 from base import discover
 
-from dfxp import DFXPGenerator
-from sbv import SBVGenerator
-from srt import SRTGenerator
-from ssa import SSAGenerator
-from txt import TXTGenerator
-from html import HTMLGenerator
-from json_generator import JSONGenerator
+# the generators are only imported when used, see babelsubs.registry
+from babelsubs.registry import install_lazy_names
+install_lazy_names(__name__, {
+    'DFXPGenerator': 'babelsubs.generators.dfxp:DFXPGenerator',
+    'SBVGenerator': 'babelsubs.generators.sbv:SBVGenerator',
+    'SRTGenerator': 'babelsubs.generators.srt:SRTGenerator',
+    'SSAGenerator': 'babelsubs.generators.ssa:SSAGenerator',
+    'TXTGenerator': 'babelsubs.generators.txt:TXTGenerator',
+    'HTMLGenerator': 'babelsubs.generators.html:HTMLGenerator',
+    'JSONGenerator': 'babelsubs.generators.json_generator:JSONGenerator',
+})
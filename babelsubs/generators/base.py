@@ -1,8 +1,17 @@
+import codecs
+
+from babelsubs import stats
+from babelsubs.registry import LazyRegistry
 from babelsubs.utils import UNSYNCED_TIME_FULL
 
+# write_to buffers chunks until it has about this many characters
+WRITE_CHUNK_SIZE = 64 * 1024
+
 class BaseGenerator(object):
     file_type = ''
     allows_formatting = False
+    # does it need a SubtitleSet, see babelsubs.convert
+    uses_subtitle_set = False
 
     UNSYNCED_TIME = UNSYNCED_TIME_FULL
     def __init__(self, subtitle_set, line_delimiter=u'\n', language=None):
@@ -14,8 +23,37 @@ class BaseGenerator(object):
         self.language = language
 
     def __unicode__(self):
+        return u''.join(self.iter_chunks())
+
+    def iter_chunks(self):
+        """
+        Iterates over the output in unicode pieces (usually one per subtitle)
+        that joined together are the whole output.
+        """
         raise Exception('Should return subtitles')
 
+    def write_to(self, fileobj, encoding='utf-8'):
+        """
+        Writes the output to a file object, encoded as it's generated, so
+        neither the whole output nor its encoded copy are ever in memory.
+        """
+        encoder = codecs.getincrementalencoder(encoding)()
+        buffered = []
+        size = 0
+        written = 0
+        for chunk in self.iter_chunks():
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= WRITE_CHUNK_SIZE:
+                data = encoder.encode(u''.join(buffered))
+                fileobj.write(data)
+                written += len(data)
+                buffered = []
+                size = 0
+        data = encoder.encode(u''.join(buffered), True)
+        fileobj.write(data)
+        stats.count('output_bytes', written + len(data))
+
     @classmethod
     def isnumber(cls, val):
         return isinstance(val, (int, long, float))
@@ -24,21 +62,24 @@ class BaseGenerator(object):
     def generate(cls, subtitle_set, language=None):
         return unicode(cls(subtitle_set, language=language))
 
-class GeneratorListClass(dict):
-
-    def register(self, handler, type=None):
-        file_type = handler.file_type
-
-        if isinstance(file_type, list):
-            for ft in file_type:
-                self[ft.lower()] = handler
-        else:
-            self[file_type] = handler
+# the built in generators, imported as they are used
+GENERATORS = {
+    'dfxp': 'babelsubs.generators.dfxp:DFXPGenerator',
+    'xml': 'babelsubs.generators.dfxp:DFXPGenerator',
+    'sbv': 'babelsubs.generators.sbv:SBVGenerator',
+    # srt output has always come from the html generator, which keeps
+    # the formatting; SRTGenerator is the plain text one
+    'srt': 'babelsubs.generators.html:HTMLGenerator',
+    'ssa': 'babelsubs.generators.ssa:SSAGenerator',
+    'ass': 'babelsubs.generators.ssa:SSAGenerator',
+    'txt': 'babelsubs.generators.txt:TXTGenerator',
+    'json': 'babelsubs.generators.json_generator:JSONGenerator',
+}
 
-    def __getitem__(self, item):
-        return super(GeneratorListClass, self).__getitem__(item.lower())
+class GeneratorListClass(LazyRegistry):
+    pass
 
-GeneratorList = GeneratorListClass()
+GeneratorList = GeneratorListClass(GENERATORS)
 
 def register(generator):
     GeneratorList.register(generator)
@@ -1,4 +1,4 @@
-from babelsubs.generators.base import register, BaseGenerator
+from babelsubs.generators.base import BaseGenerator
 
 
 class DFXPGenerator(BaseGenerator):
@@ -8,6 +8,7 @@ class DFXPGenerator(BaseGenerator):
     regular.
     """
     file_type = ['dfxp', 'xml' ]
+    uses_subtitle_set = True
 
     def __init__(self, subtitle_set, line_delimiter=u'\n', language=None):
         super(DFXPGenerator, self).__init__(subtitle_set, line_delimiter,
@@ -16,9 +17,10 @@ class DFXPGenerator(BaseGenerator):
     def __unicode__(self):
         return self.subtitle_set.to_xml()
 
+    def iter_chunks(self):
+        # the tree is serialized by lxml in one go
+        yield unicode(self)
+
     @classmethod
     def generate(cls, subtitle_set, language=None):
         return unicode(cls(subtitle_set=subtitle_set, language=language))
-
-
-register(DFXPGenerator)
@@ -1,5 +1,5 @@
-from babelsubs.generators.base import BaseGenerator, register
-from babelsubs.utils import UNSYNCED_TIME_FULL
+from babelsubs.generators.base import BaseGenerator
+from babelsubs import timecode
 
 
 class HTMLGenerator(BaseGenerator):
@@ -12,28 +12,16 @@ class HTMLGenerator(BaseGenerator):
         super(HTMLGenerator, self).__init__(subtitle_set, language)
         self.line_delimiter = '\r\n'
 
-    def __unicode__(self):
-        output = []
+    def iter_chunks(self):
+        ld = self.line_delimiter
         i = 1
         for from_ms, to_ms, content, meta in self.subtitle_set.subtitle_items(mappings=self.MAPPINGS):
-            output.append(unicode(i))
-            output.append(u'%s --> %s' % (
+            yield u'%s%s%s%s --> %s%s%s%s' % (
+                ld if i > 1 else u'', i, ld,
                 self.format_time(from_ms),
-                self.format_time(to_ms)
-                ))
-            output.append(content)
-            output.append(u'')
+                self.format_time(to_ms), ld,
+                content, ld)
             i += 1
-        return self.line_delimiter.join(output)
 
     def format_time(self, milliseconds):
-        if milliseconds is None:
-            milliseconds = UNSYNCED_TIME_FULL
-
-        seconds, milliseconds = divmod(int(milliseconds), 1000)
-        minutes, seconds = divmod(seconds, 60)
-        hours, minutes = divmod(minutes, 60)
-        return u"%02i:%02i:%02i,%03i" % (hours, minutes, seconds, milliseconds)
-
-
-register(HTMLGenerator)
+        return timecode.format_srt(milliseconds)
@@ -1,4 +1,4 @@
-from babelsubs.generators.base import BaseGenerator, register
+from babelsubs.generators.base import BaseGenerator
 import json
 
 
@@ -19,20 +19,19 @@ class JSONGenerator(BaseGenerator):
     MAPPINGS = dict(linebreaks="\n", bold="<b>%s</b>",
                     italics="<i>%s</i>", underline="<u>%s</u>")
 
-    def __unicode__(self):
-        output = []
+    def iter_chunks(self):
+        # same as json.dumps on the list of all items, one item at a time
+        yield u'['
         # FIXME: allow formatting tags
         i = 1
         for from_ms, to_ms, content, meta in self.subtitle_set.subtitle_items(mappings=self.MAPPINGS):
-            output.append({
+            item = json.dumps({
                 'start': from_ms,
                 'end': to_ms,
                 'text': content,
                 'position': i,
                 'meta': meta
             })
+            yield item if i == 1 else u', ' + item
             i += 1
-        return json.dumps(output)
-
-
-register(JSONGenerator)
+        yield u']'
@@ -1,5 +1,5 @@
-from babelsubs.generators.base import BaseGenerator, register
-from babelsubs.utils import UNSYNCED_TIME_ONE_HOUR_DIGIT
+from babelsubs.generators.base import BaseGenerator
+from babelsubs import timecode
 
 class SBVGenerator(BaseGenerator):
     file_type = 'sbv'
@@ -10,26 +10,16 @@ class SBVGenerator(BaseGenerator):
         super(SBVGenerator, self).__init__(subtitles_set, line_delimiter,
                 language)
 
-    def __unicode__(self):
-        output = []
-
+    def iter_chunks(self):
+        ld = self.line_delimiter
+        first = True
         for from_ms, to_ms, content, meta in self.subtitle_set.subtitle_items(self.MAPPINGS):
             start = self.format_time(from_ms)
             end = self.format_time(to_ms)
-            output.append(u'%s,%s' % (start, end))
-            output.append(content.strip())
-            output.append(u'')
-
-        return self.line_delimiter.join(output)
+            yield u'%s%s,%s%s%s%s' % (u'' if first else ld, start, end, ld,
+                                      content.strip(), ld)
+            first = False
 
     def format_time(self, time):
-        if not time:
-            time = UNSYNCED_TIME_ONE_HOUR_DIGIT
-        seconds, milliseconds = divmod(int(time), 1000)
-        minutes, seconds = divmod(seconds, 60)
-        hours, minutes = divmod(minutes, 60)
-
-        return u'%01i:%02i:%02i.%03i' % (hours, minutes, seconds, milliseconds)
-
-
-register(SBVGenerator)
+        # note that 0 is output as unsynced too
+        return timecode.format_sbv(time or None)
@@ -1,6 +1,6 @@
 import codecs
-from babelsubs import utils
-from babelsubs.generators.base import BaseGenerator, register
+from babelsubs import timecode
+from babelsubs.generators.base import BaseGenerator
 
 class SSAGenerator(BaseGenerator):
     file_type = ['ssa', 'ass']
@@ -9,9 +9,13 @@ class SSAGenerator(BaseGenerator):
                     italics="{\i1}%s{\i0}", underline="{\u1}%s{\u0}")
 
 
-    def __unicode__(self):
+    def iter_chunks(self):
         #add BOM to fix python default behaviour, because players don't play without it
-        return u''.join([unicode(codecs.BOM_UTF8, "utf8"), self._start(), self._content(), self._end()])
+        yield unicode(codecs.BOM_UTF8, "utf8")
+        yield self._start()
+        for chunk in self._iter_content():
+            yield chunk
+        yield self._end()
 
     def _start(self):
         ld = self.line_delimiter
@@ -21,31 +25,20 @@ class SSAGenerator(BaseGenerator):
         return u''
 
     def format_time(self, milliseconds):
-        if not milliseconds:
-            components = utils.unsynced_time_components(one_hour_digit=True, uses_centiseconds=True)
-        else:
-            components = utils.milliseconds_to_time_clock_components(
-            milliseconds,
-            unsynced_val=utils.UNSYNCED_TIME_ONE_HOUR_DIGIT,
-            use_centiseconds=True)
-        return u'%(hours)i:%(minutes)02i:%(seconds)02i.%(centiseconds)02i' % components
+        # note that 0 is output as unsynced too
+        return timecode.format_ssa(milliseconds or None)
 
     def _clean_text(self, text):
         return text.replace('\n', ' ')
 
-    def _content(self):
+    def _iter_content(self):
         dl = self.line_delimiter
-        output = []
-        output.append(u'[Events]%s' % dl)
-        output.append(u'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text%s' % dl)
+        yield u'[Events]%s' % dl
+        yield u'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text%s' % dl
         tpl = u'Dialogue: 0,%s,%s,Default,,0000,0000,0000,,%s%s'
 
         for from_ms, to_ms, content, meta in self.subtitle_set.subtitle_items(self.MAPPINGS):
             start = self.format_time(from_ms)
             end = self.format_time(to_ms)
             text = self._clean_text(content)
-            output.append(tpl % (start, end, text, dl))
-
-        return ''.join(output)
-
-register(SSAGenerator)
+            yield tpl % (start, end, text, dl)
@@ -1,4 +1,4 @@
-from babelsubs.generators.base import BaseGenerator, register
+from babelsubs.generators.base import BaseGenerator
 
 
 class TXTGenerator(BaseGenerator):
@@ -12,12 +12,9 @@ class TXTGenerator(BaseGenerator):
         self.line_delimiter = line_delimiter
         self.language = language
 
-    def __unicode__(self):
-        output = []
+    def iter_chunks(self):
+        first = True
         for _, _, content, _ in self.subtitle_set.subtitle_items():
-            content and output.append(content.strip())
-
-        return self.line_delimiter.join(output)
-
-
-register(TXTGenerator)
+            if content:
+                yield content.strip() if first else self.line_delimiter + content.strip()
+                first = False
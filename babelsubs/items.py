@@ -0,0 +1,16 @@
+"""
+What subtitle_items returns, shared by every kind of subtitle set. Kept
+apart from storage so that using them doesn't import lxml.
+"""
+
+from collections import namedtuple
+
+NEW_PARAGRAPH_META_KEY = 'new_paragraph'
+
+SubtitleLine = namedtuple("SubtitleLine", ['start_time', 'end_time', 'text', 'meta'])
+
+def mappings_key(mappings):
+    """A hashable version of mappings, to be used as a cache key."""
+    if not mappings:
+        return None
+    return frozenset(mappings.items())
@@ -0,0 +1,171 @@
+"""
+Incremental conversion of big catalogs, see convert_incremental.
+
+A Manifest, kept on a SQLite file, records every input converted: its
+size, mtime and content hash, the output it went to and how it went.
+On the next run inputs that haven't changed (same size and mtime, or if
+those changed, same hash) and whose output is still there are skipped,
+so only new or changed files are converted again. Results are committed
+every few jobs, so a run that dies halfway resumes close to where it
+stopped.
+"""
+
+import os
+import time
+
+from babelsubs.batch import ConversionJob, convert_many
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+
+
+def file_hash(path):
+    import hashlib
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest(object):
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS conversions (
+            path TEXT NOT NULL,
+            to_type TEXT NOT NULL,
+            size INTEGER,
+            mtime REAL,
+            hash TEXT,
+            output_path TEXT,
+            status TEXT,
+            error TEXT,
+            converted_at REAL,
+            PRIMARY KEY (path, to_type)
+        )
+    '''
+
+    def __init__(self, path):
+        # sqlite3 is only imported if a manifest is used
+        import sqlite3
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(self.SCHEMA)
+        self.connection.commit()
+
+    def get(self, path, to_type):
+        """Returns the row for path and to_type as a dict, None if there's none."""
+        cursor = self.connection.execute(
+            'SELECT path, to_type, size, mtime, hash, output_path, status, error, '
+            'converted_at FROM conversions WHERE path = ? AND to_type = ?',
+            (path, to_type))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip(['path', 'to_type', 'size', 'mtime', 'hash', 'output_path',
+                         'status', 'error', 'converted_at'], row))
+
+    def record(self, job, size, mtime, hash, status, error=None):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO conversions (path, to_type, size, mtime, hash, '
+            'output_path, status, error, converted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job.path, job.to_type, size, mtime, hash, job.output_path, status,
+             error, time.time()))
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class IncrementalConversion(object):
+    """
+    Iterating over it converts the jobs that need it and yields their
+    ConversionResults. skipped counts the jobs that didn't, batch is the
+    underlying BatchConversion (for throughput).
+    """
+
+    def __init__(self, jobs, manifest_path, workers=None, chunksize=1,
+                 threads=False, checkpoint=100):
+        self.jobs = [ConversionJob(*job) for job in jobs]
+        for job in self.jobs:
+            if not job.output_path:
+                raise ValueError("Incremental jobs need an output_path: %s" % job.path)
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.chunksize = chunksize
+        self.threads = threads
+        self.checkpoint = checkpoint
+        self.skipped = 0
+        self.batch = None
+
+    def _is_current(self, manifest, job, stat, pending):
+        """
+        Is job's output up to date? Fills pending[job] with the input's
+        (size, mtime, hash) when we had to look at it.
+        """
+        row = manifest.get(job.path, job.to_type)
+        if (row is None or row['status'] != STATUS_OK or
+                row['output_path'] != job.output_path or
+                not os.path.exists(job.output_path)):
+            return False
+        if row['size'] == stat.st_size and row['mtime'] == stat.st_mtime:
+            return True
+        # touched, but maybe not changed
+        hash = file_hash(job.path)
+        if row['hash'] == hash:
+            manifest.record(job, stat.st_size, stat.st_mtime, hash, STATUS_OK)
+            return True
+        pending[job] = (stat.st_size, stat.st_mtime, hash)
+        return False
+
+    def __iter__(self):
+        manifest = Manifest(self.manifest_path)
+        try:
+            pending = {}
+            todo = []
+            for job in self.jobs:
+                stat = os.stat(job.path)
+                if self._is_current(manifest, job, stat, pending):
+                    self.skipped += 1
+                else:
+                    todo.append(job)
+                    if job not in pending:
+                        pending[job] = (stat.st_size, stat.st_mtime, None)
+            manifest.commit()
+
+            self.batch = convert_many(todo, workers=self.workers,
+                                      chunksize=self.chunksize, threads=self.threads)
+            for count, result in enumerate(self.batch):
+                size, mtime, hash = pending[result.job]
+                # the hash of what the worker read, which is what was
+                # converted even if the file changed since
+                hash = result.hash or hash
+                if result.error is None:
+                    manifest.record(result.job, size, mtime, hash, STATUS_OK)
+                else:
+                    manifest.record(result.job, size, mtime, hash, STATUS_FAILED,
+                                    repr(result.error.original_error or result.error))
+                if (count + 1) % self.checkpoint == 0:
+                    manifest.commit()
+                yield result
+        finally:
+            manifest.close()
+
+
+def convert_incremental(jobs, manifest_path, workers=None, chunksize=1,
+                        threads=False, checkpoint=100):
+    """
+    Returns an IncrementalConversion that converts the jobs (which need an
+    output_path) whose input or target changed since the last run recorded
+    on the manifest_path SQLite file, checkpointing every checkpoint jobs.
+    """
+    return IncrementalConversion(jobs, manifest_path, workers, chunksize,
+                                 threads, checkpoint)
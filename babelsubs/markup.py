@@ -0,0 +1,373 @@
+"""
+Lightweight handling of the markup we keep inside each subtitle, that is
+the contents of a TTML <p> element: text, <span>s with styling attributes
+and <br/>s.
+
+Parsing with lxml means one parser invocation per subtitle, which is
+expensive when all we want is to turn the markup into text for another
+format. Here a subtitle's markup is represented as a Markup tuple:
+
+    Markup(text, nodes, tail)
+
+where text and tail are the <p>'s own text and tail, and nodes is a
+tuple of MarkupNode(tag, attrs, text, tail, depth) for every descendant
+element in document order, exactly as lxml would report them. Namespaces
+are cleared from tags, but attribute names keep theirs, as lxml's
+{uri}name, so styling and xml:lang attributes are written back as they
+were.
+
+A Markup can be built either from an lxml element (markup_from_element)
+or straight from the xml string (parse_markup), and both render to the
+same text, so the SubtitleSet and the CompactSubtitleSet always agree.
+"""
+
+import re
+from collections import namedtuple
+
+Markup = namedtuple("Markup", ['text', 'nodes', 'tail'])
+MarkupNode = namedtuple("MarkupNode", ['tag', 'attrs', 'text', 'tail', 'depth'])
+
+_NAME = r'[^\s<>/="\'&]+'
+TAG_RE = re.compile(r'<(?P<close>/)?(?P<tag>%s)(?P<attrs>(?:\s+%s\s*=\s*(?:"[^"<]*"|\'[^\'<]*\'))*)\s*(?P<empty>/)?>' % (_NAME, _NAME))
+ATTR_RE = re.compile(r'(%s)\s*=\s*(?:"([^"<]*)"|\'([^\'<]*)\')' % _NAME)
+ENTITY_RE = re.compile(r'&(?:#x([0-9a-fA-F]+)|#([0-9]+)|(\w+));')
+XML_ENTITIES = {'amp': u'&', 'lt': u'<', 'gt': u'>', 'quot': u'"', 'apos': u"'"}
+# characters that are not allowed on xml documents
+INVALID_XML_CHARS = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XML_NAMESPACE_URI = 'http://www.w3.org/XML/1998/namespace'
+TTS_NAMESPACE_URI = 'http://www.w3.org/ns/ttml#styling'
+# the prefixes the contents of a <p> can use without declaring them, as
+# on SubtitleSet.SUBTITLES_FRAGMENT_XML
+PREFIXES = {'xml': XML_NAMESPACE_URI, 'tts': TTS_NAMESPACE_URI}
+NAMESPACE_PREFIXES = dict((uri, prefix) for prefix, uri in PREFIXES.items())
+# the <span> attributes a SubtitleSet moves to the styling namespace when
+# they're given without a prefix
+STYLE_ATTRIBUTES = ('fontStyle', 'textDecoration', 'fontWeight')
+
+
+def escape_xml(data):
+    """Same as xml.sax.saxutils.escape, which is slow to import."""
+    return data.replace('&', '&amp;').replace('>', '&gt;').replace('<', '&lt;')
+
+
+def quoteattr(data):
+    """Same as xml.sax.saxutils.quoteattr."""
+    data = escape_xml(data).replace('\n', '&#10;').replace('\r', '&#13;').replace('\t', '&#9;')
+    if '"' in data:
+        if "'" in data:
+            return '"%s"' % data.replace('"', '&quot;')
+        return "'%s'" % data
+    return '"%s"' % data
+
+
+# the styles text formats mark with tags, and the <span> attribute for
+# each, in the order they are written
+STYLES = [
+    ('b', 'fontWeight="bold"'),
+    ('i', 'fontStyle="italic"'),
+    ('u', 'textDecoration="underline"'),
+]
+
+
+def style_tags(opening, closing):
+    """
+    Returns the tags argument for styled_content, given how the opening and
+    closing tags look with %s for the style: style_tags('%s', '/%s')
+    matches b and /b (and B and /B) for bold.
+    """
+    tags = {}
+    for i, (tag, attr) in enumerate(STYLES):
+        for name in [tag, tag.upper()]:
+            tags[opening % name] = (i, True)
+            tags[closing % name] = (i, False)
+    return tags
+
+
+def styled_content(text, tag_re, tags):
+    """
+    Converts the text of a format that marks styles with tags (<b> on srt,
+    {\\b1} on ssa) into the contents of a <p>, in a single pass.
+
+    tag_re finds the tags, with a single group that is looked up on tags
+    (see style_tags), tags that aren't there are dropped. Tags don't need
+    to nest: the text between two tags gets a span with every style open
+    there, so <b>a<i>b</b>c</i> is
+
+        <span fontWeight="bold">a</span><span fontWeight="bold"
+        fontStyle="italic">b</span><span fontStyle="italic">c</span>
+
+    Closing tags that weren't opened are dropped and styles left open run
+    to the end. Line breaks become <br />.
+    """
+    parts = tag_re.split(text)
+    if len(parts) == 1:
+        return text.replace('\n', '<br />')
+    # how many times each style is open, and a bit for each open one
+    open_count = [0] * len(STYLES)
+    open_styles = 0
+    content = []
+    append = content.append
+    for chunk, tag in zip(parts[::2], parts[1::2]):
+        if chunk:
+            append(_SPANS[open_styles] % chunk if open_styles else chunk)
+        if tag not in tags:
+            continue
+        style, opening = tags[tag]
+        if opening:
+            open_count[style] += 1
+            open_styles |= 1 << style
+        elif open_count[style]:
+            open_count[style] -= 1
+            if not open_count[style]:
+                open_styles &= ~(1 << style)
+    if parts[-1]:
+        append(_SPANS[open_styles] % parts[-1] if open_styles else parts[-1])
+    return ''.join(content).replace('\n', '<br />')
+
+
+def _span(open_styles):
+    attrs = [attr for i, (tag, attr) in enumerate(STYLES) if open_styles & (1 << i)]
+    return '<span %s>%%s</span>' % ' '.join(attrs)
+
+# a span for every combination of open styles
+_SPANS = dict((open_styles, _span(open_styles))
+              for open_styles in range(1, 1 << len(STYLES)))
+
+
+def clear_namespace(name):
+    """Strips both {uri}name and prefix:name forms."""
+    if '}' in name:
+        return name.split("}")[-1]
+    return name.split(":")[-1]
+
+
+def _unescape_entity(match):
+    hex_value, dec_value, name = match.groups()
+    if name is not None:
+        if name not in XML_ENTITIES:
+            raise ValueError("Entity '%s' not defined" % name)
+        return XML_ENTITIES[name]
+    return unichr(int(hex_value, 16) if hex_value else int(dec_value))
+
+
+def _parse_text(text):
+    if '&' in text:
+        if text.count('&') != len(ENTITY_RE.findall(text)):
+            raise ValueError("Invalid entity reference in %r" % text)
+        text = ENTITY_RE.sub(_unescape_entity, text)
+    if ']]>' in text:
+        raise ValueError("Sequence ']]>' not allowed in content")
+    if '\r' in text:
+        # xml parsers normalize all line ends to \n
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _qualified_name(name, tag, scope):
+    """
+    Returns the {uri}name lxml would give to the attribute name on a tag,
+    with the prefixes in scope, once on a SubtitleSet.
+    """
+    if ':' in name:
+        prefix, local_name = name.split(':', 1)
+        if prefix not in scope:
+            raise ValueError("Namespace prefix %s is not defined" % prefix)
+        return '{%s}%s' % (scope[prefix], local_name)
+    if tag == 'span' and name in STYLE_ATTRIBUTES:
+        return '{%s}%s' % (TTS_NAMESPACE_URI, name)
+    return name
+
+
+def parse_markup(content):
+    """Parses the xml contents of a <p> into a Markup.
+
+    Raises ValueError on anything lxml would refuse to parse.
+    """
+    if INVALID_XML_CHARS.search(content):
+        raise ValueError("All strings must be XML compatible")
+    if '<' not in content:
+        return Markup(_parse_text(content) or None, (), None)
+
+    nodes = []
+    stack = []
+    # the namespace prefixes in scope for each open element
+    scopes = [PREFIXES]
+    root_text = None
+    # where the next chunk of text goes: the node index and whether it
+    # is its text (2) or tail (3), None for the root text
+    target = None
+    pos = 0
+    length = len(content)
+    while pos < length:
+        start = content.find('<', pos)
+        if start == -1:
+            start = length
+        if start > pos:
+            text = _parse_text(content[pos:start])
+            if target is None:
+                root_text = text
+            else:
+                nodes[target[0]][target[1]] = text
+        if start == length:
+            break
+        match = TAG_RE.match(content, start)
+        if match is None:
+            raise ValueError("Invalid markup at %r" % content[start:start + 20])
+        tag = clear_namespace(match.group('tag'))
+        if match.group('close'):
+            if match.group('attrs') or match.group('empty'):
+                raise ValueError("Invalid closing tag %s" % match.group(0))
+            if not stack or nodes[stack[-1]][0] != tag:
+                raise ValueError("Unexpected closing tag %s" % match.group(0))
+            target = (stack.pop(), 3)
+            scopes.pop()
+        else:
+            found = ATTR_RE.findall(match.group('attrs'))
+            scope = scopes[-1]
+            declared = [(name[6:], value1 or value2) for name, value1, value2 in found
+                        if name.startswith('xmlns:')]
+            if declared:
+                scope = dict(scope)
+                scope.update((prefix, _parse_text(uri)) for prefix, uri in declared)
+            attrs = {}
+            for name, value1, value2 in found:
+                if name == 'xmlns' or name.startswith('xmlns:'):
+                    continue
+                attrs[_qualified_name(name, tag, scope)] = _parse_text(value1 or value2)
+            nodes.append([tag, attrs, None, None, len(stack)])
+            if match.group('empty'):
+                target = (len(nodes) - 1, 3)
+            else:
+                stack.append(len(nodes) - 1)
+                scopes.append(scope)
+                target = (len(nodes) - 1, 2)
+        pos = match.end()
+    if stack:
+        raise ValueError("Unclosed tag %s" % nodes[stack[-1]][0])
+
+    return Markup(root_text, tuple(MarkupNode(*n) for n in nodes), None)
+
+
+def markup_from_element(el):
+    """Builds a Markup from an lxml <p> element."""
+    nodes = []
+    _add_children(el, 0, nodes)
+    return Markup(el.text, tuple(nodes), el.tail)
+
+
+def _add_children(el, depth, nodes):
+    for child in el:
+        if isinstance(child.tag, basestring):
+            attrs = dict(child.items())
+            nodes.append(MarkupNode(clear_namespace(child.tag), attrs,
+                                    child.text, child.tail, depth))
+            _add_children(child, depth + 1, nodes)
+        else:
+            # comments and processing instructions only count for their tail
+            nodes.append(MarkupNode(None, {}, None, child.tail, depth))
+
+
+def render_plain(markup):
+    """
+    Returns the text content only, the same as joining itertext() on the
+    element would.
+    """
+    if not markup.nodes:
+        return (markup.text or '').strip()
+    text = [markup.text or '']
+    tails = []
+    for node in markup.nodes:
+        while tails and tails[-1][0] >= node.depth:
+            text.append(tails.pop()[1] or '')
+        if node.tag is not None:
+            text.append(node.text or '')
+        tails.append((node.depth, node.tail))
+    while tails:
+        text.append(tails.pop()[1] or '')
+    return ''.join(text).strip()
+
+
+def render_markup(markup, mappings):
+    """
+    Returns the text using mappings to represent formatting, see
+    SubtitleSet.get_content_with_markup
+    """
+    text = [markup.text or '']
+    for node in markup.nodes:
+        if node.tag == 'span':
+            value = "%s"
+            attrs = dict((clear_namespace(n), v) for n, v in node.attrs.items())
+
+            if attrs.get('fontWeight', '') == 'bold' and 'bold' in mappings:
+                value = value % mappings.get("bold", "")
+
+            if attrs.get('fontStyle', '') == 'italic' and 'italics' in mappings:
+                value = value % mappings.get("italics", "")
+
+            if attrs.get('textDecoration', '') == 'underline' and 'underline' in mappings:
+                value = value % mappings.get("underline", "")
+
+            text.append(value % (node.text or ''))
+
+        if node.tag == "br":
+            text.append(mappings.get("linebreaks", ""))
+
+        if node.tail:
+            text.append(node.tail)
+
+    if markup.tail:
+        text.append(markup.tail)
+
+    return ''.join(filter(None, text)).strip()
+
+
+def render(markup, mappings=None):
+    """Plain text if there are no mappings, else formatted with them."""
+    if not mappings:
+        return render_plain(markup)
+    return render_markup(markup, mappings)
+
+
+def _attributes_to_content(attrs):
+    """
+    Writes attrs with the prefixes of their namespaces, declaring those that
+    don't have one of PREFIXES.
+    """
+    declared = {}
+    content = []
+    for name, value in sorted(attrs.items()):
+        if name.startswith('{'):
+            uri, local_name = name[1:].split('}', 1)
+            prefix = NAMESPACE_PREFIXES.get(uri)
+            if prefix is None:
+                if uri not in declared:
+                    declared[uri] = 'ns%s' % len(declared)
+                    content.append(' xmlns:%s=%s' % (declared[uri], quoteattr(uri)))
+                prefix = declared[uri]
+            name = '%s:%s' % (prefix, local_name)
+        content.append(' %s=%s' % (name, quoteattr(value)))
+    return ''.join(content)
+
+
+def markup_to_content(markup):
+    """
+    The inverse of parse_markup, returns the contents of the <p> as an xml
+    string, suitable to be given to append_subtitle with escape=False.
+    """
+    content = [escape_xml(markup.text or '')]
+    stack = []
+    for node in markup.nodes:
+        while stack and stack[-1].depth >= node.depth:
+            closed = stack.pop()
+            content.append('</%s>%s' % (closed.tag, escape_xml(closed.tail or '')))
+        if node.tag is None:
+            content.append(escape_xml(node.tail or ''))
+            continue
+        attrs = _attributes_to_content(node.attrs)
+        content.append('<%s%s>%s' % (node.tag, attrs, escape_xml(node.text or '')))
+        stack.append(node)
+    while stack:
+        closed = stack.pop()
+        content.append('</%s>%s' % (closed.tag, escape_xml(closed.tail or '')))
+    return ''.join(content)
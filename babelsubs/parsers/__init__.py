@@ -1,9 +1,13 @@
 from base import discover, SubtitleParserError
 
-from dfxp import DFXPParser
-from sbv import SBVParser
-from srt import SRTParser
-from ssa import SSAParser
-from txt import TXTParser
-from json_parser import JSONParser
-from youtube import YoutubeParser
+# the parsers are only imported when used, see babelsubs.registry
+from babelsubs.registry import install_lazy_names
+install_lazy_names(__name__, {
+    'DFXPParser': 'babelsubs.parsers.dfxp:DFXPParser',
+    'SBVParser': 'babelsubs.parsers.sbv:SBVParser',
+    'SRTParser': 'babelsubs.parsers.srt:SRTParser',
+    'SSAParser': 'babelsubs.parsers.ssa:SSAParser',
+    'TXTParser': 'babelsubs.parsers.txt:TXTParser',
+    'JSONParser': 'babelsubs.parsers.json_parser:JSONParser',
+    'YoutubeParser': 'babelsubs.parsers.youtube:YoutubeParser',
+})
@@ -1,9 +1,123 @@
 import re
-from babelsubs.storage import SubtitleSet
+import codecs
+from array import array
+from babelsubs import stats
+from babelsubs.compact import CompactSubtitleSet
+from babelsubs.registry import LazyRegistry
+
+
+# how much is read from a file object at a time, see iter_lines
+READ_CHUNK_SIZE = 64 * 1024
+# inputs longer than this (in characters) are parsed by several processes
+# if the parser was given workers, see BaseTextParser.parse
+PARALLEL_THRESHOLD = 4 * 1024 * 1024
+
+
+def iter_lines(fileobj, encoding='utf-8', chunk_size=READ_CHUNK_SIZE):
+    """
+    Iterates over the lines of a file object, without their line ends.
+
+    The file is read chunk_size at a time, so only the current chunk and
+    line are in memory. Byte chunks are decoded with an incremental decoder
+    (unicode ones are used as they are) and \\r\\n and \\r line ends are
+    normalized to \\n on the fly, the same as the parsers do with the whole
+    input.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = u''
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        if not isinstance(chunk, unicode):
+            chunk = decoder.decode(chunk)
+        data = pending + chunk
+        # a \r at the end might be the first half of a \r\n, keep it
+        # for the next chunk
+        held = u''
+        if data.endswith(u'\r'):
+            data, held = data[:-1], u'\r'
+        lines = data.replace(u'\r\n', u'\n').replace(u'\r', u'\n').split(u'\n')
+        pending = lines.pop() + held
+        for line in lines:
+            yield line
+    data = pending + decoder.decode('', True)
+    if data:
+        lines = data.replace(u'\r\n', u'\n').replace(u'\r', u'\n').split(u'\n')
+        if not lines[-1]:
+            lines.pop()
+        for line in lines:
+            yield line
+
+
+def iter_blocks(lines):
+    """
+    Groups lines into blocks separated by empty lines, yielding each block
+    as a string ending in a blank line, i.e. 'line\\nline\\n\\n'. Lines
+    with only whitespace don't end a block.
+    """
+    block = []
+    for line in lines:
+        if line:
+            block.append(line)
+        elif block:
+            yield u'\n'.join(block) + u'\n\n'
+            block = []
+    if block:
+        yield u'\n'.join(block) + u'\n\n'
+
+
+def iter_block_cues(parser, fileobj, encoding='utf-8', chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the (start, end, text) tuples of the cues parser finds on
+    fileobj, read a block at a time. Only for the formats where no cue
+    spans an empty line, see BaseTextParser.splittable.
+    """
+    for block in iter_blocks(iter_lines(fileobj, encoding, chunk_size)):
+        for match in parser._pattern.finditer(block):
+            item = parser._get_data(match.groupdict())
+            yield item['start'], item['end'], parser.get_markup(item['text'])
+
+
+def cue_pattern(timing, number=None):
+    """
+    Returns the pattern of a cue on a line based format (srt, sbv), to be
+    compiled with re.MULTILINE: a line matching timing as a whole, and the
+    lines up to the next empty one as its 'text'.
+
+    A cue also ends where the next timing line is, even without an empty
+    line in between, and if number is given a line matching it right
+    before that timing line is the next cue's number, not text. A stray
+    BOM before those lines is ignored. Each line is only looked at by the
+    lookaheads of the line before it, so finding the cues takes linear
+    time whatever the input.
+    """
+    # the lookaheads can't repeat the group names
+    bare_timing = re.sub(r'\(\?P<\w+>', '(?:', timing)
+    starts_cue = u'\ufeff?(?:%s)$' % bare_timing
+    if number is not None:
+        starts_cue = u'(?:%s|\ufeff?(?:%s)\n%s)' % (starts_cue, number, starts_cue)
+    line = u'(?!%s)[^\n]+' % starts_cue
+    return u'^\ufeff?(?:%s)$(?:\n(?P<text>%s(?:\n%s)*))?' % (timing, line, line)
+
+
+def _parse_chunk(args):
+    """Returns the cues of a chunk of input, run on the worker processes."""
+    parser_class, chunk, language = args
+    return list(parser_class(chunk, language, eager_parse=False)._cue_iter())
 
 
 class BaseTextParser(object):
 
+    # can the input be split on any blank line, as no cue spans one
+    splittable = False
+    parallel_threshold = PARALLEL_THRESHOLD
+    workers = None
+    # does it always build a SubtitleSet, see babelsubs.convert
+    uses_subtitle_set = False
+    # where the cues are on the input, once scanned, see _cues
+    _spans = None
+
     def __init__(self, input_string, pattern, language=None, flags=[], eager_parse=True):
         '''
         If `eager_parse` is True will parse the subtitles right way, converting to our
@@ -22,10 +136,12 @@ class BaseTextParser(object):
         return self._result_iter()
 
     def __len__(self):
-        return len(self._pattern.findall(self.input_string))
+        return len(self._cue_spans()) // 2
 
     def __nonzero__(self):
-        return bool(self._pattern.search(self.input_string))
+        if self._spans is not None:
+            return bool(self._spans)
+        return next(self._scan(), None) is not None
 
     def _result_iter(self):
         """
@@ -37,21 +153,63 @@ class BaseTextParser(object):
         }
         start_time and end_time in seconds. If it is not defined use -1.
         """
-        for item in self._matches:
-            yield self._get_data(item.groupdict())
+        for fields in self._cues():
+            yield self._get_data(fields)
 
     def _get_data(self, match):
         return match
 
-    def _get_matches(self):
-        return self._pattern.finditer(self.input_string)
+    def _scan(self):
+        """
+        Yields (start, end, fields) for every cue on the input: the span of
+        the input it takes, and the groups _get_data takes.
+        """
+        for match in self._pattern.finditer(self.input_string):
+            yield match.start(), match.end(), match.groupdict()
+
+    def _parse_cue(self, start, end):
+        """Returns the fields of the cue _scan found on start:end."""
+        return self._pattern.match(self.input_string, start, end).groupdict()
+
+    def _cues(self):
+        """
+        Iterates over the fields of every cue. The input is scanned only
+        once: the spans of the cues found are kept, and len, bool and later
+        iterations use those.
+        """
+        spans = self._spans
+        if spans is not None:
+            for i in xrange(0, len(spans), 2):
+                yield self._parse_cue(spans[i], spans[i + 1])
+            return
+        spans = array('l')
+        append = spans.append
+        for start, end, fields in self._scan():
+            append(start)
+            append(end)
+            yield fields
+        self._spans = spans
+
+    def _cue_spans(self):
+        if self._spans is None:
+            for fields in self._cues():
+                pass
+        return self._spans
 
     def __unicode__(self):
         return self.to(self.file_type)
 
     @classmethod
-    def parse(cls, input_string, language=None):
-        return cls(input_string, language)
+    def parse(cls, input_string, language=None, eager_parse=True, workers=None):
+        """
+        If workers is given, inputs over parallel_threshold are split and
+        parsed on that many processes, giving the same subtitles.
+        """
+        parser = cls(input_string, language, eager_parse=False)
+        parser.workers = workers
+        if eager_parse:
+            parser.to_internal()
+        return parser
 
     def to(self, type):
         from babelsubs import to
@@ -62,40 +220,118 @@ class BaseTextParser(object):
 
     def to_internal(self):
         if not hasattr(self, 'sub_set'):
-            match = None
-            try:
-                self.sub_set = SubtitleSet(self.language)
-                for match in self._matches:
-                    item = self._get_data(match.groupdict())
-                    # fix me: support markup
-                    text = self.get_markup(item['text'])
-                    self.sub_set.append_subtitle(item['start'], item['end'], text, escape=False)
-                if match is None:
-                    raise ValueError("No subs found")
-            except Exception as e:
-                raise SubtitleParserError(original_error=e)
+            from babelsubs.storage import SubtitleSet
+            self.sub_set = self._build(SubtitleSet)
 
         return self.sub_set
 
-    def get_markup(self, text):
-        return text
+    def to_compact(self):
+        """
+        Like to_internal, but returns a CompactSubtitleSet, which is a lot
+        cheaper if you only want to generate another text format.
+        """
+        if not hasattr(self, 'compact_set'):
+            self.compact_set = self._build(CompactSubtitleSet)
+
+        return self.compact_set
+
+    def _build(self, set_class):
+        """Returns a new set_class instance with all our subtitles."""
+        try:
+            sub_set = set_class(self.language)
+            sub_set.append_subtitles(self._cue_iter(), escape=False)
+            if not len(sub_set):
+                raise ValueError("No subs found")
+        except Exception as e:
+            raise SubtitleParserError(original_error=e)
+        stats.count('cues', len(sub_set))
+        return sub_set
 
-    _matches = property(_get_matches)
+    def _cue_iter(self):
+        """
+        Iterates over (start, end, text) tuples, with the text already
+        converted to our markup, ready to be appended to a SubtitleSet.
+        """
+        if (self.workers and self.workers > 1 and self.splittable and
+                len(self.input_string) > self.parallel_threshold):
+            return self._parallel_cue_iter()
+        return self._serial_cue_iter()
+
+    def _split_input(self, count):
+        """
+        Splits the input in up to count chunks of similar size, right after
+        blank lines, so every cue stays whole.
+        """
+        text = self.input_string
+        size = len(text) // count + 1
+        chunks = []
+        start = 0
+        while start < len(text):
+            split = text.find('\n\n', start + size)
+            end = len(text) if split == -1 else split + 2
+            chunks.append(text[start:end])
+            start = end
+        return chunks
 
-class ParserListClass(dict):
-    def register(self, parser):
-        file_type = parser.file_type
+    def _parallel_cue_iter(self):
+        import multiprocessing
+        pool = multiprocessing.Pool(self.workers)
+        try:
+            results = pool.map(_parse_chunk, [
+                (self.__class__, chunk, self.language)
+                for chunk in self._split_input(self.workers * 4)])
+        finally:
+            pool.terminate()
+            pool.join()
+        for cues in results:
+            for cue in cues:
+                yield cue
+
+    def _serial_cue_iter(self):
+        if stats.collecting():
+            for cue in self._timed_cue_iter():
+                yield cue
+            return
+        for fields in self._cues():
+            item = self._get_data(fields)
+            # fix me: support markup
+            text = self.get_markup(item['text'])
+            yield item['start'], item['end'], text
+
+    def _timed_cue_iter(self):
+        """_serial_cue_iter, timing the matching and get_markup apart."""
+        cues = self._cues()
+        while True:
+            with stats.stage('match'):
+                fields = next(cues, None)
+                if fields is not None:
+                    item = self._get_data(fields)
+            if fields is None:
+                return
+            with stats.stage('markup'):
+                text = self.get_markup(item['text'])
+            yield item['start'], item['end'], text
+
+    def get_markup(self, text):
+        return text
 
-        if isinstance(file_type, list):
-            for ft in file_type:
-                self[ft.lower()] = parser
-        else:
-            self[file_type] = parser
+# the built in parsers, imported as they are used
+PARSERS = {
+    'dfxp': 'babelsubs.parsers.dfxp:DFXPParser',
+    'xml': 'babelsubs.parsers.dfxp:DFXPParser',
+    'sbv': 'babelsubs.parsers.sbv:SBVParser',
+    'srt': 'babelsubs.parsers.srt:SRTParser',
+    'ssa': 'babelsubs.parsers.ssa:SSAParser',
+    'ass': 'babelsubs.parsers.ssa:SSAParser',
+    'txt': 'babelsubs.parsers.txt:TXTParser',
+    'json': 'babelsubs.parsers.json_parser:JSONParser',
+    'youtube': 'babelsubs.parsers.youtube:YoutubeParser',
+}
 
-    def __getitem__(self, item):
-        return super(ParserListClass, self).__getitem__(item.lower())
+class ParserListClass(LazyRegistry):
+    pass
 
-ParserList = ParserListClass()
+ParserList = ParserListClass(PARSERS)
 
 class SubtitleParserError(Exception):
     '''
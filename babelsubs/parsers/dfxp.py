@@ -1,10 +1,33 @@
-from babelsubs.storage import SubtitleSet
-from base import BaseTextParser, SubtitleParserError, register
+from babelsubs import markup
+from babelsubs.storage import (
+    SubtitleSet, NAMESPACE_DECL, normalized_times, get_tick_rate,
+    time_expression_to_milliseconds
+)
+from babelsubs.compact import CompactSubtitleSet
+from base import BaseTextParser, SubtitleParserError
 from xml.parsers.expat import ExpatError
+from lxml import etree
 from lxml.etree import XMLSyntaxError
 
 MAX_SUB_TIME = (60 * 60 * 100) - 1
 
+
+def _read_cue(el, tick_rate, new_paragraph):
+    """Returns the DFXPParser.iter_cues tuple for a <p>."""
+    begin, end = normalized_times(el, tick_rate)
+    return (time_expression_to_milliseconds(begin) if begin else None,
+            time_expression_to_milliseconds(end) if end else None,
+            markup.markup_to_content(markup.markup_from_element(el)),
+            {'new_paragraph': new_paragraph, 'tail': el.tail})
+
+
+def _remove_previous(el):
+    """Removes the siblings before el."""
+    parent = el.getparent()
+    while el.getprevious() is not None:
+        del parent[0]
+
+
 class DFXPParser(BaseTextParser):
     """
     The DFXPParser is in reality just a shim around the basic storage
@@ -13,8 +36,10 @@ class DFXPParser(BaseTextParser):
 
     file_type = ['dfxp', 'xml']
     no_unicode = True
+    uses_subtitle_set = True
 
-    def __init__(self, input_string, language=None):
+    def __init__(self, input_string, language=None, eager_parse=True):
+        # the document is always parsed, it's our storage format
         try:
             self.subtitle_set = SubtitleSet(language, input_string, normalize_time=True)
         except (XMLSyntaxError, ExpatError), e:
@@ -22,6 +47,69 @@ class DFXPParser(BaseTextParser):
 
         self.language = language
 
+    @classmethod
+    def iter_cues(cls, fileobj, language_code=None, encoding=None):
+        """
+        Reads a DFXP document from a file object incrementally, yielding
+        (start, end, content, meta) tuples as each <p> is read, content
+        being the xml inside it and meta a dict with new_paragraph and the
+        tail, the text after the </p>. Like SRTParser.iter_cues they can be
+        fed to a CompactSubtitleSet:
+
+            subs = CompactSubtitleSet.from_list('en', DFXPParser.iter_cues(f))
+
+        which gives the same subtitles as from_subtitle_set on the
+        document's SubtitleSet. Every element is cleared once it's read, so
+        only the current <p> and the elements above it are in memory,
+        whatever the size of the document. encoding overrides the one the
+        document declares.
+        """
+        # only <div> and <p> events get here
+        tags = ['{%s}%s' % (namespace, tag)
+                for namespace in NAMESPACE_DECL.values() for tag in ('div', 'p')]
+        context = etree.iterparse(fileobj, events=('start', 'end'), tag=tags,
+                                  encoding=encoding)
+        root = div = None
+        # the last <p> read, yielded on the next event, once its tail is
+        pending = None
+        for event, el in context:
+            if root is None:
+                root = el.getroottree().getroot()
+                namespace = etree.QName(root).namespace
+                if (root.tag != '{%s}tt' % namespace or
+                        namespace not in NAMESPACE_DECL.values()):
+                    return
+                body_tag, div_tag, p_tag = ['{%s}%s' % (namespace, tag)
+                                            for tag in ('body', 'div', 'p')]
+                tick_rate = get_tick_rate(root)
+                count = 0
+            if pending is not None:
+                yield _read_cue(pending, tick_rate or 1, count > 0 and new_paragraph)
+                count += 1
+                # keep the <p> itself, the next one looks at it
+                pending.clear()
+                _remove_previous(pending)
+                pending = None
+
+            if event == 'start':
+                if el.tag == p_tag:
+                    new_paragraph = el.getprevious() is None
+                elif el.tag == div_tag:
+                    parent = el.getparent()
+                    if parent.tag == body_tag and parent.getparent() is root:
+                        # a /tt/body/div, as SubtitleSet finds them
+                        div = el
+                        if tick_rate is None:
+                            tick_rate = get_tick_rate(el)
+            elif el.tag == p_tag:
+                if el.getparent() is div:
+                    pending = el
+            elif el.tag == div_tag:
+                el.clear()
+                _remove_previous(el)
+        if pending is not None:
+            yield _read_cue(pending, tick_rate or 1, count > 0 and new_paragraph)
+
     def __len__(self):
         return self.subtitle_set.__len__()
 
@@ -30,6 +118,8 @@ class DFXPParser(BaseTextParser):
 
     def to_internal(self):
         return self.subtitle_set
-        
 
-register(DFXPParser)
+    def to_compact(self):
+        if not hasattr(self, 'compact_set'):
+            self.compact_set = CompactSubtitleSet.from_subtitle_set(self.subtitle_set)
+        return self.compact_set
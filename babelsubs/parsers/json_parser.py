@@ -1,37 +1,42 @@
 import json
-from babelsubs.storage import SubtitleSet
 from babelsubs.parsers.base import (
-    BaseTextParser, register, SubtitleParserError
+    BaseTextParser, SubtitleParserError
 )
 
 
 class JSONParser(BaseTextParser):
     file_type = 'json'
 
-    def __init__(self, input_string, pattern, language=None, flags=[], eager_parse=True):
+    def __init__(self, input_string, language=None, eager_parse=True):
         self.input_string = input_string
-        self.pattern = pattern
         self.language = language
-        super(JSONParser, self).__init__(input_string, pattern, language=language,
-            flags=[], eager_parse=eager_parse)
-
-    def to_internal(self):
-        if not hasattr(self, 'sub_set'):
-            self.sub_set = SubtitleSet(self.language)
+        if eager_parse:
+            self.to_internal()
 
+    def _data(self):
+        if not hasattr(self, '_items'):
             try:
                 data = json.loads(self.input_string)
             except ValueError:
                 raise SubtitleParserError("Invalid JSON data provided.")
 
             # Sort by the ``position`` key
-            data = sorted(data, key=lambda k: k['position'])
+            self._items = sorted(data, key=lambda k: k['position'])
+        return self._items
+
+    def __len__(self):
+        return len(self._data())
 
-            for sub in data:
-                self.sub_set.append_subtitle(sub['start'], sub['end'],
-                    sub['text'])
+    def __nonzero__(self):
+        return bool(self._data())
 
-        return self.sub_set
+    def _result_iter(self):
+        for sub in self._data():
+            yield {'start': sub['start'], 'end': sub['end'], 'text': sub['text']}
 
+    def _build(self, set_class):
+        sub_set = set_class(self.language)
+        sub_set.append_subtitles(
+            (sub['start'], sub['end'], sub['text']) for sub in self._data())
 
-register(JSONParser)
+        return sub_set
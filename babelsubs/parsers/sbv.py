@@ -1,29 +1,35 @@
 import re
 
-from base import BaseTextParser, register
-from babelsubs import utils
+from base import BaseTextParser, iter_block_cues, cue_pattern, READ_CHUNK_SIZE
+from babelsubs import utils, timecode
 
 class SBVParser(BaseTextParser):
 
     file_type = 'sbv'
+    splittable = True
 
     def __init__(self, input_string, language=None, eager_parse=True):
-        pattern = r'(?P<s_hour>\d{1}):(?P<s_min>\d{2}):(?P<s_sec>\d{2})\.(?P<s_secfr>\d{3})'
+        pattern = r'(?P<s_hour>\d+):(?P<s_min>\d{2}):(?P<s_sec>\d{2})\.(?P<s_secfr>\d{3})'
         pattern += r','
-        pattern += r'(?P<e_hour>\d{1}):(?P<e_min>\d{2}):(?P<e_sec>\d{2})\.(?P<e_secfr>\d{3})'
-        pattern += r'\n(?P<text>.+?)\n\n'
+        pattern += r'(?P<e_hour>\d+):(?P<e_min>\d{2}):(?P<e_sec>\d{2})\.(?P<e_secfr>\d{3})'
+        pattern = cue_pattern(pattern)
         # TODO: Support the DELAY header. Now, how can we map frames
         # to time coordinates without having a frame rate number?
         # My guess people expect it to be guessable through the video
         # file, but that renders our quest useless. Ideas?
         input_string = input_string.replace('\r\n', '\n')+u'\n\n'
         super(SBVParser, self).__init__(input_string, pattern, language=language,
-             flags=[re.DOTALL], eager_parse=eager_parse)
+             flags=[re.MULTILINE], eager_parse=eager_parse)
+
+    @classmethod
+    def iter_cues(cls, fileobj, language_code=None, encoding='utf-8',
+                  chunk_size=READ_CHUNK_SIZE):
+        """Same as SRTParser.iter_cues."""
+        parser = cls(u'', language_code, eager_parse=False)
+        return iter_block_cues(parser, fileobj, encoding, chunk_size)
 
     def _get_time(self, hour, min, sec, secfr):
-        if secfr is None:
-            secfr = '0'
-        res = (int(hour)*60*60+int(min)*60+int(sec)+float('.'+secfr)) * 1000
+        res = timecode.clock_components_to_milliseconds(hour, min, sec, secfr)
         if res == utils.UNSYNCED_TIME_ONE_HOUR_DIGIT:
             res = None
         return res
@@ -47,6 +53,3 @@ class SBVParser(BaseTextParser):
         output['text'] = text
 
         return output
-
-
-register(SBVParser)
@@ -1,31 +1,53 @@
 import re
 
-from lxml import etree
-from babelsubs import utils
-from babelsubs.parsers.base import BaseTextParser, register
+from babelsubs import markup, utils, timecode
+from babelsubs.parsers.base import (
+    BaseTextParser, iter_block_cues, cue_pattern, READ_CHUNK_SIZE
+)
 
 class SRTParser(BaseTextParser):
 
     file_type = 'srt'
+    splittable = True
     _clean_pattern = re.compile(r'\{.*?\}', re.DOTALL)
+    _tag_pattern = re.compile(r'<(/?[a-zA-Z][^\s/>]*)[^>]*>')
+    _tags = markup.style_tags('%s', '/%s')
 
     def __init__(self, input_string, language_code, eager_parse=True):
-        pattern = r'\d+\s*?\n'
-        pattern += r'(?P<s_hour>\d{2}):(?P<s_min>\d{2}):(?P<s_sec>\d{2})(,(?P<s_secfr>\d*))?'
+        pattern = r'(?P<s_hour>\d{2}):(?P<s_min>\d{2}):(?P<s_sec>\d{2})(,(?P<s_secfr>\d*))?'
         pattern += r' --> '
         pattern += r'(?P<e_hour>\d{2}):(?P<e_min>\d{2}):(?P<e_sec>\d{2})(,(?P<e_secfr>\d*))?'
-        pattern += r'\n(\n|(?P<text>.+?)\n\n)'
+        # the timing line, numbered
+        pattern = cue_pattern(pattern, r'\d+[ \t]*')
         # normalize line endings to \n and
         # add line end for last sub
         input_string = input_string.replace('\r\n', '\n').replace('\r', '\n')+'\n\n'
         super(SRTParser, self).__init__(input_string, pattern, language=language_code,
-            flags=[re.DOTALL], eager_parse=eager_parse)
+            flags=[re.MULTILINE], eager_parse=eager_parse)
 
 
+    @classmethod
+    def iter_cues(cls, fileobj, language_code=None, encoding='utf-8',
+                  chunk_size=READ_CHUNK_SIZE):
+        """
+        Reads subtitles from a file object incrementally, yielding
+        (start, end, text) tuples as soon as each cue is complete.
+
+        The input is never held in memory as a whole, only the current
+        chunk and cue, so this can be fed to a CompactSubtitleSet (or a
+        SubtitleSet) to convert huge files:
+
+            subs = CompactSubtitleSet.from_list('en', SRTParser.iter_cues(f))
+            babelsubs.to(subs, 'sbv')
+
+        The cues are the same the parser finds on the whole input, with the
+        text already converted to our markup, as no cue spans an empty line.
+        """
+        parser = cls(u'', language_code, eager_parse=False)
+        return iter_block_cues(parser, fileobj, encoding, chunk_size)
+
     def _get_time(self, hour, min, sec, milliseconds):
-        if milliseconds is None:
-            milliseconds = '0'
-        res  =  (int(hour)*60*60+int(min)*60+int(sec)+float('.'+milliseconds)) * 1000
+        res = timecode.clock_components_to_milliseconds(hour, min, sec, milliseconds)
         if res == utils.UNSYNCED_TIME_FULL:
             res = None
         return res
@@ -48,29 +70,7 @@ class SRTParser(BaseTextParser):
         return output
 
     def get_markup(self, text):
-        # create a simple element so we can parse using etree
-        # since srt uses html like tags as markup
-        base = "<p>%s</p>" % text
-        el = etree.fromstring(base)
-
-        content = [el.text]
-        base_span = '<span %s>%s</span>'
-
-        for child in el.getchildren():
-            tag = child.tag
-
-            if tag == 'b':
-                content.append(base_span % ('fontWeight="bold"', child.text))
-            elif tag == 'i':
-                content.append(base_span % ('fontStyle="italic"', child.text))
-            elif tag == 'u':
-                content.append(base_span % ('textDecoration="underline"', child.text))
-
-            content.append(child.tail)
-
-        if el.tail:
-            content.append(el.tail.strip())
-            
-        return "".join(filter(None, content)).replace("\n", "<br />")
-
-register(SRTParser)
+        # srt uses html like tags as markup, balanced by strip_tags, and
+        # _get_data escaped the already escaped text once more
+        return markup.styled_content(text.replace('&amp;', '&'),
+                                      self._tag_pattern, self._tags)
@@ -1,35 +1,132 @@
 import re
 
+from babelsubs.parsers.base import iter_lines, READ_CHUNK_SIZE
 from babelsubs.parsers.srt import SRTParser
-from babelsubs.utils import (
-    centiseconds_to_milliseconds, escape_ampersands,
-    UNSYNCED_TIME_ONE_HOUR_DIGIT
-)
-from base import register
+from babelsubs import markup, timecode
+from babelsubs.utils import escape_ampersands, UNSYNCED_TIME_ONE_HOUR_DIGIT
+
+# the columns when a section has no Format line, as on v4+ files
+DEFAULT_EVENT_FORMAT = ('layer', 'start', 'end', 'style', 'name', 'marginl',
+                        'marginr', 'marginv', 'effect', 'text')
+DEFAULT_STYLE_FORMAT = ('name', 'fontname', 'fontsize', 'primarycolour',
+                        'secondarycolour', 'outlinecolour', 'backcolour', 'bold',
+                        'italic', 'underline', 'strikeout', 'scalex', 'scaley',
+                        'spacing', 'angle', 'borderstyle', 'outline', 'shadow',
+                        'alignment', 'marginl', 'marginr', 'marginv', 'encoding')
+STYLE_SECTIONS = ('v4 styles', 'v4+ styles', 'v4 styles+')
+# style column -> the override tag it stands for
+STYLE_TAGS = (('bold', u'{\\b1}'), ('italic', u'{\\i1}'), ('underline', u'{\\u1}'))
+
+
+def _columns(format):
+    """Returns the column names on a Format line, lower cased."""
+    return tuple(name.strip().lower() for name in format.split(','))
+
+
+def _time_pattern(prefix):
+    return (r'[ \t]*(?P<%(p)s_hour>\d+):(?P<%(p)s_min>\d{2}):(?P<%(p)s_sec>\d{2})'
+            r'[\.\:](?P<%(p)s_secfr>\d+)[ \t]*' % {'p': prefix})
+
+
+def event_pattern(columns):
+    """
+    Returns the pattern of the Dialogue lines with the given columns. They
+    are split on commas but the last one, the text, which keeps its
+    commas: the same as line.split(',', len(columns) - 1).
+    """
+    fields = []
+    for i, name in enumerate(columns):
+        value = r'[^\n]*' if i == len(columns) - 1 else r'[^,\n]*'
+        if name in ('start', 'end') and name not in columns[:i]:
+            fields.append(_time_pattern(name[0]))
+        elif name in ('style', 'text') and name not in columns[:i]:
+            fields.append(r'(?P<%s>%s)' % (name, value))
+        else:
+            fields.append(value)
+    return u'^[ \t\ufeff]*Dialogue:[ \t]*' + ','.join(fields)
+
 
 class SSAParser(SRTParser):
 
     file_type = ['ssa', 'ass']
-    MAX_SUB_TIME = UNSYNCED_TIME_ONE_HOUR_DIGIT
+    # the events don't span blank lines, but need the header
+    splittable = False
+    _tag_pattern = re.compile(r'\{\\([biu][01])\}')
+    _tags = markup.style_tags('%s1', '%s0')
+    # override blocks without a bold, italic or underline tag, and then
+    # those with one and something else, which are cleaned up
+    _override_pattern = re.compile(r'\{(?:[^{}\\]|\\(?![biu][01](?![\w.])))*\}')
+    _mixed_override_pattern = re.compile(r'\{(?!\\[biu][01]\})([^{}]*)\}')
+    _toggle_pattern = re.compile(r'\\([biu][01])(?![\w.])')
 
     def __init__(self, input_string, language=None, eager_parse=True):
-        pattern = r'Dialogue: [\w=]+,' #Dialogue: <Marked> or <Layer>,
-        pattern += r'(?P<s_hour>\d):(?P<s_min>\d{2}):(?P<s_sec>\d{2})[\.\:](?P<s_secfr>\d+),' #<Start>,
-        pattern += r'(?P<e_hour>\d):(?P<e_min>\d{2}):(?P<e_sec>\d{2})[\.\:](?P<e_secfr>\d+),' #<End>,
-        pattern += r'[\w ]+,' #<Style>,
-        pattern += r'[\w ]*,' #<Character name>,
-        pattern += r'\d{4},\d{4},\d{4},' #<MarginL>,<MarginR>,<MarginV>,
-        pattern += r'[\w ]*,' #<Efect>,
-        pattern += r'(?:\{.*?\})?(?P<text>.+?)\n' #[{<Override control codes>}]<Text>
         #replace \r\n to \n and fix end of last subtitle
         input_string = input_string.replace('\r\n', '\n')+u'\n'
-        self.markup_re = re.compile(r"{\\(?P<start>[biu])1}(?P<text>.+?){\\(?P<end>[biu])0}")
-        super(SRTParser, self).__init__(input_string, pattern, flags=[re.DOTALL],
+        self._read_header(match.group() for match in re.finditer(u'[^\n]*\n', input_string))
+        super(SRTParser, self).__init__(input_string, self.pattern, flags=[re.MULTILINE],
             language=language, eager_parse=eager_parse)
 
+    def _read_header(self, lines):
+        """
+        Reads script_info, styles and the Format of the events, which sets
+        pattern, from the lines before the events. Returns the first
+        Dialogue line, None if there's none.
+        """
+        self.script_info = {}
+        self.styles = {}
+        self._style_tags = {}
+        self.pattern = event_pattern(DEFAULT_EVENT_FORMAT)
+        section = None
+        style_columns = DEFAULT_STYLE_FORMAT
+        for line in lines:
+            key, sep, value = line.strip().lstrip(u'\ufeff').partition(u':')
+            if key == u'Dialogue':
+                return line
+            if not sep:
+                if key.startswith(u'[') and key.endswith(u']'):
+                    section = key[1:-1].strip().lower()
+                continue
+            value = value.strip()
+            if section == 'script info':
+                self.script_info[key] = value
+            elif section in STYLE_SECTIONS:
+                if key == u'Format':
+                    style_columns = _columns(value)
+                elif key == u'Style':
+                    values = value.split(',', len(style_columns) - 1)
+                    self._add_style(dict(zip(style_columns, [v.strip() for v in values])))
+            elif section == 'events' and key == u'Format':
+                self.pattern = event_pattern(_columns(value))
+        return None
+
+    def _add_style(self, style):
+        name = style.get('name', u'').lstrip(u'*')
+        self.styles[name] = style
+        # -1 is true on ssa, but some write 1
+        self._style_tags[name] = u''.join(tag for column, tag in STYLE_TAGS
+                                          if style.get(column, u'0') not in (u'', u'0'))
+
+    @classmethod
+    def iter_cues(cls, fileobj, language_code=None, encoding='utf-8',
+                  chunk_size=READ_CHUNK_SIZE):
+        """
+        Same as SRTParser.iter_cues: the header is read first, then every
+        Dialogue line is yielded as it's read.
+        """
+        parser = cls(u'', language_code, eager_parse=False)
+        lines = iter_lines(fileobj, encoding, chunk_size)
+        line = parser._read_header(lines)
+        pattern = re.compile(parser.pattern)
+        while line is not None:
+            match = pattern.match(line)
+            if match is not None:
+                item = parser._get_data(match.groupdict())
+                yield item['start'], item['end'], parser.get_markup(item['text'])
+            line = next(lines, None)
+
     def get_markup(self, text):
-        return self.markup_re.sub(self.__replace, text)
-    
+        return markup.styled_content(text, self._tag_pattern, self._tags)
+
     def _get_data(self, match):
         output = {}
         output['start'] = self._get_time(match['s_hour'],
@@ -40,36 +137,30 @@ class SSAParser(SRTParser):
                                        match['e_min'],
                                        match['e_sec'],
                                        match['e_secfr'])
-        output['text'] = ('' if match['text'] is None else
-                          escape_ampersands(match['text']))
-
+        output['text'] = escape_ampersands(self._clean_text(match['text'],
+                                                            match.get('style')))
         return output
 
-    def _get_time(self, hour, min, sec, milliseconds):
-        milliseconds = centiseconds_to_milliseconds(milliseconds)
-        res =  (1000 * (
-            (int(hour)*60*60 )+
-            (int(min)*60) +
-            int(sec))) + milliseconds
-        if res >= self.MAX_SUB_TIME:
-            return None
-        return res
-
-    def __replace(self, match):
-        group = match.groupdict()
-        if group['start'] != group['end']:
-            raise ValueError("Unbalanced tags start: %(start)s, end: %(end)s" % group)
+    def _clean_override(self, match):
+        return u''.join(u'{\\%s}' % toggle
+                        for toggle in self._toggle_pattern.findall(match.group(1)))
 
-        base_span = '<span %s>%s</span>'
+    def _clean_text(self, text, style):
+        """
+        Keeps only the bold, italic and underline override tags, one per
+        block, adding those of the style, and replaces the escapes.
+        """
+        if u'{' in text:
+            text = self._override_pattern.sub(u'', text)
+            text = self._mixed_override_pattern.sub(self._clean_override, text)
+        if u'\\' in text:
+            text = text.replace(u'\\N', u'\n').replace(u'\\n', u' ').replace(u'\\h', u'\xa0')
+        if style:
+            text = self._style_tags.get(style.lstrip(u'*'), u'') + text
+        return text
 
-        if group['start'] == 'b':
-            span = base_span % ('fontWeight="bold"', group['text'])
-        elif group['start'] == 'i':
-            span = base_span % ('fontStyle="italic"', group['text'])
-        elif group['start'] == 'u':
-            span = base_span % ('textDecoration="underline"', group['text'])
-
-        return span
-
-
-register(SSAParser)
+    def _get_time(self, hour, min, sec, milliseconds):
+        res = timecode.ssa_components_to_milliseconds(hour, min, sec, milliseconds)
+        if res == UNSYNCED_TIME_ONE_HOUR_DIGIT:
+            res = None
+        return res
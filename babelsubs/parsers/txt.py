@@ -1,7 +1,6 @@
 import re
 from babelsubs import utils
-from base import BaseTextParser, register, SubtitleParserError
-from babelsubs.storage import SubtitleSet
+from base import BaseTextParser, SubtitleParserError
 
 class TXTParser(BaseTextParser):
 
@@ -30,18 +29,11 @@ class TXTParser(BaseTextParser):
             output['text'] = utils.strip_tags(item)
             yield output
 
-    def to_internal(self):
-
-        if not hasattr(self, 'sub_set'):
-            self.sub_set = SubtitleSet(self.language)
-            valid = False
-            for item in self._result_iter():
-                if not valid and ''.join(item['text'].split()):
-                    valid = True
-                self.sub_set.append_subtitle(item['start'], item['end'], item['text'])
-            if not valid:
-                raise SubtitleParserError("No subs")
-        return self.sub_set
-
-
-register(TXTParser)
+    def _build(self, set_class):
+        sub_set = set_class(self.language)
+        items = list(self._result_iter())
+        sub_set.append_subtitles(
+            (item['start'], item['end'], item['text']) for item in items)
+        if not any(''.join(item['text'].split()) for item in items):
+            raise SubtitleParserError("No subs")
+        return sub_set
@@ -1,14 +1,16 @@
 from lxml import etree
 from babelsubs.utils import unescape_html
-from babelsubs.parsers.base import BaseTextParser, register, SubtitleParserError
-from babelsubs.storage import SubtitleSet
+from babelsubs.timecode import seconds_to_milliseconds
+from babelsubs.parsers.base import BaseTextParser, SubtitleParserError
 
 
 class YoutubeParser(BaseTextParser):
 
     file_type = 'youtube'
 
-    def __init__(self, input_string, language_code):
+    def __init__(self, input_string, language_code, eager_parse=True):
+        # subtitles are only parsed when iterated over or converted,
+        # regardless of eager_parse
         self.language_code = language_code
         self._pattern = None
 
@@ -22,39 +24,34 @@ class YoutubeParser(BaseTextParser):
         for sub in self.sub_set:
             yield sub
 
-    def to_internal(self):
-        if not hasattr(self, 'sub_set'):
-            try:
-                self.sub_set = SubtitleSet(self.language)
-                xml = etree.fromstring(self.input_string.encode('utf-8'))
-
-                has_subs = False
-                total_items = len(xml)
-                for i,item in enumerate(xml):
-                    duration = 0
-                    start = int(float(item.get('start')) * 1000)
-                    if hasattr(item, 'duration'):
-                        duration = int(float(item.get('dur', 0)) * 1000)
-                    elif i+1 < total_items:
-                        # youtube sometimes omits the duration attribute
-                        # in this case we're displaying until the next sub
-                        # starts
-                        next_item = xml[i+1]
-                        duration = int(float(next_item.get('start')) * 1000) - start
-                    else:
-                        # hardcode the last sub duration at 3 seconds
-                        duration = 3000
-                    end = start + duration
-                    text = item.text and unescape_html(item.text) or u''
-                    self.sub_set.append_subtitle(start, end, text)
-                    has_subs = True
-                if not has_subs:
-                    raise ValueError("No subs")
-            except Exception as e:
-                raise SubtitleParserError(original_error=e)
-
-
-        return self.sub_set
-
-
-register(YoutubeParser)
+    def _build(self, set_class):
+        try:
+            sub_set = set_class(self.language)
+            xml = etree.fromstring(self.input_string.encode('utf-8'))
+
+            subs = []
+            total_items = len(xml)
+            for i,item in enumerate(xml):
+                duration = 0
+                start = seconds_to_milliseconds(item.get('start'))
+                if hasattr(item, 'duration'):
+                    duration = seconds_to_milliseconds(item.get('dur', '0'))
+                elif i+1 < total_items:
+                    # youtube sometimes omits the duration attribute
+                    # in this case we're displaying until the next sub
+                    # starts
+                    next_item = xml[i+1]
+                    duration = seconds_to_milliseconds(next_item.get('start')) - start
+                else:
+                    # hardcode the last sub duration at 3 seconds
+                    duration = 3000
+                end = start + duration
+                text = item.text and unescape_html(item.text) or u''
+                subs.append((start, end, text))
+            if not subs:
+                raise ValueError("No subs")
+            sub_set.append_subtitles(subs)
+        except Exception as e:
+            raise SubtitleParserError(original_error=e)
+
+        return sub_set
@@ -0,0 +1,105 @@
+"""
+Lazy lookup of the parser and generator for each format.
+
+The built in formats are a static table of type -> 'module:Class', and a
+format's module is only imported the first time it's looked up, so that
+`import babelsubs` doesn't pay for lxml, bleach and the rest of what the
+formats need. Classes given to register() are used as they are, and take
+precedence over the table.
+"""
+
+import sys
+import types
+
+
+def import_object(path):
+    """Returns the object for a 'package.module:name' path."""
+    module_name, name = path.split(':')
+    __import__(module_name)
+    return getattr(sys.modules[module_name], name)
+
+
+class LazyRegistry(dict):
+    """
+    A dict of type -> class, with lower case keys, filled from table as
+    types are looked up.
+    """
+
+    def __init__(self, table):
+        super(LazyRegistry, self).__init__()
+        self.table = table
+
+    def register(self, handler):
+        file_type = handler.file_type
+        if isinstance(file_type, list):
+            for ft in file_type:
+                dict.__setitem__(self, ft.lower(), handler)
+        else:
+            dict.__setitem__(self, file_type.lower(), handler)
+
+    def __getitem__(self, item):
+        item = item.lower()
+        if not dict.__contains__(self, item):
+            if item not in self.table:
+                raise KeyError(item)
+            dict.__setitem__(self, item, import_object(self.table[item]))
+        return dict.__getitem__(self, item)
+
+    def get(self, item, default=None):
+        try:
+            return self[item]
+        except KeyError:
+            return default
+
+    def __contains__(self, item):
+        item = item.lower()
+        return dict.__contains__(self, item) or item in self.table
+
+    def keys(self):
+        return sorted(set(dict.keys(self)) | set(self.table))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+
+class LazyPackage(types.ModuleType):
+    """
+    Stands in for a package on sys.modules, importing some of its names
+    only when they are first used. See install_lazy_names.
+    """
+
+    def __init__(self, package, names):
+        super(LazyPackage, self).__init__(package.__name__, package.__doc__)
+        self.__dict__.update(package.__dict__)
+        # the original module clears its globals when it goes away
+        self._package = package
+        self._lazy_names = names
+
+    def __getattr__(self, name):
+        if name not in self._lazy_names:
+            raise AttributeError(name)
+        value = import_object(self._lazy_names[name])
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(self._lazy_names))
+
+
+def install_lazy_names(module_name, names):
+    """
+    Makes the names (name -> 'module:name') available on the package
+    module_name, imported on first use. Call it at the end of the package's
+    __init__.
+    """
+    package = sys.modules[module_name]
+    sys.modules[module_name] = LazyPackage(package, names)
@@ -0,0 +1,180 @@
+"""
+Opt-in instrumentation of parsing and generating.
+
+    with stats.collect() as collected:
+        babelsubs.load_from(data, 'srt').to('dfxp')
+    collected.timings   # {'decode': 0.001, 'match': 0.02, 'markup': ...}
+
+or pass a Stats as stats= to load_from, to, to_file or convert. While a
+Stats is collecting, babelsubs adds up the time spent on each stage:
+
+    decode      decoding the input into unicode
+    match       finding the cues on text inputs
+    markup      converting each cue's text into our markup (get_markup)
+    strip_tags  sanitizing text, part of markup for some formats
+    tree        building the TTML tree of a SubtitleSet
+    items       extracting subtitle_items (on a cache miss)
+    generate    serializing the output
+
+and counts input_bytes, input_chars, cues, output_chars, output_bytes and
+the items_cache hits and misses (see hit_rate). Stages can be nested
+(strip_tags runs inside markup), so timings don't add up to the total.
+
+Functions registered with register_hook are called with the Stats every
+time it stops collecting, e.g. to send the numbers to a metrics system.
+
+When nothing is collecting, the cost is a check of a module global on
+each instrumented call. Work done on other processes (see workers on
+load_from) isn't collected.
+"""
+
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+_local = threading.local()
+# how many Stats are collecting, on any thread, so that the common case
+# doesn't even look at the thread local
+_collecting = 0
+_lock = threading.Lock()
+
+_hooks = []
+
+
+def register_hook(hook):
+    """hook(stats) will be called every time a Stats stops collecting."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def unregister_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def collecting():
+    """Is anything collecting on this thread?"""
+    return bool(_active())
+
+
+def _active():
+    """Returns the Stats collecting on this thread, innermost last."""
+    if not _collecting:
+        return ()
+    return getattr(_local, 'stack', ())
+
+
+class Stats(object):
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        # collecting again while collecting (e.g. passing it as stats= on a
+        # with block) changes nothing
+        self._depth = 0
+
+    def __enter__(self):
+        global _collecting
+        self._depth += 1
+        if self._depth == 1:
+            if not hasattr(_local, 'stack'):
+                _local.stack = []
+            _local.stack.append(self)
+            with _lock:
+                _collecting += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        global _collecting
+        self._depth -= 1
+        if self._depth:
+            return
+        _local.stack.remove(self)
+        with _lock:
+            _collecting -= 1
+        for hook in list(_hooks):
+            hook(self)
+
+    def add_time(self, stage, seconds):
+        self.timings[stage] += seconds
+        self.calls[stage] += 1
+
+    def count(self, counter, amount=1):
+        self.counters[counter] += amount
+
+    def hit_rate(self, cache='items_cache'):
+        """Returns the fraction of hits on cache, None if it wasn't used."""
+        hits = self.counters.get('%s_hits' % cache, 0)
+        total = hits + self.counters.get('%s_misses' % cache, 0)
+        return float(hits) / total if total else None
+
+    def as_dict(self):
+        return {
+            'timings': dict(self.timings),
+            'calls': dict(self.calls),
+            'counters': dict(self.counters),
+            'items_cache_hit_rate': self.hit_rate(),
+        }
+
+
+def collect():
+    """Returns a new Stats, to be used as a context manager."""
+    return Stats()
+
+
+class _NoOp(object):
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        pass
+
+_noop = _NoOp()
+
+
+@contextmanager
+def _timing(stage, collectors):
+    started = time.time()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - started
+        for collector in collectors:
+            collector.add_time(stage, elapsed)
+
+
+def stage(name):
+    """Context manager that times a stage, if anything is collecting."""
+    collectors = _active()
+    if not collectors:
+        return _noop
+    return _timing(name, tuple(collectors))
+
+
+def count(counter, amount=1):
+    for collector in _active():
+        collector.count(counter, amount)
+
+
+def timed(name):
+    """Decorator that times every call to the function as the stage name."""
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            if not _collecting:
+                return fn(*args, **kwargs)
+            with stage(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorator
+
+
+def using(stats):
+    """Context manager collecting on stats, if it's not None."""
+    if stats is None:
+        return _noop
+    return stats
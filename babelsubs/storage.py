@@ -16,26 +16,29 @@
 # You should have received a copy of the GNU Affero General Public License along
 # with this program.  If not, see http://www.gnu.org/licenses/agpl-3.0.html.
 
-import difflib
+from copy import deepcopy
 from itertools import izip_longest, izip
 import os
 import re
 from lxml import etree
-from xml.sax.saxutils import escape as escape_xml
-from collections import namedtuple
 
-from babelsubs import utils
+from babelsubs import utils, markup, timecode, combine, stats
+from babelsubs.timeindex import TimeQueries
+from babelsubs.markup import escape_xml
+from babelsubs.items import SubtitleLine, NEW_PARAGRAPH_META_KEY, mappings_key
 
 SCHEMA_PATH =  os.path.join(os.getcwd(), "data", 'xsdchema', 'all.xsd')
 #schema = lxml.etree.XMLSchema(lxml.etree.parse(open(SCHEMA_PATH)))
 
-TIME_EXPRESSION_METRIC = re.compile(r'(?P<num>[\d]{1,})(?P<unit>(h|ms|s|m|f|t))')
-TIME_EXPRESSION_CLOCK_TIME = re.compile(r'(?P<hours>[\d]{2,3}):(?P<minutes>[\d]{2}):(?P<seconds>[\d]{2})(?:.(?P<fraction>[\d]{1,3}))?')
+from babelsubs.timecode import TIME_EXPRESSION_METRIC, TIME_EXPRESSION_CLOCK_TIME
 
-NEW_PARAGRAPH_META_KEY = 'new_paragraph'
 TTML_NAMESPACE_URI = 'http://www.w3.org/ns/ttml'
 TTML_NAMESPACE_URI_LEGACY = 'http://www.w3.org/2006/04/ttaf1'
 TTS_NAMESPACE_URI = 'http://www.w3.org/ns/ttml#styling'
+TTM_NAMESPACE_URI = 'http://www.w3.org/ns/ttml#metadata'
+XML_LANG_ATTR = '{http://www.w3.org/XML/1998/namespace}lang'
+TTM_TITLE_XPATH = './/{%s}title' % TTM_NAMESPACE_URI
+TTM_DESCRIPTION_XPATH = './/{%s}description' % TTM_NAMESPACE_URI
 
 
 NAMESPACE_DECL = {
@@ -45,7 +48,6 @@ NAMESPACE_DECL = {
 }
 VALID_ROOT_ELS = ('tt', 'body', 'div')
 
-SubtitleLine = namedtuple("SubtitleLine", ['start_time', 'end_time', 'text', 'meta'])
 
 def find_els(root_el, plain_xpath):
     """
@@ -89,33 +91,7 @@ def time_expression_to_milliseconds(time_expression, tick_rate=None):
     We don't support all possible forms now, only clock time, metric and tick.
     [1] http://www.w3.org/TR/ttaf1-dfxp/#timing-value-timeExpression
     """
-    if not time_expression:
-        return 0
-    match = TIME_EXPRESSION_CLOCK_TIME.match(time_expression)
-    if match:
-        groups = match.groupdict()
-        hour = int(groups['hours'])
-        minutes = int(groups['minutes'])
-        seconds  = int(groups['seconds'])
-        milliseconds = int(groups['fraction'] or 0)
-        return (((hour * 3600) + (minutes * 60) + seconds ) * 1000 ) + milliseconds
-    match = TIME_EXPRESSION_METRIC.match(time_expression)
-    if match:
-        groups = match.groupdict()
-        num, unit = int(groups['num']), groups['unit']
-        if unit == 't':
-            if not tick_rate:
-                raise ValueError("Ticks need a tick rate, mate.")
-            return 1000 * (num / float(tick_rate))
-        multiplier = {
-            "h": 3600 * 1000,
-            "m": 60 * 1000,
-            "s": 1000,
-            "ms": 1,
-            'f': 0,
-        }.get(unit, None)
-        return num * multiplier
-    raise ValueError("Time expression %s can't be parsed" % time_expression)
+    return timecode.parse_time_expression(time_expression, tick_rate)
 
 
 def milliseconds_to_time_clock_exp(milliseconds):
@@ -123,19 +99,39 @@ def milliseconds_to_time_clock_exp(milliseconds):
     Converts time components to a string suitable to be used on time expression
     fot ttml
     """
-    if milliseconds is None:
-        return None
-    expression = '%(hours)02d:%(minutes)02d:%(seconds)02d.%(milliseconds)03d'
-    return expression % utils.milliseconds_to_time_clock_components(milliseconds)
+    return timecode.format_clock(milliseconds)
 
 def to_clock_time(time_expression, tick_rate=None):
     """
     If time expression is not in clock time, transform it
     """
-    match = TIME_EXPRESSION_CLOCK_TIME.match(time_expression)
-    if match:
+    if timecode.is_clock_time(time_expression):
         return time_expression
-    return milliseconds_to_time_clock_exp(time_expression_to_milliseconds(time_expression, tick_rate))
+    return timecode.format_clock(timecode.parse_time_expression(time_expression, tick_rate))
+
+def normalized_times(el, tick_rate=None):
+    """
+    Returns the begin and end of a <p> as clock time expressions, the end
+    coming from dur if there's one. Missing or empty times are returned
+    as they are.
+    """
+    begin = get_attr(el, 'begin')
+    if begin:
+        begin = to_clock_time(begin, tick_rate)
+    end = get_attr(el, 'end')
+    if end:
+        end = to_clock_time(end, tick_rate)
+    dur = get_attr(el, 'dur')
+    if dur:
+        end = milliseconds_to_time_clock_exp(
+            time_expression_to_milliseconds(begin, tick_rate) +
+            time_expression_to_milliseconds(dur, tick_rate))
+    return begin, end
+
+def get_tick_rate(el):
+    """Returns the tickRate set on el as an int, None if there's none."""
+    value = get_attr(el, 'tickRate')
+    return int(value) if value else None
 
 class _Differ(object):
     """Class that does the work for diff()."""
@@ -166,10 +162,12 @@ class _Differ(object):
         }
 
     def calc_changed_amout(self, seq1, seq2):
+        import difflib
         sm = difflib.SequenceMatcher(None, seq1, seq2)
         return 1.0 - sm.ratio()
 
     def calc_subtitle_data(self, items1, items2):
+        import difflib
         sm = difflib.SequenceMatcher(
             None,
             [(i.start_time, i.end_time, i.text) for i in items1],
@@ -226,7 +224,7 @@ def diff(set_1, set_2, mappings=None):
     """
     return _Differ(set_1, set_2, mappings).result
 
-class SubtitleSet(object):
+class SubtitleSet(TimeQueries):
     BASE_TTML = r'''
         <tt xml:lang="%(language_code)s" xmlns="%(namespace_uri)s" xmlns:tts="http://www.w3.org/ns/ttml#styling" >
             <head>
@@ -265,7 +263,15 @@ class SubtitleSet(object):
     SUBTITLE_XML = r'''<p xmlns="http://www.w3.org/ns/ttml" %s %s>%s</p>'''
 
     SUBTITLE_DIV_XML = r'''<div xmlns="http://www.w3.org/ns/ttml"></div>'''
-    
+
+    # used by append_subtitles to parse a whole batch of subs in one go,
+    # each paragraph becomes one div
+    SUBTITLE_FRAGMENT_XML = r'''<p %s %s>%s</p>'''
+    SUBTITLES_FRAGMENT_XML = r'''<body xmlns="http://www.w3.org/ns/ttml" xmlns:tts="http://www.w3.org/ns/ttml#styling"><div>%s</div></body>'''
+
+    # the parsed BASE_TTML, new sets are copies of it
+    _base_ttml = None
+
     def __init__(self, language_code, initial_data=None, title=None,
                  description=None, normalize_time=True):
         """Create a new set of Subtitles, either empty or from a hunk of TTML.
@@ -275,44 +281,114 @@ class SubtitleSet(object):
         NO UNICODE ALLOWED!  USE XML ENTITIES TO REPRESENT UNICODE CHARACTERS!
 
         """
+        # subtitle_items results per mappings, see _get_items
+        self._items_cache = {}
+        self._version = 0
+
         if initial_data:
-            self._ttml = etree.fromstring(initial_data)
+            with stats.stage('tree'):
+                self._ttml = etree.fromstring(initial_data)
             self.tick_rate = self._get_tick_rate()
+            self._build_index()
             if normalize_time:
-                [self.normalize_time(x) for x in self.get_subtitles()]
+                [self.normalize_time(x) for x in self._els]
         else:
-            self._ttml = etree.fromstring(SubtitleSet.BASE_TTML % {
-                'namespace_uri': TTML_NAMESPACE_URI,
-                'title' : title or '',
-                'description': description or '',
-                'language_code': language_code or '',
-            })
+            self._ttml = self._new_ttml(language_code, title, description)
+            self.tick_rate = 1
+            self._build_index()
 
         if initial_data:
-            self.subtitles = self.subtitle_items()
-        else:
-            self.subtitles = None
+            # also makes sure all timing can be parsed
+            self._get_items(None)
+
+    @classmethod
+    def _new_ttml(cls, language_code, title, description):
+        """
+        Returns a fresh tree for an empty set. The template is only parsed
+        once, after that we just copy it and fill in the blanks.
+        """
+        if SubtitleSet._base_ttml is None:
+            SubtitleSet._base_ttml = etree.fromstring(SubtitleSet.BASE_TTML % {
+                'namespace_uri': TTML_NAMESPACE_URI,
+                'title' : '',
+                'description': '',
+                'language_code': '',
+            })
+        ttml = deepcopy(SubtitleSet._base_ttml)
+        ttml.set(XML_LANG_ATTR, language_code or '')
+        ttml.find(TTM_TITLE_XPATH).text = title or None
+        ttml.find(TTM_DESCRIPTION_XPATH).text = description or None
+        return ttml
 
     def __len__(self):
-        return len(self.get_subtitles())
+        return len(self._els)
+
+    @property
+    def language_code(self):
+        return self._ttml.get(XML_LANG_ATTR)
 
     def __getitem__(self, key):
-        if self.subtitles is None:
-            self.subtitles = self.subtitle_items()
-        return self.subtitles[key]
+        return self._get_items(None)[key]
 
-    def get_subtitles(self):
+    @property
+    def subtitles(self):
+        return self._get_items(None)
+
+    @subtitles.setter
+    def subtitles(self, items):
+        """
+        Replaces all the subtitles with items, (from_ms, to_ms, text, meta)
+        tuples as subtitle_items returns them. None only drops the cached
+        items.
+        """
+        if items is None:
+            self._changed()
+            return
+        items = list(items)
         divs = find_els(self._ttml, "/tt/body/div")
-        result = []
+        for div in divs[1:]:
+            div.getparent().remove(div)
+        for el in list(divs[0]) if divs else []:
+            divs[0].remove(el)
+        self._build_index()
+        if items:
+            # the first one starts a paragraph without opening a new <div>
+            meta = dict(items[0][3] if len(items[0]) > 3 else {}, new_paragraph=False)
+            items[0] = tuple(items[0][:3]) + (meta, )
+        self.append_subtitles(items)
+
+    def _changed(self):
+        """
+        Must be called by every method that changes subtitles, so cached
+        subtitle_items are not used anymore.
+        """
+        self._version += 1
 
-        for div in divs:
-            el_count = 0
+    def _build_index(self):
+        """
+        Walks the tree once and keeps an ordered list of the <p> elements,
+        plus the last <body> and <div> so appends don't have to look them
+        up again.
 
-            for el in find_els(div, 'p'):
-                el_count += 1
-                result.append(el)
+        Every method that adds or removes elements must keep this in sync,
+        if you change the tree behind our back call this again.
+        """
+        divs = find_els(self._ttml, "/tt/body/div")
+        bodies = find_els(self._ttml, "/tt/body")
+        self._els = []
+        for div in divs:
+            self._els.extend(find_els(div, 'p'))
+        self._last_div = divs[-1] if divs else None
+        self._last_body = bodies[-1] if bodies else None
+        self._changed()
 
-        return result
+    def get_subtitles(self):
+        """
+        Returns the <p> elements. They're the live tree, so the cached
+        subtitle_items are dropped, in case they get changed.
+        """
+        self._changed()
+        return list(self._els)
 
     def append_subtitle(self, from_ms, to_ms, content, new_paragraph=False,
                         escape=True):
@@ -321,32 +397,70 @@ class SubtitleSet(object):
         NO UNICODE ALLOWED!  USE XML ENTITIES TO REPRESENT UNICODE CHARACTERS!
 
         """
-        
-        begin_value = milliseconds_to_time_clock_exp(from_ms)
-        begin = 'begin="%s"' % begin_value if begin_value  is not None else ''
-        end_value = milliseconds_to_time_clock_exp(to_ms)
-        end = 'end="%s"' %  end_value if end_value is not None else ''
+        self.append_subtitles(
+            [(from_ms, to_ms, content, {'new_paragraph': new_paragraph})],
+            escape=escape)
+
+    def append_subtitles(self, subtitles, escape=True):
+        """Append many subtitles to the end of the list.
+
+        subtitles is an iterable of (from_ms, to_ms, content) tuples, with
+        an optional fourth item being a dict of extra arguments as you'd
+        send to append_subtitle (new_paragraph and escape).
+
+        All the subs are parsed at once, which is a lot faster than calling
+        append_subtitle for each one.
+        """
+        paragraphs = []
+        current = []
+        for s in subtitles:
+            new_paragraph, item_escape = False, escape
+            if len(s) > 3:
+                new_paragraph = s[3].get('new_paragraph', False)
+                item_escape = s[3].get('escape', escape)
+            from_ms, to_ms, content = s[:3]
+
+            begin_value = milliseconds_to_time_clock_exp(from_ms)
+            begin = 'begin="%s"' % begin_value if begin_value  is not None else ''
+            end_value = milliseconds_to_time_clock_exp(to_ms)
+            end = 'end="%s"' %  end_value if end_value is not None else ''
+            if item_escape:
+                content = escape_xml(content)
+
+            if new_paragraph:
+                paragraphs.append(current)
+                current = []
+            current.append(SubtitleSet.SUBTITLE_FRAGMENT_XML % (begin, end, content))
+        paragraphs.append(current)
+
+        if len(paragraphs) == 1 and not current:
+            return
 
-        if escape:
-            content = escape_xml(content)
-        p = etree.fromstring(SubtitleSet.SUBTITLE_XML % (begin, end, content))
+        with stats.stage('tree'):
+            self._append_paragraphs(paragraphs)
+
+    def _append_paragraphs(self, paragraphs):
+        fragment = etree.fromstring(SubtitleSet.SUBTITLES_FRAGMENT_XML %
+            '</div><div>'.join(''.join(p) for p in paragraphs))
         # fromstring has no sane way to set an attribute namespace (yay)
-        spans = [el for el in p.getchildren() if el.tag.endswith('span')]
-        for span in spans:
-            # so we delete the old attrib, and add the new one with the
-            # prefixed namespace
+        # so we delete the old attrib, and add the new one with the
+        # prefixed namespace
+        for span in fragment.iter('{%s}span' % TTML_NAMESPACE_URI):
             for attr_name, value in span.attrib.items():
                 if attr_name in ('fontStyle', 'textDecoration', 'fontWeight'):
                     span.set('{%s}%s' % (TTS_NAMESPACE_URI , attr_name), value)
                     del span.attrib[attr_name]
 
-
-        div = find_els(self._ttml, '/tt/body/div')[-1]
-        if new_paragraph:
-            body = find_els(self._ttml, '/tt/body')[-1]
-            div = etree.fromstring(SubtitleSet.SUBTITLE_DIV_XML)
-            body.append(div)
-        div.append(p)
+        # create the divs on the same namespace as the body, else
+        # legacy documents would not find them when read back
+        div_tag = self._last_body.tag.replace('}body', '}div')
+        for i, div in enumerate(fragment.getchildren()):
+            if i > 0:
+                self._last_div = etree.SubElement(self._last_body, div_tag)
+            els = div.getchildren()
+            self._last_div.extend(els)
+            self._els.extend(els)
+        self._changed()
 
     def normalize_time(self, el):
         """
@@ -355,22 +469,14 @@ class SubtitleSet(object):
 
         Changes node in place
         """
-        begin = get_attr(el, 'begin')
-        if begin:
-            begin = to_clock_time(begin, self.tick_rate)
-        end = get_attr(el, 'end')
-        if end:
-            end = to_clock_time(end, self.tick_rate)
-        dur = get_attr(el, 'dur')
-        if dur :
-            end= milliseconds_to_time_clock_exp(
-                time_expression_to_milliseconds(begin, self.tick_rate) + \
-                time_expression_to_milliseconds(dur, self.tick_rate))
+        begin, end = normalized_times(el, self.tick_rate)
+        if get_attr(el, 'dur'):
             el.attrib.pop('dur')
         if begin:
             el.attrib['begin'] = begin
         if end:
             el.attrib['end'] = end
+        self._changed()
 
     def subtitle_items(self, mappings=None):
         """
@@ -380,29 +486,67 @@ class SubtitleSet(object):
         that we can parse.
 
         Meta is a dict with additional information.
+
+        Results are cached per mappings until the set changes, so
+        extracting the same items many times is cheap. The items (and
+        their meta dicts) are shared with the cache, copy them before
+        changing them.
+        """
+        return list(self._get_items(mappings))
+
+    def _get_items(self, mappings):
         """
+        Returns the cached list from subtitle_items, which must not be
+        changed.
+        """
+        key = mappings_key(mappings)
+        cached = self._items_cache.get(key)
+        if cached is not None and cached[0] == self._version:
+            stats.count('items_cache_hits')
+            return cached[1]
+        stats.count('items_cache_misses')
+
         result = []
 
-        for el in self.get_subtitles():
-            # bool(el.getprevious()) doesn't do what you'd think
-            # use 'is None'
-            meta = {
-                NEW_PARAGRAPH_META_KEY: True if el.getprevious()is None  else False
-            }
-            result.append(self._extract_from_el(el, meta, mappings))
+        with stats.stage('items'):
+            for el in self._els:
+                # bool(el.getprevious()) doesn't do what you'd think
+                # use 'is None'
+                meta = {
+                    NEW_PARAGRAPH_META_KEY: True if el.getprevious()is None  else False
+                }
+                result.append(self._extract_from_el(el, meta, mappings))
 
-        self.subtitles = result
+        self._items_cache[key] = (self._version, result)
         return result
 
-    def _extract_from_el(self, el, meta, mappings):
-        begin = get_attr(el, 'begin')
-        end = get_attr(el, 'end')
+    def _extract_cues(self, positions=None):
+        """
+        Returns a list of (from_ms, to_ms, markup, new_paragraph) tuples,
+        markup being a babelsubs.markup.Markup. Rendering those gives the
+        same text as subtitle_items.
 
+        If positions are given, only those subtitles are extracted.
+        """
+        result = []
+        els = self._els if positions is None else [self._els[i] for i in positions]
+        for el in els:
+            from_ms, to_ms = self._get_el_times(el)
+            result.append((from_ms, to_ms, markup.markup_from_element(el),
+                           el.getprevious() is None))
+        return result
 
+    def _get_el_times(self, el):
+        begin = get_attr(el, 'begin')
+        end = get_attr(el, 'end')
         from_ms = (time_expression_to_milliseconds(begin)
                 if begin  is not None and begin is not '' else None)
         to_ms = (time_expression_to_milliseconds(end)
                 if end is not None and end is not '' else None)
+        return from_ms, to_ms
+
+    def _extract_from_el(self, el, meta, mappings):
+        from_ms, to_ms = self._get_el_times(el)
         if not mappings:
             content = get_contents(el)
         else:
@@ -410,52 +554,18 @@ class SubtitleSet(object):
 
         return SubtitleLine(from_ms, to_ms, content, meta)
 
-    def __clear_namespace(self, name):
-        return name.split("}")[-1] if '}' in name else name
-
     def item_is_synced(self, el):
         return 'begin' in el.attrib and 'end' in el.attrib
 
     @property
     def fully_synced(self):
-        for item in self.get_subtitles():
+        for item in self._els:
             if not self.item_is_synced(item):
                 return False
         return True
 
     def get_content_with_markup(self, el, mappings):
-        text = [el.text or '']
-        for child in el.iterdescendants():
-            # no i don't want  to deal with namespaces right now sorry
-            attrs = dict([(self.__clear_namespace(n), v) for n, v in child.items()])
-
-            tag = self.__clear_namespace(child.tag)
-
-            if tag == 'span':
-                value = "%s"
-
-                if attrs.get('fontWeight', '') == 'bold' and 'bold' in mappings:
-                    value = value % mappings.get("bold", "")
-
-                if attrs.get('fontStyle', '') == 'italic' and 'italics' in mappings:
-                    value = value % mappings.get("italics", "")
-
-                if attrs.get('textDecoration', '') == 'underline' and 'underline' in mappings:
-                    value = value % mappings.get("underline", "")
-
-                text.append(value % (child.text or ''))
-
-            if tag == "br":
-                text.append(mappings.get("linebreaks", ""))
-
-            if child.tail:
-                text.append(child.tail)
-
-        if el.tail:
-            text.append(el.tail)
-
-        return ''.join(filter(None, text)).strip()
-
+        return markup.render_markup(markup.markup_from_element(el), mappings)
 
     def update(self, subtitle_index, from_ms=None, to_ms=None):
         """Updates the subtitle on index subtitle_index with the
@@ -465,11 +575,78 @@ class SubtitleSet(object):
         utils.UNSYNCED_TIME_FULL  as the value to pass
         TODO: Implement content change (beware of escaping
         """
-        el = self.get_subtitles()[subtitle_index]
+        el = self._els[subtitle_index]
         if from_ms is not None:
             el.set('begin',   milliseconds_to_time_clock_exp(from_ms) )
         if to_ms is not None:
             el.set('end',  milliseconds_to_time_clock_exp(to_ms) )
+        self._changed()
+
+    def shift(self, offset_ms, start=None, end=None):
+        """Moves the timing of all synced subtitles by offset_ms, which
+        can be negative. (in place)
+
+        If start and / or end are given, only subtitles that begin in
+        [start, end) are moved. Times never go below zero.
+        """
+        self._retime(lambda t: max(0, int(t + offset_ms)), start, end)
+
+    def scale(self, factor, anchor_ms=0):
+        """Stretches the timing of all synced subtitles by factor, around
+        anchor_ms. (in place)
+
+        e.g. for a 23.976 to 25 fps conversion use scale(23.976 / 25)
+        """
+        self._retime(lambda t: max(0, int(round(anchor_ms + (t - anchor_ms) * factor))))
+
+    def remap(self, mapping):
+        """Changes the timing of all synced subtitles using mapping. (in place)
+
+        mapping is either a callable that takes and returns milliseconds,
+        or two (old_ms, new_ms) points, which define a linear correction,
+        useful to fix drift. e.g. ((1000, 1000), (3600000, 3601500)).
+        """
+        fn = timecode.mapping_function(mapping)
+        self._retime(lambda t: max(0, int(round(fn(t)))))
+
+    def _retime(self, fn, start=None, end=None):
+        """
+        Reads all begin / end times, runs them through fn and writes
+        them back in one pass. Unsynced times are left alone, and so are
+        subtitles beginning outside [start, end) if those are given.
+        """
+        begins = self._get_el_times_of('begin')
+        ends = self._get_el_times_of('end')
+
+        if start is not None or end is not None:
+            selected = [b is not None and
+                        (start is None or b >= start) and
+                        (end is None or b < end) for b in begins]
+        else:
+            selected = [True] * len(begins)
+
+        new_begins = [fn(t) if t is not None and sel else None
+                      for t, sel in izip(begins, selected)]
+        new_ends = [fn(t) if t is not None and sel else None
+                    for t, sel in izip(ends, selected)]
+
+        for el, b, e in izip(self._els, timecode.format_clock_times(new_begins),
+                             timecode.format_clock_times(new_ends)):
+            if b is not None:
+                el.set('begin', b)
+            if e is not None:
+                el.set('end', e)
+        self._changed()
+
+    def _get_el_times_of(self, attr):
+        """
+        Returns the attr ('begin' or 'end') of all subtitles in ms, None
+        for the ones that are missing or unsynced.
+        """
+        values = timecode.parse_time_expressions(
+            [el.get(attr) for el in self._els], self.tick_rate)
+        return [None if value is None or value >= utils.UNSYNCED_TIME_FULL else value
+                for value in values]
 
     @classmethod
     def from_list(cls, language_code, subtitles, escape=False):
@@ -485,15 +662,30 @@ class SubtitleSet(object):
 
         """
         subs = SubtitleSet(language_code=language_code)
+        subs.append_subtitles(subtitles, escape=escape)
+        return subs
 
+    @classmethod
+    def concat(cls, parts, offsets=None, language_code=None):
+        """Return a SubtitleSet with the subtitles of all parts, one after the
+        other.
 
-        for s in subtitles:
-            extra = {}
-            if len(s) > 3:
-               extra = s[3]
-               s = s[:-1]
-            extra['escape'] = escape
-            subs.append_subtitle( *s, **extra)
+        offsets are the ms to add to the times of each part, e.g. where
+        each part starts on the whole video. Each part starts a paragraph.
+        """
+        subs = cls(language_code or parts[0].language_code)
+        subs.append_subtitles(combine.concat_cues(parts, offsets), escape=False)
+        return subs
+
+    @classmethod
+    def merge(cls, sets, language_code=None):
+        """Return a SubtitleSet with the subtitles of all sets, sorted by start
+        time, e.g. to mix captions with a sound effects track.
+
+        Unsynced subtitles go last.
+        """
+        subs = cls(language_code or sets[0].language_code)
+        subs.append_subtitles(combine.merge_cues(sets), escape=False)
         return subs
 
     def _get_tick_rate(self):
@@ -504,10 +696,9 @@ class SubtitleSet(object):
             raise SubtitleParserError(
                 "No valid root elements found, we'll accept 'tt, body and div",
                 original_error=e)
-        for name,value in tt.attrib.items():
-            if name == "tickRate":
-                return int(value)
-        return 1
+        # ttp:tickRate belongs on the root, but we used to read it from
+        # the first div
+        return get_tick_rate(self._ttml) or get_tick_rate(tt) or 1
  
     def __eq__(self, other):
         if type(self) == type(other):
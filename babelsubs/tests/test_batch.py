@@ -0,0 +1,85 @@
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs.batch import ConversionJob
+from babelsubs.parsers import SubtitleParserError
+from babelsubs.tests import utils
+
+
+class ConvertManyTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bad_file = os.path.join(self.directory, 'bad.srt')
+        with open(self.bad_file, 'w') as f:
+            f.write("this\n\nisnot a valid subs format")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _jobs(self):
+        jobs = [(utils.get_data_file_path(name), 'sbv')
+                for name in ['simple.srt', 'simple.dfxp', 'simple.ssa']]
+        jobs.append(ConversionJob(self.bad_file, 'sbv'))
+        return jobs
+
+    def _check(self, batch):
+        results = dict((result.job.path, result) for result in batch)
+        self.assertEqual(len(results), 4)
+        for path, result in results.items():
+            if path == self.bad_file:
+                self.assertIsInstance(result.error, SubtitleParserError)
+                self.assertIsNone(result.output)
+            else:
+                self.assertIsNone(result.error)
+                self.assertEqual(result.output,
+                                 babelsubs.load_from_file(path).to('sbv'))
+        self.assertEqual((batch.succeeded, batch.failed), (3, 1))
+        self.assertTrue(batch.throughput[0] > 0)
+
+    def test_processes(self):
+        self._check(babelsubs.convert_many(self._jobs(), workers=2))
+
+    def test_threads(self):
+        self._check(babelsubs.convert_many(self._jobs(), workers=2, threads=True))
+
+    def test_inline(self):
+        self._check(babelsubs.convert_many(self._jobs(), workers=1))
+
+    def test_malformed_dfxp(self):
+        # lxml's errors don't survive pickling, which used to leave the
+        # pool waiting forever for this result
+        jobs = [(utils.get_data_file_path(name), 'sbv')
+                for name in ['from-n.dfxp', 'simple.srt']]
+        results = dict((result.job.path, result)
+                       for result in babelsubs.convert_many(jobs, workers=2))
+        error = results[jobs[0][0]].error
+        self.assertIsInstance(error, SubtitleParserError)
+        self.assertIn('XMLSyntaxError', error.args[1])
+        self.assertIsNone(results[jobs[1][0]].error)
+
+    def test_output_path(self):
+        output_path = os.path.join(self.directory, 'out.srt')
+        job = ConversionJob(utils.get_data_file_path('simple.sbv'), 'srt',
+                            output_path=output_path)
+        result = list(babelsubs.convert_many([job], workers=1))[0]
+        self.assertIsNone(result.output)
+        with open(output_path) as f:
+            self.assertEqual(f.read().decode('utf-8'), utils.get_subs('simple.sbv').to('srt'))
+
+    def test_init_worker(self):
+        # the workers import the formats the jobs use before the first one
+        script = ("import sys\n"
+                  "from babelsubs.batch import _init_worker\n"
+                  "_init_worker(['srt', 'unknown'], ['sbv'])\n"
+                  "print(' '.join(sorted(sys.modules)))")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        modules = subprocess.check_output([sys.executable, '-c', script], cwd=root).split()
+        self.assertIn('babelsubs.parsers.srt', modules)
+        self.assertIn('babelsubs.generators.sbv', modules)
+        self.assertNotIn('babelsubs.parsers.dfxp', modules)
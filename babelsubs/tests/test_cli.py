@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs import cli
+from babelsubs.compact import CompactSubtitleSet
+from babelsubs.storage import SubtitleSet
+from babelsubs.tests import utils
+
+
+class CLITest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _run(self, argv, stdin=''):
+        stdout, stderr = BytesIO(), BytesIO()
+        code = cli.main(argv, stdin=BytesIO(stdin), stdout=stdout, stderr=stderr)
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_convert_pipe(self):
+        for name, from_type in [('simple.srt', 'srt'), ('simple.sbv', 'sbv'),
+                                ('simple.dfxp', 'dfxp')]:
+            with open(utils.get_data_file_path(name)) as f:
+                data = f.read()
+            code, output, _ = self._run(['convert', '-f', from_type, '-t', 'sbv'], data)
+            self.assertEqual(code, 0)
+            self.assertEqual(output.decode('utf-8'), utils.get_subs(name).to('sbv'))
+
+    def test_load(self):
+        # only DFXP to DFXP goes through a SubtitleSet
+        for name, from_type, to_type, expected in [
+                ('simple.sbv', 'sbv', 'srt', CompactSubtitleSet),
+                ('youtube.xml', 'youtube', 'dfxp', CompactSubtitleSet),
+                ('simple.dfxp', 'dfxp', 'srt', CompactSubtitleSet),
+                ('simple.dfxp', 'dfxp', 'dfxp', SubtitleSet)]:
+            with open(utils.get_data_file_path(name), 'rb') as f:
+                subs = cli._load(f, from_type, 'en', to_type)
+            self.assertIsInstance(subs, expected)
+            with open(utils.get_data_file_path(name), 'rb') as f:
+                expected_subs = babelsubs.load_from(f.read(), from_type).to_internal()
+            self.assertEqual(subs.subtitle_items(), expected_subs.subtitle_items())
+
+    def test_convert_files(self):
+        output_path = os.path.join(self.directory, 'out.ssa')
+        code, _, _ = self._run(['convert', utils.get_data_file_path('simple.srt'),
+                                '-o', output_path])
+        self.assertEqual(code, 0)
+        with open(output_path) as f:
+            self.assertEqual(f.read().decode('utf-8'), utils.get_subs('simple.srt').to('ssa'))
+
+    def test_convert_error(self):
+        code, _, error = self._run(['convert', '-f', 'srt', '-t', 'sbv'], 'not subs')
+        self.assertEqual(code, 1)
+        self.assertIn("can't parse", error)
+
+    def test_batch(self):
+        source = os.path.join(self.directory, 'in')
+        os.makedirs(os.path.join(source, 'nested'))
+        shutil.copy(utils.get_data_file_path('simple.srt'), source)
+        shutil.copy(utils.get_data_file_path('simple.sbv'),
+                    os.path.join(source, 'nested'))
+        with open(os.path.join(source, 'bad.srt'), 'w') as f:
+            f.write('not subs')
+        with open(os.path.join(source, 'notes.md'), 'w') as f:
+            f.write('ignored')
+        target = os.path.join(self.directory, 'out')
+
+        code, output, progress = self._run(['batch', source, target, '-t', 'json', '-j', '1'])
+        self.assertEqual(code, 1)
+        self.assertIn('2 converted, 1 failed', output)
+        self.assertEqual(progress.count('\n'), 3)
+        self.assertTrue(os.path.exists(os.path.join(target, 'simple.json')))
+        self.assertTrue(os.path.exists(os.path.join(target, 'nested', 'simple.json')))
+
+        shutil.rmtree(target)
+        code, output, _ = self._run(['batch', source, target, '-t', 'json',
+                                     '-g', 'simple*', '-q', '-j', '2'])
+        self.assertEqual(code, 0)
+        self.assertIn('2 converted, 0 failed', output)
+
+    def test_batch_manifest(self):
+        source = os.path.join(self.directory, 'in')
+        os.makedirs(source)
+        shutil.copy(utils.get_data_file_path('simple.srt'), source)
+        shutil.copy(utils.get_data_file_path('simple.sbv'), source)
+        target = os.path.join(self.directory, 'out')
+        args = ['batch', source, target, '-t', 'json', '-j', '1', '-m',
+                os.path.join(self.directory, 'manifest.sqlite')]
+
+        code, output, _ = self._run(args)
+        self.assertEqual(code, 0)
+        self.assertIn('0 unchanged', output)
+        self.assertIn('2 converted', output)
+        code, output, progress = self._run(args)
+        self.assertEqual(code, 0)
+        self.assertIn('2 unchanged', output)
+        self.assertIn('0 converted', output)
+        self.assertEqual(progress, '')
+
+    def test_info(self):
+        code, output, _ = self._run(['info', utils.get_data_file_path('simple.srt')])
+        self.assertEqual(code, 0)
+        self.assertIn('subtitles: 19', output)
+        self.assertIn('format: srt', output)
+        self.assertIn('synced: yes', output)
@@ -0,0 +1,124 @@
+# encoding: utf-8
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs import markup
+from babelsubs.compact import CompactSubtitleSet
+from babelsubs.generators.srt import SRTGenerator
+from babelsubs.generators.sbv import SBVGenerator
+from babelsubs.parsers.sbv import SBVParser
+from babelsubs.parsers.base import SubtitleParserError
+from babelsubs.storage import SubtitleSet
+from babelsubs.tests import utils
+
+TEXT_FORMATS = ['srt', 'sbv', 'ssa', 'txt', 'json']
+
+
+class CompactSubtitleSetTest(TestCase):
+
+    def test_same_output_as_subtitle_set(self):
+        for file_name in ['simple.srt', 'simple.sbv', 'simple.ssa',
+                          'Untimed_text.srt', 'timed_text.srt',
+                          'with-information-header.sbv']:
+            full = utils.get_subs(file_name).to_internal()
+            compact = utils.get_subs(file_name).to_compact()
+            self.assertIsInstance(compact, CompactSubtitleSet)
+            self.assertEqual(len(full), len(compact))
+            for type in TEXT_FORMATS:
+                self.assertEqual(babelsubs.to(full, type),
+                                 babelsubs.to(compact, type))
+            self.assertEqual(full.to_xml(), compact.to_xml())
+
+    def test_from_subtitle_set(self):
+        full = utils.get_subs("simple.dfxp").to_internal()
+        compact = CompactSubtitleSet.from_subtitle_set(full)
+        for mappings in [None, SRTGenerator.MAPPINGS, SBVGenerator.MAPPINGS]:
+            self.assertEqual(full.subtitle_items(mappings),
+                             compact.subtitle_items(mappings))
+
+    def test_namespaced_attributes(self):
+        full = SubtitleSet('en')
+        full.append_subtitles([
+            (0, 1000, '<span tts:color="red" xml:lang="fr">rouge</span> and '
+                      '<span fontWeight="bold">bold</span>'),
+            (1000, 2000, '<span xmlns:x="urn:x" x:note="n">other</span>')], escape=False)
+        compact = CompactSubtitleSet.from_subtitle_set(full)
+        copy = SubtitleSet('en', compact.to_xml())
+        # the same attributes, in the same namespaces
+        self.assertEqual([sorted(span.items()) for el in copy.get_subtitles() for span in el],
+                         [sorted(span.items()) for el in full.get_subtitles() for span in el])
+        self.assertIn('tts:color="red"', compact._texts[0])
+        self.assertIn('xml:lang="fr"', compact._texts[0])
+        self.assertEqual(markup.parse_markup(compact._texts[1]),
+                         markup.markup_from_element(full.get_subtitles()[1])._replace(tail=None))
+        self.assertRaises(ValueError, markup.parse_markup, '<span x:note="n">a</span>')
+
+    def test_paragraphs(self):
+        subs = [(x * 1000, x * 1000 + 999, "Sub %s" % x,
+                 {'new_paragraph': x % 3 == 0}) for x in xrange(0, 20)]
+        full = SubtitleSet.from_list('en', subs)
+        compact = CompactSubtitleSet.from_list('en', subs)
+        self.assertEqual(full.subtitle_items(), compact.subtitle_items())
+        self.assertEqual(full.to_xml(), compact.to_xml())
+
+    def test_access(self):
+        compact = CompactSubtitleSet('en')
+        compact.append_subtitle(0, 1000, "a & b")
+        compact.append_subtitle(None, None, "<i>escaped</i>")
+        self.assertEqual(compact[0].text, "a & b")
+        self.assertEqual(compact[-1].text, "<i>escaped</i>")
+        self.assertEqual(compact[-1].start_time, None)
+        self.assertEqual([x.text for x in compact[:1]], ["a & b"])
+        self.assertRaises(IndexError, compact.__getitem__, 2)
+        self.assertFalse(compact.fully_synced)
+        compact.update(1, 2000, 3000)
+        self.assertTrue(compact.fully_synced)
+        self.assertEqual((compact[1].start_time, compact[1].end_time), (2000, 3000))
+
+    def test_invalid_markup(self):
+        with self.assertRaises(SubtitleParserError):
+            SBVParser(u"0:00:01.000,0:00:02.000\na < b\n", 'en').to_compact()
+        with self.assertRaises(SubtitleParserError):
+            SBVParser(u"0:00:01.000,0:00:02.000\na < b\n", 'en').to_internal()
+
+    def test_items_cache(self):
+        compact = utils.get_subs("simple.srt").to_compact()
+        items = compact.subtitle_items(SRTGenerator.MAPPINGS)
+        self.assertIs(compact._get_items(SRTGenerator.MAPPINGS),
+                      compact._get_items(dict(SRTGenerator.MAPPINGS)))
+        compact.update(0, from_ms=1)
+        self.assertEqual(compact.subtitle_items(SRTGenerator.MAPPINGS)[0].start_time, 1)
+        compact.append_subtitle(0, 1, 'new')
+        self.assertEqual(len(compact.subtitle_items(SRTGenerator.MAPPINGS)), len(items) + 1)
+
+
+class MarkupTest(TestCase):
+
+    CONTENTS = [
+        'plain text',
+        '  spaced  ',
+        'a &amp; b &lt;&gt; &#233; &#xe9;',
+        'line<br/>break<br />again',
+        'a <span fontWeight="bold">bold</span> word',
+        'a <span tts:fontStyle="italic" fontWeight="bold">both</span>',
+        '<span textDecoration="underline">word on <span fontStyle="italic">nested</span> spans</span> tail',
+        'unknown <a href="x">tag</a> content',
+        'windows\r\nline ends\r',
+        u'non ascii ção',
+    ]
+
+    def test_same_as_lxml(self):
+        subs = SubtitleSet('en')
+        subs.append_subtitles([(0, 1, x) for x in self.CONTENTS], escape=False)
+        for content, el in zip(self.CONTENTS, subs.get_subtitles()):
+            parsed = markup.parse_markup(content)
+            self.assertEqual(parsed, markup.markup_from_element(el)._replace(tail=None))
+            for mappings in [None, SRTGenerator.MAPPINGS, SBVGenerator.MAPPINGS]:
+                self.assertEqual(markup.render(parsed, mappings),
+                                 subs._extract_from_el(el, {}, mappings).text)
+            self.assertEqual(markup.parse_markup(markup.markup_to_content(parsed)), parsed)
+
+    def test_invalid(self):
+        for content in ['a < b', 'a & b', '&nbsp;', '<i>unclosed',
+                        '<i>bad</b>', 'stray</i>', u'\x01']:
+            self.assertRaises(ValueError, markup.parse_markup, content)
@@ -0,0 +1,46 @@
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs.parsers import SubtitleParserError
+from babelsubs.tests import utils
+
+TYPES = ['srt', 'sbv', 'ssa', 'txt', 'json', 'dfxp']
+FILES = [('simple.srt', 'srt'), ('Untimed_text.srt', 'srt'),
+         ('timed_text.srt', 'srt'), ('simple.sbv', 'sbv'),
+         ('with-information-header.sbv', 'sbv'), ('simple.ssa', 'ssa'),
+         ('simple.dfxp', 'dfxp'), ('pre-drm.dfxp', 'dfxp'),
+         ('youtube.xml', 'youtube')]
+
+
+class ConvertTest(TestCase):
+
+    def _inputs(self):
+        for file_name, from_type in FILES:
+            with open(utils.get_data_file_path(file_name)) as f:
+                yield f.read(), from_type
+        # there's no json fixture, so make one
+        yield utils.get_subs('simple.srt').to('json'), 'json'
+
+    def test_same_as_load_and_to(self):
+        for data, from_type in self._inputs():
+            for to_type in TYPES:
+                expected = babelsubs.load_from(data, from_type, 'en').to(to_type)
+                self.assertEqual(babelsubs.convert(data, from_type, to_type, 'en'),
+                                 expected)
+                self.assertEqual(babelsubs.convert(data, from_type, to_type, 'en',
+                                                   use_subtitle_set=True),
+                                 expected)
+            # without a language too
+            self.assertEqual(babelsubs.convert(data, from_type, 'srt'),
+                             babelsubs.load_from(data, from_type).to('srt'))
+
+    def test_file(self):
+        with open(utils.get_data_file_path('simple.srt')) as f:
+            output = babelsubs.convert(f, None, 'sbv')
+        self.assertEqual(output, utils.get_subs('simple.srt').to('sbv'))
+
+    def test_errors(self):
+        with self.assertRaises(SubtitleParserError):
+            babelsubs.convert(u"this\n\nisnot a valid subs format", 'srt', 'sbv')
+        with self.assertRaises(KeyError):
+            babelsubs.convert(u"", 'srt', 'badformat')
@@ -1,12 +1,15 @@
 # encoding: utf-8
+from io import BytesIO
 from unittest2 import TestCase
 
 from lxml.etree import XMLSyntaxError
 
 from babelsubs.parsers.dfxp import DFXPParser
 from babelsubs.generators.dfxp import DFXPGenerator
+from babelsubs.generators.srt import SRTGenerator
 from babelsubs.parsers.base import SubtitleParserError
 from babelsubs.storage import  SubtitleSet, get_attr
+from babelsubs.compact import CompactSubtitleSet
 
 from babelsubs.tests import utils
 from babelsubs import load_from
@@ -84,3 +87,39 @@ class DFXPParsingTest(TestCase):
         with self.assertRaises(SubtitleParserError):
             DFXPParser ("this\n\nisnot a valid subs format","en")
 
+    def test_iter_cues(self):
+        for file_name in ['simple.dfxp', 'pre-drm.dfxp', 'normalize-time.dfxp',
+                          'dfxp-as-front-end-no-sync.dfxp']:
+            expected = CompactSubtitleSet.from_subtitle_set(
+                utils.get_subs(file_name).to_internal())
+            with open(utils.get_data_file_path(file_name), 'rb') as f:
+                subs = CompactSubtitleSet.from_list(expected.language_code,
+                                                    DFXPParser.iter_cues(f))
+            self.assertEqual(subs, expected)
+            self.assertEqual(subs.subtitle_items(SRTGenerator.MAPPINGS),
+                             expected.subtitle_items(SRTGenerator.MAPPINGS))
+
+    def test_iter_cues_tick_rate(self):
+        data = (u'<tt xmlns="http://www.w3.org/ns/ttml" '
+                u'xmlns:ttp="http://www.w3.org/ns/ttml#parameter" ttp:tickRate="10">'
+                u'<body><div><p begin="10t" dur="25t">one</p></div>'
+                u'<div><p begin="40t" end="50t">two</p><p>three</p></div></body></tt>')
+        cues = list(DFXPParser.iter_cues(BytesIO(data.encode('utf-8'))))
+        self.assertEqual([cue[:3] for cue in cues],
+                         [(1000, 3500, u'one'), (4000, 5000, u'two'), (None, None, u'three')])
+        self.assertEqual([cue[3]['new_paragraph'] for cue in cues], [False, True, False])
+        # the same the SubtitleSet gives
+        subs = CompactSubtitleSet.from_subtitle_set(DFXPParser(data, 'en').to_internal())
+        self.assertEqual(CompactSubtitleSet.from_list(None, cues), subs)
+
+    def test_iter_cues_clears(self):
+        # everything read is dropped from the tree as we go
+        data = (u'<tt xmlns="http://www.w3.org/ns/ttml"><body><div>%s</div></body></tt>' %
+                u''.join(u'<p begin="%ss">line</p>' % i for i in xrange(100)))
+        cues = DFXPParser.iter_cues(BytesIO(data.encode('utf-8')))
+        for i in xrange(50):
+            next(cues)
+        div = cues.gi_frame.f_locals['root'][0][0]
+        # the one before the last yielded is kept, cleared
+        self.assertEqual(div[0].get('begin'), None)
+        self.assertEqual(div[1].get('begin'), '49s')
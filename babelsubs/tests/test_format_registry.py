@@ -1,3 +1,6 @@
+import os
+import sys
+import subprocess
 from unittest2 import TestCase
 from babelsubs import get_available_formats
 from babelsubs.parsers import base, discover
@@ -40,3 +43,37 @@ class FormatRegistryTest(TestCase):
     def test_dfxp_aliases(self):
         self.assertTrue(discover('xml'))
 
+
+    def test_srt_output_is_html(self):
+        from babelsubs.generators.html import HTMLGenerator
+        self.assertIs(GeneratorList['srt'], HTMLGenerator)
+
+    def test_package_names(self):
+        from babelsubs.parsers import DFXPParser
+        from babelsubs.generators import SRTGenerator
+        self.assertIs(discover('dfxp'), DFXPParser)
+        self.assertEqual(SRTGenerator.file_type, 'srt')
+        # importing a module doesn't change what's registered
+        self.assertIsNot(GeneratorList['srt'], SRTGenerator)
+
+    def test_register(self):
+        class FakeParser(base.BaseTextParser):
+            file_type = ['FAKE', 'fake2']
+        base.register(FakeParser)
+        try:
+            self.assertIs(discover('fake'), FakeParser)
+            self.assertIn('fake2', ParserList.keys())
+        finally:
+            dict.pop(ParserList, 'fake')
+            dict.pop(ParserList, 'fake2')
+
+    def test_lazy_import(self):
+        # the heavy dependencies are only imported by the formats that need them
+        script = ("import sys, babelsubs\n"
+                  "babelsubs.parsers.discover('sbv')\n"
+                  "print(' '.join(sorted(sys.modules)))")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        modules = subprocess.check_output([sys.executable, '-c', script], cwd=root).split()
+        for name in ['lxml', 'bleach', 'html5lib', 'htmllib', 'difflib',
+                     'multiprocessing', 'sqlite3', 'babelsubs.storage']:
+            self.assertNotIn(name, modules)
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs.batch import ConversionJob
+from babelsubs import jobs
+from babelsubs.jobs import Manifest, STATUS_OK, STATUS_FAILED
+from babelsubs.tests import utils
+
+
+class ConvertIncrementalTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.directory, 'manifest.sqlite')
+        self.jobs = []
+        for name in ['simple.srt', 'simple.sbv']:
+            path = os.path.join(self.directory, name)
+            shutil.copy(utils.get_data_file_path(name), path)
+            self.jobs.append(ConversionJob(path, 'json', output_path=path + '.json'))
+        self.bad_file = os.path.join(self.directory, 'bad.srt')
+        with open(self.bad_file, 'w') as f:
+            f.write("not subs")
+        self.jobs.append(ConversionJob(self.bad_file, 'json',
+                                       output_path=self.bad_file + '.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _run(self, jobs=None):
+        conversion = babelsubs.convert_incremental(jobs or self.jobs, self.manifest,
+                                                   workers=1, checkpoint=1)
+        paths = sorted(result.job.path for result in conversion)
+        return conversion, paths
+
+    def test_skips_unchanged(self):
+        conversion, paths = self._run()
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(conversion.skipped, 0)
+        self.assertEqual((conversion.batch.succeeded, conversion.batch.failed), (2, 1))
+
+        # failures are tried again, the rest is left alone
+        conversion, paths = self._run()
+        self.assertEqual(paths, [self.bad_file])
+        self.assertEqual(conversion.skipped, 2)
+
+        manifest = Manifest(self.manifest)
+        self.assertEqual(manifest.get(self.jobs[0].path, 'json')['status'], STATUS_OK)
+        row = manifest.get(self.bad_file, 'json')
+        self.assertEqual(row['status'], STATUS_FAILED)
+        self.assertTrue(row['error'])
+        self.assertIsNone(manifest.get(self.bad_file, 'srt'))
+        manifest.close()
+
+    def test_changes(self):
+        self._run()
+        srt, sbv = self.jobs[0], self.jobs[1]
+
+        # touched but the same content
+        os.utime(srt.path, (0, 0))
+        conversion, paths = self._run(self.jobs[:2])
+        self.assertEqual(paths, [])
+        self.assertEqual(conversion.skipped, 2)
+
+        # new content, missing output and a new target format
+        shutil.copy(utils.get_data_file_path('timed_text.srt'), srt.path)
+        os.remove(sbv.output_path)
+        dfxp = ConversionJob(srt.path, 'dfxp', output_path=srt.path + '.dfxp')
+        conversion, paths = self._run([srt, sbv, dfxp])
+        self.assertEqual(paths, sorted([srt.path, srt.path, sbv.path]))
+        self.assertEqual(conversion.skipped, 0)
+        with open(srt.output_path) as f:
+            self.assertEqual(f.read().decode('utf-8'),
+                             babelsubs.load_from_file(srt.path).to('json'))
+
+    def test_hash_of_converted_input(self):
+        # the hash comes from the bytes the worker converted, no input is
+        # read again afterwards
+        original_hash = jobs.file_hash
+        jobs.file_hash = None
+        try:
+            conversion, paths = self._run()
+        finally:
+            jobs.file_hash = original_hash
+        manifest = Manifest(self.manifest)
+        for job in self.jobs:
+            self.assertEqual(manifest.get(job.path, 'json')['hash'], jobs.file_hash(job.path))
+        manifest.close()
+
+    def test_resume(self):
+        conversion = babelsubs.convert_incremental(self.jobs, self.manifest,
+                                                   workers=1, checkpoint=1)
+        results = iter(conversion)
+        done = next(results)
+        # dies after the first one
+        results.close()
+
+        conversion, paths = self._run()
+        self.assertEqual(conversion.skipped, 1)
+        self.assertNotIn(done.job.path, paths)
+
+    def test_needs_output_path(self):
+        self.assertRaises(ValueError, babelsubs.convert_incremental,
+                          [(self.jobs[0].path, 'json')], self.manifest)
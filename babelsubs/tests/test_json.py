@@ -1,5 +1,6 @@
 from unittest2 import TestCase
 
+import babelsubs
 from babelsubs.generators.json_generator import JSONGenerator
 from babelsubs import SubtitleParserError
 from babelsubs.parsers.json_parser import JSONParser
@@ -23,3 +24,11 @@ class JSONParserTest(TestCase):
         with self.assertRaises(SubtitleParserError):
             JSONParser ("this\n\nisnot a valid subs format","en")
 
+    def test_load_from(self):
+        subs = utils.get_subs("simple.srt").to_internal()
+        parser = babelsubs.load_from(JSONGenerator.generate(subs), 'json', 'en')
+        self.assertEquals(len(parser), 19)
+        self.assertEquals([item[:2] for item in parser.to_internal().subtitle_items()],
+                          [item[:2] for item in subs.subtitle_items()])
+        self.assertEquals(babelsubs.convert(JSONGenerator.generate(subs), 'json', 'json'),
+                          JSONGenerator.generate(subs))
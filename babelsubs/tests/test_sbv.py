@@ -34,6 +34,23 @@ class SBVParsingTest(TestCase):
         self.assertEquals(sub_data[0][1], 2932)
         self.assertEquals(sub_data[0][2], 'We started Universal Subtitles because we believe')
 
+    def test_malformed(self):
+        # hours over 9, and no empty line between cues
+        data = u"0:00:01.000,0:00:02.000\nhello\n" \
+               u"10:00:03.000,10:00:04.000\nworld\n"
+        parser = SBVParser(data, 'en')
+        self.assertEqual(len(parser), 2)
+        self.assertEqual([(item['start'], item['text']) for item in parser],
+                         [(1000, u'hello'), (36003000, u'world')])
+
+    def test_iter_cues(self):
+        for file_name in ['simple.sbv', 'with-information-header.sbv']:
+            expected = list(utils.get_subs(file_name)._cue_iter())
+            for chunk_size in [1, 4096]:
+                with open(utils.get_data_file_path(file_name)) as f:
+                    cues = list(SBVParser.iter_cues(f, chunk_size=chunk_size))
+                self.assertEqual(cues, expected)
+
     def test_round_trip(self):
         subs1  = utils.get_subs("simple.sbv")
         parsed1 = subs1.to_internal()
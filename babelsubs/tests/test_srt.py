@@ -1,3 +1,4 @@
+from io import StringIO, BytesIO
 from unittest2 import TestCase
 
 from lxml import etree
@@ -5,7 +6,9 @@ from babelsubs.storage import get_contents, SubtitleSet, TTS_NAMESPACE_URI
 from babelsubs.generators.srt import SRTGenerator
 from babelsubs.parsers import SubtitleParserError
 from babelsubs.parsers.srt import SRTParser
+from babelsubs.compact import CompactSubtitleSet
 from babelsubs.tests import utils
+from babelsubs.utils import strip_tags
 
 import babelsubs
 
@@ -91,6 +94,18 @@ We\n started <b>Universal Subtitles</b> <i>because</i> we <u>believe</u>
                 [x for x in internal2.subtitle_items(SRTGenerator.MAPPINGS)]):
             self.assertEquals(x1, x2)
 
+    def test_nested_formatting(self):
+        parser = SRTParser(u'', 'en', eager_parse=False)
+        self.assertEqual(parser.get_markup(u'<b>a <i>b</i></b> c'),
+                         u'<span fontWeight="bold">a </span>'
+                         u'<span fontWeight="bold" fontStyle="italic">b</span> c')
+        # overlapping tags, and tags we don't know about
+        self.assertEqual(parser.get_markup(u'<b>a<i>b</b>c</i><font>d</font>\ne'),
+                         u'<span fontWeight="bold">a</span>'
+                         u'<span fontWeight="bold" fontStyle="italic">b</span>'
+                         u'<span fontStyle="italic">c</span>d<br />e')
+        self.assertEqual(parser.get_markup(u'&amp;amp; <b></b>'), u'&amp; ')
+
     def test_speaker_change(self):
         subs = """1
 00:00:00,004 --> 00:00:02,093
@@ -160,3 +175,100 @@ And know, Mr. <b>Amara</b> will talk.\n >> Hello, and welcome.
         self.assertIn('<p begin="99:59:59.000" end="99:59:59.000">I\'m gutted. <br/>Absolutely gutted.</p>',
             parsed.to_xml())
 
+    def test_malformed(self):
+        # no empty line between cues, stray BOMs and text that looks like
+        # a cue number
+        data = u"1\n00:00:01,000 --> 00:00:02,000\nhello\n" \
+               u"2\n00:00:03,000 --> 00:00:04,000\nworld\n2012\n\n" \
+               u"\ufeff3\n00:00:05,000 --> 00:00:06,000\nthree\n" \
+               u"\ufeff00:00:07,000 --> 00:00:08,000\nfour"
+        parser = SRTParser(data, 'en')
+        self.assertEqual(len(parser), 4)
+        self.assertEqual([(item['start'], item['text']) for item in parser],
+                         [(1000, u'hello'), (3000, u'world\n2012'),
+                          (5000, u'three'), (7000, u'four')])
+
+    def test_single_scan(self):
+        with open(utils.get_data_file_path('simple.srt')) as f:
+            parser = SRTParser(f.read().decode('utf-8'), 'en', eager_parse=False)
+        scans = []
+        scan = parser._scan
+        parser._scan = lambda: scans.append(1) or scan()
+        self.assertTrue(parser)
+        self.assertEqual(len(parser), 19)
+        self.assertTrue(parser)
+        self.assertEqual(len(list(parser)), 19)
+        self.assertEqual(len(parser.to_internal()), 19)
+        # bool before anything else stops at the first cue
+        self.assertEqual(len(scans), 2)
+
+    def test_iter_cues(self):
+        for file_name in ['simple.srt', 'Untimed_text.srt', 'timed_text.srt']:
+            expected = list(utils.get_subs(file_name)._cue_iter())
+            for chunk_size in [1, 7, 4096]:
+                with open(utils.get_data_file_path(file_name)) as f:
+                    cues = list(SRTParser.iter_cues(f, chunk_size=chunk_size))
+                self.assertEqual(cues, expected)
+
+    def test_iter_cues_line_ends(self):
+        data = u"1\r\n00:00:01,000 --> 00:00:02,000\r\nline one\rline tw\xf6\r\r" \
+               u"2\n00:00:03,000 --> 00:00:04,000\n\n3\n00:00:05,000 --> 00:00:06,000\nlast"
+        expected = list(SRTParser(data, 'en', eager_parse=False)._cue_iter())
+        self.assertEqual(len(expected), 3)
+        for chunk_size in [1, 2, 3, 100]:
+            for f in [StringIO(data), BytesIO(data.encode("utf-8"))]:
+                self.assertEqual(list(SRTParser.iter_cues(f, chunk_size=chunk_size)),
+                                 expected)
+
+    def test_iter_cues_to_set(self):
+        with open(utils.get_data_file_path('simple.srt')) as f:
+            subs = CompactSubtitleSet.from_list('en', SRTParser.iter_cues(f))
+        self.assertEqual(babelsubs.to(subs, 'srt'),
+                         utils.get_subs('simple.srt').to('srt'))
+
+    def test_parallel(self):
+        with open(utils.get_data_file_path('simple.srt')) as f:
+            data = f.read().decode('utf-8')
+        parser = SRTParser.parse(data, 'en', eager_parse=False, workers=3)
+        parser.parallel_threshold = 0
+        chunks = parser._split_input(12)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(''.join(chunks), parser.input_string)
+        self.assertEqual(list(parser._cue_iter()),
+                         list(SRTParser(data, 'en', eager_parse=False)._cue_iter()))
+        self.assertEqual(parser.to_internal().to_xml(),
+                         SRTParser(data, 'en').to_internal().to_xml())
+
+
+class StripTagsTest(TestCase):
+
+    CASES = [
+        u'<b>x</b>', u'<B CLASS="a">x</B>', u'<font color=">">x</font>',
+        u'a < b > c', u'a &amp; b & c', u'&nbsp;x&eacutex &foo; &#39; &#x41 &#150;',
+        u'&AMP; &lt &gtx &copy2 &apos;', u'<b>x', u'x</b>y', u'<b><i>x</b>y</i>z',
+        u'<i>a<b>b</i>c</b>d', u'<b><b><b><b>x</b>y', u'<!-- c -->x', u'<!-->x',
+        u'<!x>y', u'<?php x ?>y', u'</ b>x', u'</>x', u'<3', u'x<', u'x</',
+        u'<b/>x', u'<b foo', u'<b a"b=1>c', u'a\r\nb\rc', u'\x00x',
+        u'<br>x<br/>', u'<p>a</p><div>b', u'<script>alert(1)</script>x',
+        u'<b></i>x</b>', u'<!DOCTYPE html>x', u'<![CDATA[x]]>y',
+    ]
+
+    def assertSameAsBleach(self, text):
+        import bleach
+        self.assertEqual(strip_tags(text),
+                         bleach.clean(text, tags=['i', 'b', 'u'], strip=True))
+
+    def test_cases(self):
+        for text in self.CASES:
+            self.assertSameAsBleach(text)
+
+    def test_fixtures(self):
+        for name in ['simple.srt', 'timed_text.srt', 'Untimed_text.srt', 'simple.ssa']:
+            with open(utils.get_data_file_path(name)) as f:
+                for line in f.read().decode('utf-8').splitlines():
+                    self.assertSameAsBleach(line)
+
+    def test_other_tags(self):
+        self.assertEqual(strip_tags(u'<em>a</em><b>b</b>', tags=['em']), u'<em>a</em>b')
+        # tags that aren't formatting ones are left to bleach
+        self.assertEqual(strip_tags(u'<p>a<b>b</p>c', tags=['p']), u'<p>ab</p>c')
@@ -1,4 +1,5 @@
 # encoding: utf-8
+from io import StringIO
 from unittest2 import TestCase
 
 from babelsubs import SubtitleParserError
@@ -28,6 +29,12 @@ class SSAParsingTest(TestCase):
         # we are rounding to 0.24 (instead of truncating to 0.23
         self.assertIn("Dialogue: 0,0:00:00.13,0:00:00.24", output)
 
+    def test_nested_formatting(self):
+        parser = SSAParser(u'', 'en', eager_parse=False)
+        self.assertEqual(parser.get_markup(u'{\\b1}a {\\i1}b{\\i0}{\\b0} c{\\u0}'),
+                         u'<span fontWeight="bold">a </span>'
+                         u'<span fontWeight="bold" fontStyle="italic">b</span> c')
+
     def test_formatting(self):
         subs = """[Script Info]
 Title: 
@@ -111,3 +118,48 @@ Dialogue: 0,0:00:00.04,0:00:02.93,Default,,0000,0000,0000,,We\n started {\\b1}Un
         with self.assertRaises(SubtitleParserError):
             SSAParser ("this\n\nisnot a valid subs format","en")
 
+    def test_format_header(self):
+        subs = u"""[Script Info]
+Title: Karaoke
+ScriptType: v4.00+
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, Bold, Italic
+Style: Default,Arial,20,0,0
+Style: Loud,Arial,20,-1,0
+
+[Events]
+Format: Start, End, Style, Text
+Comment: 0:00:00.00,0:00:01.00,Default,not shown
+Dialogue: 0:00:01.00,0:00:02.50,Default,{\\k20\\pos(10,10)}one, two{\\i1}\\Nthree{\\i0}
+Dialogue: 0:00:03.00,0:00:04.00,Loud,hey
+Dialogue: 0:00:05.00,broken
+"""
+        parsed = SSAParser(subs, 'en')
+        self.assertEqual(parsed.script_info['Title'], 'Karaoke')
+        self.assertEqual(parsed.styles['Loud']['bold'], '-1')
+        self.assertEqual(len(parsed), 2)
+        self.assertEqual([(item['start'], item['end'], item['text']) for item in parsed],
+                         [(1000, 2500, u'one, two{\\i1}\nthree{\\i0}'),
+                          (3000, 4000, u'{\\b1}hey')])
+        self.assertEqual(list(SSAParser.iter_cues(StringIO(subs))),
+                         list(parsed._cue_iter()))
+        self.assertEqual(list(parsed._cue_iter())[1][2],
+                         u'<span fontWeight="bold">hey</span>')
+
+    def test_iter_cues(self):
+        with open(utils.get_data_file_path('simple.ssa')) as f:
+            cues = list(SSAParser.iter_cues(f, chunk_size=100))
+        self.assertEqual(cues, list(utils.get_subs('simple.ssa')._cue_iter()))
+
+    def test_default_format(self):
+        # no Format line, margins that aren't 4 digits and hours over 9;
+        # only 9:59:59.99 is unsynced
+        subs = (u"[Events]\n"
+                u"Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,karaoke,{\\k20}la{\\k20}la\n"
+                u"Dialogue: 0,10:00:01.00,10:00:02.00,Default,,0,0,0,,a, b\n"
+                u"Dialogue: 0,9:59:59.99,9:59:59.99,Default,,0,0,0,,c\n")
+        parsed = SSAParser(subs, 'en')
+        self.assertEqual([(item['start'], item['end'], item['text']) for item in parsed],
+                         [(1000, 2000, u'lala'), (36001000, 36002000, u'a, b'),
+                          (None, None, u'c')])
@@ -0,0 +1,61 @@
+from StringIO import StringIO
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs import stats
+from babelsubs.tests import utils
+
+
+class StatsTest(TestCase):
+
+    def setUp(self):
+        with open(utils.get_data_file_path('simple.srt')) as f:
+            self.data = f.read()
+
+    def test_collect(self):
+        with stats.collect() as collected:
+            parser = babelsubs.load_from(self.data, 'srt')
+            babelsubs.to(parser.to_internal(), 'sbv')
+            babelsubs.to(parser.to_internal(), 'txt')
+            babelsubs.to(parser.to_internal(), 'txt')
+        for stage in ['decode', 'match', 'markup', 'strip_tags', 'tree', 'items',
+                      'generate']:
+            self.assertIn(stage, collected.timings)
+        self.assertEqual(collected.calls['markup'], 19)
+        self.assertEqual(collected.counters['cues'], 19)
+        self.assertEqual(collected.counters['input_bytes'], len(self.data))
+        self.assertTrue(collected.counters['output_chars'] > 0)
+        self.assertTrue(0 < collected.hit_rate() < 1)
+        self.assertEqual(collected.as_dict()['counters']['cues'], 19)
+
+        # nothing is collected outside the block
+        babelsubs.load_from(self.data, 'srt')
+        self.assertEqual(collected.counters['cues'], 19)
+
+    def test_stats_argument(self):
+        collected = stats.Stats()
+        output = StringIO()
+        subs = babelsubs.load_from(self.data, 'srt', stats=collected).to_internal()
+        babelsubs.to_file(subs, 'srt', output, stats=collected)
+        self.assertEqual(collected.counters['cues'], 19)
+        self.assertEqual(collected.counters['output_bytes'], len(output.getvalue()))
+
+        collected = stats.Stats()
+        babelsubs.convert(self.data, 'srt', 'json', stats=collected)
+        self.assertEqual(collected.counters['cues'], 19)
+        self.assertNotIn('tree', collected.timings)
+        self.assertEqual(collected.calls['generate'], 1)
+
+    def test_hooks(self):
+        seen = []
+        stats.register_hook(seen.append)
+        try:
+            collected = stats.Stats()
+            with collected:
+                babelsubs.load_from(self.data, 'srt', stats=collected)
+            self.assertEqual(seen, [collected])
+        finally:
+            stats.unregister_hook(seen.append)
+        with stats.collect():
+            pass
+        self.assertEqual(len(seen), 1)
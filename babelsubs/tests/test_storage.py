@@ -1,6 +1,9 @@
+from random import Random
 from unittest2 import TestCase
 
+import babelsubs
 from babelsubs import storage
+from babelsubs.compact import CompactSubtitleSet
 from babelsubs.generators.srt import SRTGenerator
 from babelsubs.parsers import SubtitleParserError
 from babelsubs.tests import utils
@@ -151,6 +154,36 @@ class AddSubtitlesTest(TestCase):
         for i,sub in enumerate(dfxp.subtitle_items()):
             self.assertEqual(sub.meta['new_paragraph'] , i % 2 ==0)
 
+    def test_append_subtitles(self):
+        dfxp = storage.SubtitleSet('en')
+        dfxp.append_subtitle(0, 1000, "paragraph 1 - A")
+        dfxp.append_subtitles([
+            (1000, 2000, "paragraph 1 - B"),
+            (2000, 3000, "paragraph 2 - <b>A</b>", {'new_paragraph': True}),
+            (3000, 4000, '<span fontWeight="bold">B</span>', {'escape': False}),
+            (4000, 5000, "paragraph 3 - A", {'new_paragraph': True}),
+        ])
+        divs = dfxp._ttml.xpath('/n:tt/n:body/n:div', namespaces={'n': storage.TTML_NAMESPACE_URI})
+        self.assertEquals([len(self._paragraphs_in_div(x)) for x in divs], [2, 2, 1])
+        self.assertEquals(len(dfxp), 5)
+        items = dfxp.subtitle_items(SRTGenerator.MAPPINGS)
+        self.assertEquals(items[2].text, 'paragraph 2 - <b>A</b>')
+        self.assertEquals(items[3].text, '<b>B</b>')
+        self.assertEquals(items[4].start_time, 4000)
+        span = dfxp.get_subtitles()[3].getchildren()[0]
+        self.assertEquals(span.get('{%s}fontWeight' % storage.TTS_NAMESPACE_URI), 'bold')
+        # nothing to add is fine too
+        dfxp.append_subtitles([])
+        self.assertEquals(len(dfxp), 5)
+
+    def test_title_and_description(self):
+        dfxp = storage.SubtitleSet('pt-br', title='A title', description='Some words')
+        self.assertIn('xml:lang="pt-br"', dfxp.to_xml())
+        self.assertIn('<ttm:title>A title</ttm:title>', dfxp.to_xml())
+        self.assertIn('<ttm:description>Some words</ttm:description>', dfxp.to_xml())
+        # the template is shared, make sure it's not changed
+        self.assertIn('<ttm:title/>', storage.SubtitleSet('en').to_xml())
+
     def test_nested_tags(self):
         dfxp = utils.get_subs("simple.dfxp").to_internal()
         self.assertEqual( storage.get_contents(dfxp.get_subtitles()[37]), 'nested spans')
@@ -178,6 +211,19 @@ class AccessTest(TestCase):
         self.assertIsNotNone(ss[0])
         self.assertIsNotNone(ss[1])
 
+    def test_index_follows_appends(self):
+        dfxp = utils.get_subs("pre-drm.dfxp").to_internal()
+        self.assertEqual(len(dfxp), 419)
+        dfxp.append_subtitle(0, 1000, "appended")
+        dfxp.append_subtitle(1000, 2000, "new paragraph", new_paragraph=True)
+        self.assertEqual(len(dfxp), 421)
+        self.assertEqual(storage.get_contents(dfxp.get_subtitles()[-1]), "new paragraph")
+        # the index should match what a fresh walk of the tree finds
+        reloaded = storage.SubtitleSet('en', dfxp.to_xml())
+        self.assertEqual(len(reloaded), 421)
+        self.assertEqual([storage.get_contents(x) for x in reloaded.get_subtitles()],
+                         [storage.get_contents(x) for x in dfxp.get_subtitles()])
+
 class ParsingTest(TestCase):
 
     def test_f_dfxp(self):
@@ -215,3 +261,275 @@ class UpdateTest(TestCase):
             dfxp_updated.update(i, to_ms=1000*i)
         for i,sub in enumerate(dfxp_updated.subtitle_items()):
             self.assertEqual(i * 1000, sub.end_time)
+
+
+class RetimeTest(TestCase):
+
+    set_class = storage.SubtitleSet
+
+    def _subs(self):
+        return self.set_class.from_list('en', [
+            (0, 1000, 'a'),
+            (1000, 2000, 'b'),
+            (5000, 6000, 'c'),
+            (None, None, 'unsynced'),
+            (7000, main_utils.UNSYNCED_TIME_FULL, 'open ended'),
+        ])
+
+    def _times(self, subs):
+        return [(x.start_time, x.end_time) for x in subs.subtitle_items()]
+
+    def test_shift(self):
+        subs = self._subs()
+        subs.shift(500)
+        self.assertEqual(self._times(subs), [(500, 1500), (1500, 2500),
+            (5500, 6500), (None, None), (7500, main_utils.UNSYNCED_TIME_FULL)])
+        subs.shift(-1000)
+        self.assertEqual(self._times(subs)[:3], [(0, 500), (500, 1500), (4500, 5500)])
+
+    def test_shift_range(self):
+        subs = self._subs()
+        subs.shift(100, start=1000, end=6000)
+        self.assertEqual(self._times(subs)[:3], [(0, 1000), (1100, 2100), (5100, 6100)])
+        subs.shift(100, start=5100)
+        self.assertEqual(self._times(subs)[2:], [(5200, 6200), (None, None),
+            (7100, main_utils.UNSYNCED_TIME_FULL)])
+
+    def test_scale(self):
+        subs = self._subs()
+        subs.scale(25 / 23.976)
+        self.assertEqual(self._times(subs)[:3], [(0, 1043), (1043, 2085), (5214, 6256)])
+        subs = self._subs()
+        subs.scale(2, anchor_ms=1000)
+        self.assertEqual(self._times(subs)[:3], [(0, 1000), (1000, 3000), (9000, 11000)])
+
+    def test_remap(self):
+        subs = self._subs()
+        subs.remap(((0, 0), (10000, 10100)))
+        self.assertEqual(self._times(subs)[:3], [(0, 1010), (1010, 2020), (5050, 6060)])
+        subs.remap(lambda t: t + 1)
+        self.assertEqual(self._times(subs)[:3], [(1, 1011), (1011, 2021), (5051, 6061)])
+        self.assertEqual(self._times(subs)[3], (None, None))
+        self.assertRaises(ValueError, subs.remap, ((0, 0), (0, 1)))
+
+
+class CompactRetimeTest(RetimeTest):
+
+    set_class = CompactSubtitleSet
+
+class ItemsCacheTest(TestCase):
+
+    def test_cached(self):
+        subs = utils.get_subs("simple.srt").to_internal()
+        items = subs.subtitle_items(SRTGenerator.MAPPINGS)
+        calls = []
+        original = subs._extract_from_el
+        def counting_extract(*args):
+            calls.append(args)
+            return original(*args)
+        subs._extract_from_el = counting_extract
+        self.assertEqual(subs.subtitle_items(dict(SRTGenerator.MAPPINGS)), items)
+        self.assertEqual(calls, [])
+        # changing the returned list won't change the cache
+        items.pop()
+        self.assertEqual(len(subs.subtitle_items(SRTGenerator.MAPPINGS)), 19)
+        # other mappings are extracted on their own
+        subs.subtitle_items()
+        self.assertEqual(len(calls), 19)
+
+    def test_invalidation(self):
+        subs = storage.SubtitleSet.from_list('en', [(0, 1000, 'a')])
+        self.assertEqual(subs[0].text, 'a')
+        subs.append_subtitle(1000, 2000, 'b')
+        self.assertEqual(subs[1].text, 'b')
+        subs.update(1, from_ms=1500)
+        self.assertEqual(subs.subtitle_items()[1].start_time, 1500)
+        subs.shift(10)
+        self.assertEqual(subs[1].start_time, 1510)
+        el = subs.get_subtitles()[0]
+        el.set('dur', '5s')
+        subs.normalize_time(el)
+        self.assertEqual(subs[0].end_time, 5010)
+        # and the subtitles can be replaced as a whole
+        items = subs.subtitle_items()
+        subs.subtitles = items[1:] + [items[0]._replace(text='a & c')]
+        self.assertEqual([(s.start_time, s.text) for s in subs], [(1510, 'b'), (10, 'a & c')])
+        self.assertEqual(len(subs.get_subtitles()), 2)
+        subs.subtitles = items
+        self.assertEqual(subs.subtitle_items(), items)
+        self.assertEqual(len(subs.get_subtitles()[0].getparent()), 2)
+        # elements from get_subtitles can be changed directly
+        subs.get_subtitles()[0].set('begin', '00:00:00.020')
+        self.assertEqual(subs[0].start_time, 20)
+
+
+class TimeIndexTest(TestCase):
+
+    def _make_subs(self, set_class=storage.SubtitleSet):
+        random = Random(42)
+        subs = []
+        for i in xrange(200):
+            start = random.randint(0, 60000)
+            subs.append((start, start + random.choice([0, 1, 500, 3000]), "Sub %s" % i))
+        subs.append((None, None, "unsynced"))
+        subs.append((1000, None, "no end"))
+        return set_class.from_list('en', subs)
+
+    def _brute_at(self, subs, ms):
+        return [s for s in subs if s.start_time is not None and
+                s.end_time is not None and s.start_time <= ms < s.end_time]
+
+    def test_at(self):
+        for set_class in [storage.SubtitleSet, CompactSubtitleSet]:
+            subs = self._make_subs(set_class)
+            for ms in xrange(0, 65000, 97):
+                self.assertEqual(subs.at(ms), self._brute_at(subs, ms))
+
+    def test_between(self):
+        subs = self._make_subs()
+        for start, end in [(0, 100), (5000, 9000), (30000, 70000)]:
+            expected = [s for s in subs if s.start_time is not None and
+                        s.end_time is not None and s.start_time < end and
+                        (s.end_time > start or s.start_time >= start)]
+            self.assertEqual(subs.between(start, end), expected)
+        self.assertEqual(subs.between(1000, 1000), [])
+
+    def test_cursor(self):
+        subs = self._make_subs()
+        cursor = subs.cursor()
+        for ms in range(0, 65000, 40) + [1000, 70000, 0]:
+            self.assertEqual(cursor.seek(ms), self._brute_at(subs, ms))
+
+    def test_invalidation(self):
+        subs = storage.SubtitleSet.from_list('en', [(0, 1000, 'a'), (500, 1500, 'b')])
+        self.assertEqual([s.text for s in subs.at(700)], ['a', 'b'])
+        subs.shift(1000)
+        self.assertEqual([s.text for s in subs.at(700)], [])
+        subs.append_subtitle(600, 800, 'c')
+        self.assertEqual([s.text for s in subs.at(700)], ['c'])
+
+
+class SliceTest(TestCase):
+
+    def test_slice(self):
+        subs = utils.get_subs("simple.srt").to_internal()
+        window = subs.slice(10000, 30000)
+        expected = subs.between(10000, 30000)
+        self.assertEqual(len(window), len(expected))
+        self.assertEqual([s[:3] for s in window], [s[:3] for s in expected])
+        self.assertTrue(window[0].meta['new_paragraph'])
+        self.assertEqual(window.subtitle_items(SRTGenerator.MAPPINGS)[1:],
+                         [subs.subtitle_items(SRTGenerator.MAPPINGS)[i]
+                          for i in subs.time_index().between(10000, 30000)][1:])
+        # output is the same as for a set with those subtitles
+        copy = window.to_subtitle_set()
+        for type in ['srt', 'sbv', 'ssa', 'txt', 'json', 'dfxp']:
+            self.assertEqual(babelsubs.to(window, type), babelsubs.to(copy, type))
+
+    def test_rebase(self):
+        subs = storage.SubtitleSet.from_list('en', [
+            (0, 1000, 'a'), (1500, 2500, 'b'), (3000, 4000, 'c')])
+        window = subs.slice(2000, 3500, rebase=True)
+        self.assertEqual([(s.start_time, s.end_time, s.text) for s in window],
+                         [(0, 500, 'b'), (1000, 2000, 'c')])
+        self.assertEqual([s.text for s in window.at(1200)], ['c'])
+        compact = CompactSubtitleSet.from_list('en', [(0, 1000, 'a'), (1500, 2500, 'b')])
+        self.assertEqual(compact.slice(1000, 2000, rebase=True)[0].start_time, 500)
+
+    def test_copy_on_write(self):
+        subs = storage.SubtitleSet.from_list('en', [(0, 1000, 'a'), (1500, 2500, 'b')])
+        window = subs.slice(0, 1200)
+        self.assertIsNone(window._copy)
+        window.shift(100)
+        self.assertIsInstance(window._copy, storage.SubtitleSet)
+        self.assertEqual(window[0].start_time, 100)
+        self.assertEqual(subs[0].start_time, 0)
+        self.assertEqual(len(subs), 2)
+
+    def test_nested_slice(self):
+        subs = storage.SubtitleSet.from_list('en', [
+            (0, 1000, 'a'), (1500, 2500, 'b'), (3000, 4000, 'c')])
+        window = subs.slice(1000, 5000)
+        nested = window.slice(2000, 5000)
+        nested.shift(10)
+        self.assertIsInstance(nested._copy, storage.SubtitleSet)
+        self.assertEqual([(s.start_time, s.text) for s in nested],
+                         [(1510, 'b'), (3010, 'c')])
+        self.assertEqual([s.start_time for s in window], [1500, 3000])
+        self.assertEqual(subs[1].start_time, 1500)
+        compact = CompactSubtitleSet.from_list('en', [(0, 1000, 'a'), (1500, 2500, 'b')])
+        nested = compact.slice(0, 3000).slice(1000, 3000)
+        nested.append_subtitle(3000, 4000, 'c')
+        self.assertIsInstance(nested._copy, CompactSubtitleSet)
+        self.assertEqual([s.text for s in nested], ['b', 'c'])
+        self.assertEqual(len(compact), 2)
+
+    def test_retime_compact(self):
+        compact = CompactSubtitleSet.from_list('en', [(0, 1000, 'a'), (1500, 2500, 'b')])
+        window = compact.slice(0, 2500)
+        window.shift(100)
+        window.scale(2)
+        window.remap(lambda t: t + 1)
+        self.assertEqual([(s.start_time, s.end_time) for s in window],
+                         [(201, 2201), (3201, 5201)])
+        self.assertEqual(compact[1].start_time, 1500)
+
+    def test_source_changed(self):
+        subs = storage.SubtitleSet.from_list('en', [(0, 1000, 'a')])
+        window = subs.slice(0, 1200)
+        subs.shift(100)
+        self.assertRaises(ValueError, list, window)
+
+
+class CombineTest(TestCase):
+
+    def test_concat(self):
+        part1 = storage.SubtitleSet.from_list('en', [
+            (0, 1000, 'a <span tts:fontWeight="bold">b</span>'), (1000, 2000, 'c')])
+        part2 = storage.SubtitleSet.from_list('en', [
+            (0, 500, 'd'), (None, None, 'e'), (600, 900, 'f', {'new_paragraph': True})])
+        subs = storage.SubtitleSet.concat([part1, part2], [0, 10000])
+        self.assertEqual([(s.start_time, s.end_time, s.meta['new_paragraph']) for s in subs],
+                         [(0, 1000, True), (1000, 2000, False), (10000, 10500, True),
+                          (None, None, False), (10600, 10900, True)])
+        self.assertEqual(subs.subtitle_items(SRTGenerator.MAPPINGS)[0].text, 'a <b>b</b>')
+        self.assertEqual(len(subs.get_subtitles()[2].getparent()), 2)
+        self.assertRaises(ValueError, storage.SubtitleSet.concat, [part1], [0, 10])
+
+    def test_namespaced_markup(self):
+        styled = ('<span tts:color="red" xml:lang="fr">rouge</span> '
+                  '<span tts:fontWeight="bold">bold</span>')
+        part1 = storage.SubtitleSet.from_list('en', [(0, 1000, styled)])
+        part2 = storage.SubtitleSet.from_list('en', [(0, 1000, 'b')])
+        expected = [sorted(span.items()) for span in part1.get_subtitles()[0]]
+        for subs in [storage.SubtitleSet.concat([part1, part2], [0, 5000]),
+                     storage.SubtitleSet.merge([part2, part1]),
+                     part1.slice(0, 1000).to_subtitle_set()]:
+            el = [el for el in subs.get_subtitles() if el.text is None][0]
+            self.assertEqual([sorted(span.items()) for span in el], expected)
+            # no empty <div> before the first subtitle
+            divs = subs.get_subtitles()[0].getparent().getparent()
+            self.assertEqual([len(div) for div in divs], [1] * len(divs))
+
+    def test_concat_unsynced(self):
+        unsynced = main_utils.UNSYNCED_TIME_FULL
+        for set_class in [storage.SubtitleSet, CompactSubtitleSet]:
+            part = set_class.from_list('en', [(0, 500, 'a'), (unsynced, unsynced, 'b'),
+                                              (None, None, 'c')])
+            subs = set_class.concat([part, part], [0, 10000])
+            self.assertEqual([(s.start_time, s.end_time) for s in subs][3:],
+                             [(10000, 10500), (unsynced, unsynced), (None, None)])
+
+    def test_merge(self):
+        captions = storage.SubtitleSet.from_list('en', [
+            (0, 1000, 'one'), (2000, 3000, 'three'), (None, None, 'unsynced')])
+        effects = CompactSubtitleSet.from_list('en', [
+            (1000, 1500, '[door]'), (2000, 2100, '[bang]'), (4000, 4100, '[end]')])
+        for set_class in [storage.SubtitleSet, CompactSubtitleSet]:
+            subs = set_class.merge([captions, effects])
+            self.assertEqual([s.text for s in subs],
+                             ['one', '[door]', 'three', '[bang]', '[end]', 'unsynced'])
+
+    def test_merge_unsorted(self):
+        subs = storage.SubtitleSet.from_list('en', [(3000, 4000, 'b'), (1000, 2000, 'a')])
+        self.assertEqual([s.text for s in storage.SubtitleSet.merge([subs])], ['a', 'b'])
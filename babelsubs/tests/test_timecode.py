@@ -0,0 +1,60 @@
+from unittest2 import TestCase
+
+from babelsubs import timecode
+from babelsubs.parsers.srt import SRTParser
+from babelsubs.parsers.sbv import SBVParser
+from babelsubs.generators.srt import SRTGenerator
+from babelsubs.generators.sbv import SBVGenerator
+
+
+class TimecodeTest(TestCase):
+
+    def test_components(self):
+        self.assertEqual(timecode.clock_components_to_milliseconds('01', '01', '05', '023'),
+                         3665023)
+        self.assertEqual(timecode.clock_components_to_milliseconds('00', '00', '01', '5'), 1500)
+        self.assertEqual(timecode.clock_components_to_milliseconds('00', '00', '01', '1234'), 1123)
+        self.assertEqual(timecode.clock_components_to_milliseconds('00', '00', '01', None), 1000)
+        self.assertEqual(timecode.ssa_components_to_milliseconds('1', '00', '01', '07'), 3601070)
+        self.assertEqual(timecode.seconds_to_milliseconds('4.35'), 4350)
+        self.assertEqual(timecode.seconds_to_milliseconds('7'), 7000)
+        self.assertEqual(timecode.seconds_to_milliseconds('0.0455'), 45)
+
+    def test_time_expressions(self):
+        self.assertEqual(timecode.parse_time_expression('01:02:03.456'), 3723456)
+        self.assertEqual(timecode.parse_time_expression('101:02:03.456'), 363723456)
+        self.assertEqual(timecode.parse_time_expression('01:02:03'), 3723000)
+        # the fraction is of a second, however many digits it has
+        self.assertEqual(timecode.parse_time_expression('00:00:01.5'), 1500)
+        self.assertEqual(timecode.parse_time_expression('00:00:01.05'), 1050)
+        self.assertEqual(timecode.parse_time_expression('1500ms'), 1500)
+        self.assertEqual(timecode.parse_time_expression('2s'), 2000)
+        self.assertEqual(timecode.parse_time_expression('7t', tick_rate=10), 700)
+        self.assertEqual(timecode.parse_time_expression(''), 0)
+        self.assertRaises(ValueError, timecode.parse_time_expression, '7t')
+        self.assertRaises(ValueError, timecode.parse_time_expression, 'bogus')
+        self.assertEqual(timecode.parse_time_expressions(['00:00:01.000', None, '', '3s']),
+                         [1000, None, None, 3000])
+
+    def test_format(self):
+        self.assertEqual(timecode.format_clock(3723456), '01:02:03.456')
+        self.assertEqual(timecode.format_clock(None), None)
+        self.assertEqual(timecode.format_clock_times([3723456, None, 0]),
+                         ['01:02:03.456', None, '00:00:00.000'])
+        self.assertEqual(timecode.format_srt(3723456), u'01:02:03,456')
+        self.assertEqual(timecode.format_sbv(3723456), u'1:02:03.456')
+        self.assertEqual(timecode.format_ssa(3723456), u'1:02:03.46')
+        # rounding carries over to the seconds
+        self.assertEqual(timecode.format_ssa(1999), u'0:00:02.00')
+        self.assertEqual(timecode.format_ssa(None), u'9:59:59.99')
+
+    def test_no_drift(self):
+        # these used to lose a millisecond due to float math
+        srt = u"1\n00:01:05,023 --> 00:02:10,075\ntext\n"
+        subs = SRTParser(srt, 'en').to_internal()
+        self.assertEqual(subs.subtitle_items()[0][:2], (65023, 130075))
+        self.assertIn(u'00:01:05,023 --> 00:02:10,075', unicode(SRTGenerator(subs)))
+
+        sbv = u"0:01:05.023,0:02:10.075\ntext\n"
+        subs = SBVParser(sbv, 'en').to_internal()
+        self.assertIn(u'0:01:05.023,0:02:10.075', unicode(SBVGenerator(subs)))
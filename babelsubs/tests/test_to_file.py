@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs.generators import base
+from babelsubs.generators.srt import SRTGenerator
+from babelsubs.storage import SubtitleSet
+from babelsubs.tests import utils
+
+TYPES = ['srt', 'sbv', 'ssa', 'txt', 'json', 'dfxp']
+
+
+class ToFileTest(TestCase):
+
+    def test_same_as_to(self):
+        for file_name in ['simple.srt', 'simple.dfxp', 'Untimed_text.srt']:
+            subs = utils.get_subs(file_name).to_internal()
+            for type in TYPES:
+                f = BytesIO()
+                babelsubs.to_file(subs, type, f)
+                self.assertEqual(f.getvalue(),
+                                 babelsubs.to(subs, type).encode('utf-8'))
+
+    def test_empty(self):
+        subs = SubtitleSet('en')
+        for type in TYPES:
+            f = BytesIO()
+            babelsubs.to_file(subs, type, f)
+            self.assertEqual(f.getvalue(), babelsubs.to(subs, type).encode('utf-8'))
+
+    def test_chunks(self):
+        subs = utils.get_subs('simple.srt').to_internal()
+        chunks = list(SRTGenerator(subs).iter_chunks())
+        self.assertEqual(len(chunks), len(subs))
+        self.assertEqual(u''.join(chunks), unicode(SRTGenerator(subs)))
+
+        original_size = base.WRITE_CHUNK_SIZE
+        base.WRITE_CHUNK_SIZE = 10
+        try:
+            f = BytesIO()
+            SRTGenerator(subs).write_to(f, encoding='utf-16')
+        finally:
+            base.WRITE_CHUNK_SIZE = original_size
+        self.assertEqual(f.getvalue().decode('utf-16'), unicode(SRTGenerator(subs)))
+
+    def test_path(self):
+        subs = utils.get_subs('simple.srt').to_internal()
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'out.sbv')
+            babelsubs.to_file(subs, 'sbv', path)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), babelsubs.to(subs, 'sbv').encode('utf-8'))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,39 @@
+from unittest2 import TestCase
+
+import babelsubs
+from babelsubs.compact import ExtractedSubtitles
+from babelsubs.generators.srt import SRTGenerator
+from babelsubs.tests import utils
+
+TYPES = ['srt', 'sbv', 'ssa', 'txt', 'json', 'dfxp']
+
+
+class ToManyTest(TestCase):
+
+    def test_same_as_to(self):
+        for file_name in ['simple.srt', 'simple.dfxp', 'pre-drm.dfxp',
+                          'simple.sbv', 'Untimed_text.srt']:
+            subs = utils.get_subs(file_name).to_internal()
+            outputs = babelsubs.to_many(subs, TYPES)
+            self.assertEqual(sorted(outputs.keys()), sorted(TYPES))
+            for type in TYPES:
+                self.assertEqual(outputs[type], babelsubs.to(subs, type))
+
+    def test_compact(self):
+        subs = utils.get_subs('simple.srt').to_compact()
+        outputs = babelsubs.to_many(subs, TYPES)
+        for type in TYPES:
+            self.assertEqual(outputs[type], babelsubs.to(subs, type))
+
+    def test_bad_type(self):
+        subs = utils.get_subs('simple.srt').to_internal()
+        self.assertRaises(KeyError, babelsubs.to_many, subs, ['srt', 'badformat'])
+
+    def test_extracted(self):
+        subs = utils.get_subs('simple.srt').to_internal()
+        extracted = ExtractedSubtitles(subs)
+        self.assertEqual(len(extracted), 19)
+        self.assertEqual(extracted.subtitle_items(SRTGenerator.MAPPINGS),
+                         subs.subtitle_items(SRTGenerator.MAPPINGS))
+        self.assertEqual(extracted[3], subs[3])
+        self.assertTrue(extracted.fully_synced)
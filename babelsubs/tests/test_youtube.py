@@ -23,3 +23,10 @@ class YouTubeParsingTest(TestCase):
         # last one should be hard coded to last 3 seconds
         self.assertEquals(sub_data[79].end_time, 213370)
 
+    def test_exact_times(self):
+        # 4.35 * 1000 is 4349.999... as a float
+        subs = YoutubeParser('<transcript><text start="4.35" dur="1">a</text>'
+                             '<text start="10.01" dur="1">b</text></transcript>',
+                             'en').to_internal()
+        self.assertEquals([item[:2] for item in subs.subtitle_items()],
+                          [(4350, 10010), (10010, 13010)])
@@ -0,0 +1,187 @@
+"""
+Parsing and formatting of the time codes each format uses.
+
+Everything here works on integer milliseconds, there are no floats
+involved, so a time read and written back is always the same. The
+supported syntaxes are:
+
+    - SRT: 01:02:03,456
+    - SBV: 1:02:03.456
+    - SSA: 1:02:03.45 (centiseconds)
+    - TTML clock time (01:02:03.456), metric (5s, 300ms...) and ticks (10t)
+    - YouTube: 4.35 (seconds)
+
+Parsers that already matched the parts of a time with a regex can use
+the *_components functions, that take those strings directly.
+
+The bulk variants (parse_time_expressions, format_clock_times) work on
+sequences and leave None values alone, as None means unsynced for us.
+"""
+
+import re
+
+from babelsubs.utils import UNSYNCED_TIME_FULL, UNSYNCED_TIME_ONE_HOUR_DIGIT
+
+TIME_EXPRESSION_METRIC = re.compile(r'(?P<num>[\d]{1,})(?P<unit>(h|ms|s|m|f|t))')
+TIME_EXPRESSION_CLOCK_TIME = re.compile(r'(?P<hours>[\d]{2,3}):(?P<minutes>[\d]{2}):(?P<seconds>[\d]{2})(?:.(?P<fraction>[\d]{1,3}))?')
+
+METRIC_MULTIPLIERS = {
+    "h": 3600 * 1000,
+    "m": 60 * 1000,
+    "s": 1000,
+    "ms": 1,
+    'f': 0,
+}
+
+
+def split(milliseconds):
+    """Returns the (hours, minutes, seconds, milliseconds) of a time."""
+    seconds, milliseconds = divmod(int(milliseconds), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return hours, minutes, seconds, milliseconds
+
+
+def fraction_to_milliseconds(fraction):
+    """
+    Converts the digits after the decimal point to milliseconds, as a
+    fraction of a second, e.g. '5' -> 500, '05' -> 50, '1234' -> 123.
+    """
+    if not fraction:
+        return 0
+    return int(fraction[:3].ljust(3, '0'))
+
+
+def seconds_to_milliseconds(seconds):
+    """
+    Converts a number of seconds with decimals, as a string, to
+    milliseconds, e.g. '4.35' -> 4350, '7' -> 7000.
+    """
+    whole, _, fraction = seconds.strip().partition('.')
+    return int(whole or 0) * 1000 + fraction_to_milliseconds(fraction)
+
+
+def clock_components_to_milliseconds(hours, minutes, seconds, fraction=None):
+    """
+    Converts the hours, minutes and seconds strings (or numbers), plus the
+    digits of the fraction of second, to milliseconds.
+    """
+    return ((int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1000 +
+            fraction_to_milliseconds(fraction))
+
+
+def ssa_components_to_milliseconds(hours, minutes, seconds, centiseconds=None):
+    """Same as clock_components_to_milliseconds, with centiseconds."""
+    return ((int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1000 +
+            (int(centiseconds) * 10 if centiseconds else 0))
+
+
+def mapping_function(mapping):
+    """
+    Returns the function of milliseconds a remap mapping stands for: the
+    mapping itself if it's callable, else the line through its two
+    (old_ms, new_ms) points.
+    """
+    if callable(mapping):
+        return mapping
+    (x1, y1), (x2, y2) = mapping
+    if x1 == x2:
+        raise ValueError("Mapping points must have different times")
+    factor = (y2 - y1) / float(x2 - x1)
+    return lambda t: y1 + (t - x1) * factor
+
+
+def parse_time_expression(time_expression, tick_rate=None):
+    """
+    Parses possible values from time expressions[1] to milliseconds.
+
+    We don't support all possible forms now, only clock time, metric and tick.
+    [1] http://www.w3.org/TR/ttaf1-dfxp/#timing-value-timeExpression
+    """
+    if not time_expression:
+        return 0
+    # the form we write ourselves, 00:00:00.000, is by far the most common
+    if (len(time_expression) == 12 and time_expression[2] == ':' and
+            time_expression[5] == ':' and time_expression[8] == '.' and
+            time_expression.replace(':', '').replace('.', '').isdigit()):
+        return ((int(time_expression[:2]) * 3600 +
+                 int(time_expression[3:5]) * 60 +
+                 int(time_expression[6:8])) * 1000 +
+                int(time_expression[9:]))
+    match = TIME_EXPRESSION_CLOCK_TIME.match(time_expression)
+    if match:
+        hours, minutes, seconds, fraction = match.group(
+            'hours', 'minutes', 'seconds', 'fraction')
+        return clock_components_to_milliseconds(hours, minutes, seconds, fraction)
+    match = TIME_EXPRESSION_METRIC.match(time_expression)
+    if match:
+        num, unit = int(match.group('num')), match.group('unit')
+        if unit == 't':
+            if not tick_rate:
+                raise ValueError("Ticks need a tick rate, mate.")
+            return num * 1000 // int(tick_rate)
+        return num * METRIC_MULTIPLIERS[unit]
+    raise ValueError("Time expression %s can't be parsed" % time_expression)
+
+
+def parse_time_expressions(time_expressions, tick_rate=None):
+    """
+    Bulk version of parse_time_expression, empty or None expressions
+    become None.
+    """
+    parse = parse_time_expression
+    return [parse(e, tick_rate) if e else None for e in time_expressions]
+
+
+def is_clock_time(time_expression):
+    return TIME_EXPRESSION_CLOCK_TIME.match(time_expression) is not None
+
+
+def format_clock(milliseconds):
+    """Formats as a TTML clock time, e.g. 01:02:03.456."""
+    if milliseconds is None:
+        return None
+    return '%02d:%02d:%02d.%03d' % split(milliseconds)
+
+
+def format_clock_times(values):
+    """Bulk version of format_clock."""
+    result = []
+    append = result.append
+    for milliseconds in values:
+        if milliseconds is None:
+            append(None)
+        else:
+            seconds, milliseconds = divmod(int(milliseconds), 1000)
+            minutes, seconds = divmod(seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+            append('%02d:%02d:%02d.%03d' % (hours, minutes, seconds, milliseconds))
+    return result
+
+
+def format_srt(milliseconds):
+    """Formats as SRT does, e.g. 01:02:03,456. None is unsynced."""
+    if milliseconds is None:
+        milliseconds = UNSYNCED_TIME_FULL
+    return u"%02i:%02i:%02i,%03i" % split(milliseconds)
+
+
+def format_sbv(milliseconds):
+    """Formats as SBV does, e.g. 1:02:03.456. None is unsynced."""
+    if milliseconds is None:
+        milliseconds = UNSYNCED_TIME_ONE_HOUR_DIGIT
+    return u'%01i:%02i:%02i.%03i' % split(milliseconds)
+
+
+def format_ssa(milliseconds):
+    """
+    Formats as SSA does, e.g. 1:02:03.46. The milliseconds are rounded to
+    the nearest centisecond, carrying into the seconds if needed. None is
+    unsynced.
+    """
+    if milliseconds is None:
+        return u'9:59:59.99'
+    seconds, centiseconds = divmod((int(milliseconds) + 5) // 10, 100)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return u'%i:%02i:%02i.%02i' % (hours, minutes, seconds, centiseconds)
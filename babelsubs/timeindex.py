@@ -0,0 +1,306 @@
+"""
+Time based lookups on subtitle sets: which subtitles are showing at a
+given time, and which ones show up between two times.
+
+A TimeIndex keeps the positions of the synced subtitles sorted by start
+time, plus the running maximum of their end times, so both queries are a
+couple of bisects plus a scan over the candidates. A subtitle shows from
+its start up to, but not including, its end; overlapping subtitles are
+all returned, in document order. Unsynced subtitles (no start or end
+time, or the unsynced placeholder time) never show up on time queries.
+
+For playback, where times only move forward a frame at a time, a
+PlaybackCursor keeps track of the active subtitles as it goes.
+
+slice() returns a SubtitleSlice, a view of the subtitles in a time
+window that reads straight from the original set.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from babelsubs import markup
+from babelsubs.utils import UNSYNCED_TIME_FULL
+
+
+def is_synced_time(ms):
+    return ms is not None and ms < UNSYNCED_TIME_FULL
+
+
+class TimeIndex(object):
+
+    def __init__(self, starts, ends):
+        """
+        starts and ends are the times of each subtitle, in document order,
+        None when unsynced.
+        """
+        order = [i for i, (start, end) in enumerate(zip(starts, ends))
+                 if is_synced_time(start) and is_synced_time(end)]
+        # sort is stable, so subtitles starting together keep their order
+        order.sort(key=starts.__getitem__)
+        self.order = order
+        self.starts = [starts[i] for i in order]
+        self.ends = [ends[i] for i in order]
+        self.max_ends = []
+        max_end = None
+        for end in self.ends:
+            if max_end is None or end > max_end:
+                max_end = end
+            self.max_ends.append(max_end)
+
+    def __len__(self):
+        return len(self.order)
+
+    def at(self, ms):
+        """Positions of the subtitles showing at ms."""
+        # only those that started by ms, and nothing before the first one
+        # whose end (or any earlier end) is past ms can still be showing
+        hi = bisect_right(self.starts, ms)
+        lo = bisect_right(self.max_ends, ms, 0, hi)
+        ends = self.ends
+        return sorted(self.order[i] for i in xrange(lo, hi) if ends[i] > ms)
+
+    def between(self, start_ms, end_ms):
+        """
+        Positions of the subtitles showing at some point in
+        [start_ms, end_ms). Zero length subtitles count if they start in
+        that range.
+        """
+        if end_ms <= start_ms:
+            return []
+        hi = bisect_left(self.starts, end_ms)
+        lo = bisect_right(self.max_ends, start_ms, 0, hi)
+        starts, ends = self.starts, self.ends
+        # for zero length ones, max_ends is not enough to skip them
+        lo = min(lo, bisect_left(starts, start_ms, 0, hi))
+        return sorted(self.order[i] for i in xrange(lo, hi)
+                      if ends[i] > start_ms or starts[i] >= start_ms)
+
+    def cursor(self):
+        return PlaybackCursor(self)
+
+
+class PlaybackCursor(object):
+    """
+    Follows playback through a TimeIndex. Moving forward costs only the
+    subtitles that start or end on the way, so stepping frame by frame is
+    O(1) amortized. Moving backwards is allowed, it just looks everything
+    up again.
+
+    If items are given, seek returns those instead of positions.
+    """
+
+    def __init__(self, index, items=None):
+        self.index = index
+        self.items = items
+        self.time = None
+        # next subtitle (in start order) that hasn't started yet
+        self._next = 0
+        # start order indexes of the subtitles that started and haven't ended
+        self._active = []
+
+    def seek(self, ms):
+        """Moves to ms and returns the subtitles showing."""
+        index = self.index
+        if self.time is None or ms < self.time:
+            self._next = bisect_right(index.starts, ms)
+            lo = bisect_right(index.max_ends, ms, 0, self._next)
+            self._active = [i for i in xrange(lo, self._next)
+                            if index.ends[i] > ms]
+        else:
+            starts, ends = index.starts, index.ends
+            active = [i for i in self._active if ends[i] > ms]
+            while self._next < len(starts) and starts[self._next] <= ms:
+                if ends[self._next] > ms:
+                    active.append(self._next)
+                self._next += 1
+            self._active = active
+        self.time = ms
+        positions = sorted(index.order[i] for i in self._active)
+        if self.items is not None:
+            return [self.items[i] for i in positions]
+        return positions
+
+
+class TimeQueries(object):
+    """
+    Adds time queries to a subtitle set, which must keep its _version
+    updated (see SubtitleSet._changed) and provide _get_items. The index is
+    built on the first query and again after any change.
+    """
+
+    _time_index = None
+
+    def time_index(self):
+        if self._time_index is None or self._time_index[0] != self._version:
+            items = self._get_items(None)
+            self._time_index = (self._version, TimeIndex(
+                [item.start_time for item in items],
+                [item.end_time for item in items]))
+        return self._time_index[1]
+
+    def at(self, ms):
+        """Returns the subtitle items showing at ms."""
+        items = self._get_items(None)
+        return [items[i] for i in self.time_index().at(ms)]
+
+    def between(self, start_ms, end_ms):
+        """Returns the subtitle items showing in [start_ms, end_ms)."""
+        items = self._get_items(None)
+        return [items[i] for i in self.time_index().between(start_ms, end_ms)]
+
+    def cursor(self):
+        """
+        Returns a PlaybackCursor over the subtitle items, call seek(ms) on
+        it as playback goes. It won't see changes made after it's created.
+        """
+        return PlaybackCursor(self.time_index(), self._get_items(None))
+
+    def slice(self, start_ms, end_ms, rebase=False):
+        """
+        Returns a SubtitleSlice with the subtitles showing in
+        [start_ms, end_ms), see between. If rebase is True their times are
+        made relative to start_ms (never going below zero).
+        """
+        return SubtitleSlice(self, self.time_index().between(start_ms, end_ms),
+                             start_ms if rebase else 0)
+
+
+class SubtitleSlice(TimeQueries):
+    """
+    A view of some of the subtitles of a set, in the same order. Nothing is
+    copied: items are taken from the set (and its cache) as needed, so it
+    can be given to any generator, or to_many, at little cost.
+
+    Changing the slice (update, append_subtitles, shift...) first copies its
+    subtitles to a new set of the same class, and from then on the slice
+    works on that copy, leaving the original set alone. Changing the
+    original set makes a slice that hasn't been copied invalid.
+    """
+
+    def __init__(self, subtitle_set, positions, offset=0):
+        self.subtitle_set = subtitle_set
+        self.language_code = subtitle_set.language_code
+        self._positions = positions
+        self._offset = offset
+        self._source_version = subtitle_set._version
+        # the class copies are made of, the original set's, even when
+        # slicing a slice
+        self._set_class = getattr(subtitle_set, '_set_class', subtitle_set.__class__)
+        self._items_cache = {}
+        self._copy = None
+
+    @property
+    def _version(self):
+        if self._copy is not None:
+            # never equal to the versions we had before copying
+            return (self._copy._version, )
+        return self._source_version
+
+    def _check_source(self):
+        if self.subtitle_set._version != self._source_version:
+            raise ValueError("The subtitle set changed after it was sliced")
+
+    def __len__(self):
+        if self._copy is not None:
+            return len(self._copy)
+        return len(self._positions)
+
+    def __nonzero__(self):
+        return bool(len(self))
+
+    def __getitem__(self, key):
+        return self._get_items(None)[key]
+
+    def __iter__(self):
+        return iter(self._get_items(None))
+
+    def subtitle_items(self, mappings=None):
+        return list(self._get_items(mappings))
+
+    def _get_items(self, mappings):
+        if self._copy is not None:
+            return self._copy._get_items(mappings)
+        self._check_source()
+        from babelsubs.items import mappings_key, NEW_PARAGRAPH_META_KEY
+        key = mappings_key(mappings)
+        if key not in self._items_cache:
+            items = self.subtitle_set._get_items(mappings)
+            items = [items[i] for i in self._positions]
+            if self._offset:
+                items = [item._replace(start_time=self._rebase(item.start_time),
+                                       end_time=self._rebase(item.end_time))
+                         for item in items]
+            if items and not items[0].meta.get(NEW_PARAGRAPH_META_KEY):
+                # like on any set, the first subtitle starts a paragraph
+                meta = dict(items[0].meta)
+                meta[NEW_PARAGRAPH_META_KEY] = True
+                items[0] = items[0]._replace(meta=meta)
+            self._items_cache[key] = items
+        return self._items_cache[key]
+
+    def _rebase(self, ms):
+        return max(0, ms - self._offset)
+
+    def _extract_cues(self, positions=None):
+        if self._copy is not None:
+            return self._copy._extract_cues(positions)
+        self._check_source()
+        if positions is not None:
+            positions = [self._positions[i] for i in positions]
+        else:
+            positions = self._positions
+        cues = self.subtitle_set._extract_cues(positions)
+        if self._offset:
+            cues = [(self._rebase(from_ms), self._rebase(to_ms), parsed, new_paragraph)
+                    for from_ms, to_ms, parsed, new_paragraph in cues]
+        if cues and positions is self._positions:
+            cues[0] = cues[0][:3] + (True, )
+        return cues
+
+    @property
+    def fully_synced(self):
+        if self._copy is not None:
+            return self._copy.fully_synced
+        # only synced subtitles are ever sliced
+        return True
+
+    def to_subtitle_set(self):
+        """Returns a new set, of the original set's class, with our subtitles."""
+        subs = self._set_class(self.language_code)
+        # the first one starts a paragraph without creating a <div>
+        subs.append_subtitles([
+            (from_ms, to_ms, markup.markup_to_content(parsed),
+             {'new_paragraph': new_paragraph and i > 0})
+            for i, (from_ms, to_ms, parsed, new_paragraph)
+            in enumerate(self._extract_cues())],
+            escape=False)
+        return subs
+
+    def _get_copy(self):
+        if self._copy is None:
+            self._copy = self.to_subtitle_set()
+            self._items_cache = {}
+        return self._copy
+
+    def to_xml(self):
+        if self._copy is not None:
+            return self._copy.to_xml()
+        return self.to_subtitle_set().to_xml()
+
+    def append_subtitle(self, *args, **kwargs):
+        self._get_copy().append_subtitle(*args, **kwargs)
+
+    def append_subtitles(self, *args, **kwargs):
+        self._get_copy().append_subtitles(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        self._get_copy().update(*args, **kwargs)
+
+    def shift(self, *args, **kwargs):
+        self._get_copy().shift(*args, **kwargs)
+
+    def scale(self, *args, **kwargs):
+        self._get_copy().scale(*args, **kwargs)
+
+    def remap(self, *args, **kwargs):
+        self._get_copy().remap(*args, **kwargs)
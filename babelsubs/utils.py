@@ -1,11 +1,10 @@
 import re
-import bleach
-import htmllib
 import htmlentitydefs
-import formatter
 
 from itertools import chain
 
+from babelsubs import stats
+
 DEFAULT_ALLOWED_TAGS = ['i', 'b', 'u']
 MULTIPLE_SPACES = re.compile('\s{2,}')
 BLANK_CHARS = re.compile('[\n\t\r]*')
@@ -17,6 +16,9 @@ UNSYNCED_TIME_FULL = (60 * 60 * 100 * 1000) - 1
 UNSYNCED_TIME_ONE_HOUR_DIGIT = (60 * 60 * 10 * 1000) - 10
 
 def unescape_html(s):
+    # htmllib is only needed here, and slow to import
+    import htmllib
+    import formatter
     p = htmllib.HTMLParser(formatter.NullFormatter() )
     # we need to preserve line breaks, nofill makes sure we don't
     # loose them
@@ -80,16 +82,264 @@ def generate_style_map(dom):
                 style_map['italic'].append(style_id)
     return style_map
 
+# the formatting elements, for which an HTML parser closes and reopens
+# misnested tags (see _FormattingStack); strip_tags handles those itself
+FORMATTING_TAGS = frozenset(['b', 'big', 'code', 'em', 'font', 'i', 's', 'small',
+                             'strike', 'strong', 'tt', 'u'])
+
+MARKUP_START = re.compile(u'[<&]')
+TAG_START = re.compile(u'<(/?)([a-zA-Z][^\t\n\f />]*)')
+# one attribute (or none) and the whitespace and slashes before it
+TAG_ATTRIBUTE = re.compile(u'[\t\n\f /]*(?:[^\t\n\f />][^\t\n\f /=>]*[\t\n\f ]*'
+                           u'(?:=[\t\n\f ]*(?:"[^"]*"?|\'[^\']*\'?|[^\t\n\f >]*))?)?')
+COMMENT_END = re.compile(u'--!?>')
+CHAR_REF = re.compile(u'&(?:#[xX]([0-9a-fA-F]+);?|#([0-9]+);?|([a-zA-Z][a-zA-Z0-9]*;?))')
+
+# the entities that are recognized without a trailing semicolon
+LEGACY_ENTITIES = dict((name, codepoint)
+                       for name, codepoint in htmlentitydefs.name2codepoint.items()
+                       if codepoint < 0x100)
+LEGACY_ENTITIES.update(AMP=0x26, COPY=0xa9, GT=0x3e, LT=0x3c, QUOT=0x22, REG=0xae)
+ENTITIES = dict(htmlentitydefs.name2codepoint, apos=0x27, **LEGACY_ENTITIES)
+LONGEST_LEGACY_ENTITY = max(len(name) for name in LEGACY_ENTITIES)
+
+
+def _windows_1252(codepoint):
+    try:
+        return chr(codepoint).decode('cp1252')
+    except UnicodeDecodeError:
+        return unichr(codepoint)
+
+# numeric references that don't mean what their number says
+REPLACEMENT_CHARACTERS = dict((codepoint, _windows_1252(codepoint))
+                              for codepoint in range(0x80, 0xa0))
+REPLACEMENT_CHARACTERS[0] = u'\ufffd'
+
+
+def _escape_text(text):
+    if u'\x00' in text:
+        text = text.replace(u'\x00', u'')
+    if u'>' in text:
+        text = text.replace(u'>', u'&gt;')
+    return text
+
+
+def _escape_char(char):
+    return char.replace(u'&', u'&amp;').replace(u'<', u'&lt;').replace(u'>', u'&gt;')
+
+
+def _char_from_codepoint(codepoint):
+    if codepoint in REPLACEMENT_CHARACTERS:
+        return REPLACEMENT_CHARACTERS[codepoint]
+    if 0xd800 <= codepoint <= 0xdfff or codepoint > 0x10ffff:
+        return u'\ufffd'
+    return unichr(codepoint)
+
+
+def _char_ref(match):
+    """
+    Returns (text, consumed) for a character reference match: the escaped
+    text it stands for and how much of the match that took. None if it
+    isn't a reference we know.
+    """
+    hex_digits, digits, name = match.groups()
+    if name is None:
+        codepoint = int(hex_digits, 16) if hex_digits else int(digits)
+        return _escape_char(_char_from_codepoint(codepoint)), len(match.group(0))
+    if name.endswith(u';') and name[:-1] in ENTITIES:
+        return _escape_char(unichr(ENTITIES[name[:-1]])), len(name) + 1
+    # &eacutex is &eacute; followed by x
+    for length in range(min(len(name), LONGEST_LEGACY_ENTITY), 1, -1):
+        if name[:length] in LEGACY_ENTITIES:
+            return _escape_char(unichr(LEGACY_ENTITIES[name[:length]])), length + 1
+    return None
+
+
+class _Element(object):
+
+    __slots__ = ['name']
+
+    def __init__(self, name):
+        self.name = name
+
+
+class _FormattingStack(object):
+    """
+    Balances formatting tags the way an HTML parser would: tags left
+    open are closed at the end, stray end tags are dropped and misnested
+    tags are closed and reopened (<b><i>x</b>y</i> is
+    <b><i>x</i></b><i>y</i>).
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.open = []
+        # tags to be reopened when text follows, the list of active
+        # formatting elements in the HTML spec
+        self.active = []
+
+    def _push(self, name):
+        element = _Element(name)
+        self.open.append(element)
+        self.output.append(u'<%s>' % name)
+        return element
+
+    def _pop_until(self, element):
+        while True:
+            popped = self.open.pop()
+            self.output.append(u'</%s>' % popped.name)
+            if popped is element:
+                return
+
+    def reopen(self):
+        if not self.active or self.active[-1] in self.open:
+            return
+        start = len(self.active) - 1
+        while start > 0 and self.active[start - 1] not in self.open:
+            start -= 1
+        for i in range(start, len(self.active)):
+            self.active[i] = self._push(self.active[i].name)
+
+    def start(self, name):
+        self.reopen()
+        same = [element for element in self.active if element.name == name]
+        if len(same) >= 3:
+            self.active.remove(same[0])
+        self.active.append(self._push(name))
+
+    def end(self, name):
+        for element in reversed(self.active):
+            if element.name == name:
+                if element in self.open:
+                    self._pop_until(element)
+                self.active.remove(element)
+                return
+        for element in reversed(self.open):
+            if element.name == name:
+                self._pop_until(element)
+                return
+
+    def close(self):
+        while self.open:
+            self.output.append(u'</%s>' % self.open.pop().name)
+
+
+def _tag_end(text, pos):
+    """
+    Returns the position after the '>' closing the tag whose attributes
+    start at pos, None if it isn't closed.
+    """
+    length = len(text)
+    while pos < length:
+        if text[pos] == u'>':
+            return pos + 1
+        pos = TAG_ATTRIBUTE.match(text, pos).end()
+    return None
+
+
+def _markup_end(text, pos):
+    """
+    Returns the position after the comment, doctype or other markup that
+    isn't a tag starting at pos ('<!' or '<?'), len(text) if it isn't
+    closed.
+    """
+    if text.startswith(u'<!--', pos):
+        if text.startswith(u'>', pos + 4):
+            return pos + 5
+        if text.startswith(u'->', pos + 4):
+            return pos + 6
+        match = COMMENT_END.search(text, pos + 4)
+        return match.end() if match else len(text)
+    end = text.find(u'>', pos + 2)
+    return end + 1 if end != -1 else len(text)
+
+
+def _sanitize(text, tags):
+    output = []
+    stack = _FormattingStack(output)
+    length = len(text)
+    pos = 0
+    while pos < length:
+        match = MARKUP_START.search(text, pos)
+        end = match.start() if match else length
+        if end > pos:
+            chunk = _escape_text(text[pos:end])
+            if chunk:
+                stack.reopen()
+                output.append(chunk)
+        if not match:
+            break
+        pos = end
+        if text[pos] == u'&':
+            ref = CHAR_REF.match(text, pos)
+            ref = ref and _char_ref(ref)
+            stack.reopen()
+            if ref is None:
+                output.append(u'&amp;')
+                pos += 1
+            else:
+                output.append(ref[0])
+                pos += ref[1]
+            continue
+        tag = TAG_START.match(text, pos)
+        if tag:
+            tag_end = _tag_end(text, tag.end())
+            if tag_end is None:
+                # the unclosed tag swallows the rest
+                break
+            name = tag.group(2).lower()
+            if name in tags:
+                if tag.group(1):
+                    stack.end(name)
+                else:
+                    stack.start(name)
+            pos = tag_end
+        elif text.startswith(u'</', pos):
+            if pos + 2 == length:
+                stack.reopen()
+                output.append(u'&lt;/')
+                break
+            pos = _markup_end(text, pos)
+        elif text.startswith(u'<!', pos) or text.startswith(u'<?', pos):
+            pos = _markup_end(text, pos)
+        else:
+            stack.reopen()
+            output.append(u'&lt;')
+            pos += 1
+    stack.close()
+    return u''.join(output)
+
+
+@stats.timed('strip_tags')
 def strip_tags(text, tags=None):
     """
     Returns text with the tags stripped.
     By default we allow the standard formatting tags
     to pass (i,b,u).
     Any other tag's content will be present, but with tags removed.
+
+    The output is what bleach.clean(text, tags=tags, strip=True) gives:
+    comments go away, the tags we keep lose their attributes and are
+    balanced, and the text is escaped. Named references other than the
+    HTML 4 ones are left as text.
     """
     if tags is None:
         tags = DEFAULT_ALLOWED_TAGS
-    return bleach.clean(text, tags=tags, strip=True)
+    if not FORMATTING_TAGS.issuperset(tags):
+        # other elements change how the tags around them nest, leave those
+        # to bleach (importing it, and html5lib, takes longer than most
+        # conversions)
+        import bleach
+        return bleach.clean(text, tags=tags, strip=True)
+    if not text:
+        return u''
+    if isinstance(text, str):
+        text = text.decode('utf-8')
+    if u'\r' in text:
+        text = text.replace(u'\r\n', u'\n').replace(u'\r', u'\n')
+    if u'<' not in text and u'&' not in text:
+        return _escape_text(text)
+    return _sanitize(text, frozenset(tags))
 
 
 def escape_ampersands(text):
@@ -0,0 +1,10 @@
+"""
+Benchmarks for babelsubs, on synthetic corpora of every format.
+
+    python -m benchmarks -o results.json
+    python -m benchmarks --sizes 10,1000 --formats srt,dfxp --baseline results.json
+
+Results are written as json. With --baseline the run is compared against
+a saved one and the exit status is 1 if anything regressed past the
+thresholds. See runner for what's measured.
+"""
@@ -0,0 +1,69 @@
+import sys
+import argparse
+
+from benchmarks import corpus, runner
+
+
+def _list(value, type=str):
+    return [type(v) for v in value.split(',') if v]
+
+
+def get_argument_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmarks babelsubs.")
+    parser.add_argument('--operations', type=_list,
+                        help="comma separated, from %s" % ','.join(runner.OPERATIONS))
+    parser.add_argument('--formats', type=_list,
+                        help="comma separated, from %s,set" % ','.join(corpus.FORMATS))
+    parser.add_argument('--sizes', type=lambda v: _list(v, int),
+                        help="comma separated cue counts, %s by default" %
+                             ','.join(str(s) for s in corpus.SIZES))
+    parser.add_argument('--variants', type=_list,
+                        help="comma separated, from %s" % ','.join(corpus.VARIANTS))
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help="don't measure peak memory")
+    parser.add_argument('-o', '--output', help="write the results to this json file")
+    parser.add_argument('-b', '--baseline', help="compare against this results file")
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help="slowdown that counts as a regression (0.2 is 20%%)")
+    parser.add_argument('--memory-threshold', type=float)
+    return parser
+
+
+def main(argv=None):
+    args = get_argument_parser().parse_args(argv)
+    benchmarks = runner.get_benchmarks(args.operations, args.formats, args.sizes,
+                                       args.variants)
+
+    def progress(result):
+        if result['error']:
+            sys.stdout.write("%-40s FAILED %s\n" % (result['name'], result['error']))
+            return
+        if result['operation'] == 'import':
+            sys.stdout.write("%-40s %10.4fs %d modules\n" % (
+                result['name'], result['seconds'], result['modules']))
+            return
+        sys.stdout.write("%-40s %10.4fs %12.0f cues/s %8.2f MB/s %s\n" % (
+            result['name'], result['seconds'], result['cues_per_second'] or 0,
+            result['mb_per_second'] or 0,
+            '%s KB' % result['peak_memory_kb']
+            if result['peak_memory_kb'] is not None else '-'))
+        sys.stdout.flush()
+
+    document = runner.run_all(benchmarks, args.repeat, args.memory, progress,
+                              not args.operations or 'import' in args.operations)
+    if args.output:
+        runner.save(document, args.output)
+    if args.baseline:
+        regressions = runner.compare(runner.load(args.baseline), document,
+                                     args.threshold, args.memory_threshold)
+        for name, metric, before, after in regressions:
+            sys.stdout.write("REGRESSION %s %s: %s -> %s\n" % (name, metric, before, after))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
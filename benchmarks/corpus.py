@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic subtitle corpora.
+
+A corpus is built as a SubtitleSet of n cues and then written out with
+babelsubs' own generators, so every format gets the same subtitles. The
+variants are:
+
+    plain      one or two lines of ascii text
+    markup     bold, italic and underline spans and line breaks
+    unsynced   every tenth cue has no times
+    crlf       plain, with \\r\\n line endings
+    unicode    non-ascii text (accents, cjk, rtl)
+    malformed  plain srt or sbv, as hand edited files come: some cues
+               without the empty line after them, stray BOMs, and text
+               lines that look like cue numbers
+"""
+
+import random
+
+from babelsubs import to
+from babelsubs.storage import SubtitleSet
+
+FORMATS = ['srt', 'sbv', 'ssa', 'txt', 'json', 'youtube', 'dfxp']
+VARIANTS = ['plain', 'markup', 'unsynced', 'crlf', 'unicode', 'malformed']
+# the formats malformed applies to
+MALFORMED_FORMATS = ['srt', 'sbv']
+SIZES = [10, 1000, 100000]
+
+WORDS = ("the quick brown fox jumps over a lazy dog while we watch "
+         "subtitles scroll by on screen at night").split()
+UNICODE_WORDS = [u'caf\xe9', u'na\xefve', u'日本語', u'عربي',
+                 u'русский', u'stra\xdfe', u'—', u'♪']
+STYLES = ['fontWeight="bold"', 'fontStyle="italic"', 'textDecoration="underline"']
+
+CUE_LENGTH = 2500
+CUE_GAP = 500
+
+
+def _line(rand, words):
+    return u' '.join(rand.choice(words) for _ in xrange(rand.randint(3, 8)))
+
+
+def _content(rand, variant):
+    """Returns a cue's markup, as append_subtitles takes it with escape=False."""
+    words = UNICODE_WORDS + WORDS if variant == 'unicode' else WORDS
+    lines = [_line(rand, words) for _ in xrange(rand.randint(1, 2))]
+    if variant == 'markup':
+        words = lines[0].split(u' ')
+        i = rand.randrange(len(words))
+        words[i] = u'<span %s>%s</span>' % (rand.choice(STYLES), words[i])
+        lines[0] = u' '.join(words)
+    return u'<br/>'.join(lines)
+
+
+def build_set(size, variant='plain', seed=0):
+    """Returns a SubtitleSet with size cues of the given variant."""
+    rand = random.Random(seed)
+    subtitles = []
+    for i in xrange(size):
+        # 0 ms reads as unsynced on some formats, start at 1s
+        start = 1000 + i * (CUE_LENGTH + CUE_GAP)
+        end = start + CUE_LENGTH
+        if variant == 'unsynced' and i % 10 == 9:
+            start = end = None
+        subtitles.append((start, end, _content(rand, variant),
+                          {'new_paragraph': i % 20 == 0}))
+    return SubtitleSet.from_list('en', subtitles, escape=False)
+
+
+def _youtube(subs):
+    from xml.sax.saxutils import escape
+    lines = [u'<?xml version="1.0" encoding="utf-8"?>', u'<transcript>']
+    for item in subs.subtitle_items():
+        if item.start_time is None:
+            continue
+        lines.append(u'    <text start="%.3f" dur="%.3f">%s</text>' % (
+            item.start_time / 1000.0, (item.end_time - item.start_time) / 1000.0,
+            escape(item.text)))
+    lines.append(u'</transcript>')
+    return u'\n'.join(lines)
+
+
+def _malformed(text):
+    """Damages the cues of a srt or sbv text, see VARIANTS."""
+    cues = text.rstrip(u'\n').split(u'\n\n')
+    for i in xrange(0, len(cues), 7):
+        cues[i] = u'\ufeff' + cues[i]
+    for i in xrange(3, len(cues), 5):
+        cues[i] += u'\n%d' % i
+    # every third cue runs into the next one
+    return u''.join(cue + (u'\n' if i % 3 == 2 else u'\n\n')
+                    for i, cue in enumerate(cues))
+
+
+def render(subs, format, variant='plain'):
+    """Returns the subtitles in subs as a unicode string on format."""
+    if format == 'youtube':
+        text = _youtube(subs)
+    else:
+        text = to(subs, format)
+    # some generators use \r\n already, so normalize first
+    text = text.replace(u'\r\n', u'\n')
+    if variant == 'malformed' and format in MALFORMED_FORMATS:
+        text = _malformed(text)
+    if variant == 'crlf':
+        text = text.replace(u'\n', u'\r\n')
+    return text
+
+
+def build(format, size, variant='plain', seed=0):
+    """Returns (SubtitleSet, text) for a corpus."""
+    subs = build_set(size, 'plain' if variant in ('crlf', 'malformed') else variant,
+                     seed)
+    return subs, render(subs, format, variant)
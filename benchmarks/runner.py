@@ -0,0 +1,321 @@
+"""
+Runs the benchmarks and compares results.
+
+Each benchmark is an (operation, format, size, variant) and is timed
+repeat times, keeping the best run. The operations are:
+
+    parse      load_from(text, format).to_internal()
+    generate   to(subtitle_set, format)
+    roundtrip  convert(text, format, format)
+    diff       diff() against a copy with every tenth cue retimed
+    update     update() on up to a thousand cues, then subtitle_items()
+    import     `import babelsubs` on a new interpreter
+
+diff and update don't depend on the format, so they run once per size
+and variant, under the 'set' format. There's no youtube generator, so
+youtube is only parsed, and so is the malformed variant, on srt and sbv
+only. import runs once, as import/babelsubs, and fails if it loads any of
+HEAVY_MODULES.
+
+Peak memory is taken with tracemalloc when there is one. Otherwise each
+benchmark runs once more on a forked process, and its peak is how much
+the maximum resident size grew there, which is coarser but comparable
+between runs on the same machine.
+"""
+
+import os
+import gc
+import sys
+import time
+import json
+import platform
+import subprocess
+
+import babelsubs
+from babelsubs.storage import SubtitleSet, diff
+
+from benchmarks import corpus
+
+OPERATIONS = ['parse', 'generate', 'roundtrip', 'diff', 'update', 'import']
+SET_OPERATIONS = ['diff', 'update']
+UPDATES = 1000
+# only the formats that need them should import these
+HEAVY_MODULES = ['lxml', 'bleach', 'html5lib', 'htmllib', 'difflib',
+                 'multiprocessing', 'sqlite3']
+
+IMPORT_SCRIPT = '''
+import sys, time, json
+started = time.time()
+import babelsubs
+elapsed = time.time() - started
+print(json.dumps([elapsed, sorted(set(
+    name.split('.')[0] for name, module in sys.modules.items() if module))]))
+'''
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def _retimed(subs):
+    items = [(item.start_time, item.end_time, item.text,
+              {'new_paragraph': item.meta.get('new_paragraph', False)})
+             for item in subs.subtitle_items()]
+    for i in xrange(9, len(items), 10):
+        start, end, text, meta = items[i]
+        if start is not None:
+            items[i] = (start + 100, end + 100, text, meta)
+    return SubtitleSet.from_list(subs.language_code, items, escape=True)
+
+
+class Benchmark(object):
+
+    def __init__(self, operation, format, size, variant):
+        self.operation = operation
+        self.format = format
+        self.size = size
+        self.variant = variant
+
+    @property
+    def name(self):
+        return '%s/%s/%s/%s' % (self.operation, self.format, self.size, self.variant)
+
+    def is_valid(self):
+        if self.variant == 'malformed':
+            return (self.operation == 'parse' and
+                    self.format in corpus.MALFORMED_FORMATS)
+        if self.operation in SET_OPERATIONS:
+            return self.format == 'set'
+        if self.format == 'set':
+            return False
+        if self.format == 'youtube':
+            return self.operation == 'parse' and self.variant != 'unsynced'
+        return True
+
+    def prepare(self):
+        """
+        Builds the corpus and returns (setup, run): each run is
+        run(setup()), only run is timed.
+        """
+        subs, text = corpus.build('dfxp' if self.format == 'set' else self.format,
+                                  self.size, self.variant)
+        self.bytes = len(text.encode('utf-8'))
+        no_setup = lambda: None
+        format = self.format
+
+        if self.operation == 'parse':
+            return no_setup, lambda _: babelsubs.load_from(text, format).to_internal()
+        elif self.operation == 'generate':
+            return no_setup, lambda _: babelsubs.to(subs, format)
+        elif self.operation == 'roundtrip':
+            return no_setup, lambda _: babelsubs.convert(text, format, format)
+        elif self.operation == 'diff':
+            other = _retimed(subs)
+            return no_setup, lambda _: diff(subs, other)
+        elif self.operation == 'update':
+            xml = subs.to_xml()
+            step = max(1, self.size // UPDATES)
+
+            def run(fresh):
+                for i in xrange(0, len(fresh), step):
+                    fresh.update(i, 1000 + i, 2000 + i)
+                fresh.subtitle_items()
+            return lambda: SubtitleSet('en', xml), run
+        raise ValueError("Unknown operation: %s" % self.operation)
+
+
+def _time(setup, run, repeat):
+    best = None
+    for _ in xrange(repeat):
+        arg = setup()
+        gc.collect()
+        started = time.time()
+        run(arg)
+        elapsed = time.time() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _max_rss_kb():
+    import resource
+    # kilobytes on linux, bytes on osx
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _peak_memory_kb(setup, run):
+    if tracemalloc is not None:
+        arg = setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(arg)
+            return tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        peak = -1
+        try:
+            arg = setup()
+            gc.collect()
+            before = _max_rss_kb()
+            run(arg)
+            peak = _max_rss_kb() - before
+        finally:
+            os.write(write_fd, str(peak))
+            os._exit(0)
+    os.close(write_fd)
+    try:
+        peak = int(os.read(read_fd, 64) or -1)
+    finally:
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+    return peak if peak >= 0 else None
+
+
+def run_benchmark(benchmark, repeat=3, memory=True):
+    """
+    Returns the result dict for benchmark. If it fails, the error is kept
+    on the result and its measures are None.
+    """
+    result = {
+        'name': benchmark.name,
+        'operation': benchmark.operation,
+        'format': benchmark.format,
+        'size': benchmark.size,
+        'variant': benchmark.variant,
+        'bytes': None,
+        'seconds': None,
+        'cues_per_second': None,
+        'mb_per_second': None,
+        'peak_memory_kb': None,
+        'error': None,
+    }
+    try:
+        setup, run = benchmark.prepare()
+        seconds = _time(setup, run, repeat)
+        peak_memory_kb = _peak_memory_kb(setup, run) if memory else None
+    except Exception as e:
+        result['error'] = repr(e)
+        return result
+    result.update({
+        'bytes': benchmark.bytes,
+        'seconds': seconds,
+        'cues_per_second': benchmark.size / seconds if seconds else None,
+        'mb_per_second': benchmark.bytes / seconds / 1024 / 1024 if seconds else None,
+        'peak_memory_kb': peak_memory_kb,
+    })
+    return result
+
+
+def run_import_benchmark(repeat=3):
+    """
+    Returns the result dict for importing babelsubs, each time on a new
+    interpreter.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best = modules = None
+    for _ in xrange(repeat):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT],
+                                         cwd=root)
+        seconds, modules = json.loads(output)
+        best = seconds if best is None else min(best, seconds)
+    heavy = [name for name in HEAVY_MODULES if name in modules]
+    return {
+        'name': 'import/babelsubs',
+        'operation': 'import',
+        'seconds': best,
+        'modules': len(modules),
+        'heavy_modules': heavy,
+        'error': 'imported %s' % ', '.join(heavy) if heavy else None,
+    }
+
+
+def get_benchmarks(operations=None, formats=None, sizes=None, variants=None):
+    formats = formats or corpus.FORMATS + ['set']
+    for operation in operations or OPERATIONS:
+        if operation == 'import':
+            continue
+        for format in formats:
+            for size in sizes or corpus.SIZES:
+                for variant in variants or corpus.VARIANTS:
+                    benchmark = Benchmark(operation, format, size, variant)
+                    if benchmark.is_valid():
+                        yield benchmark
+
+
+def run_all(benchmarks, repeat=3, memory=True, progress=None, imports=True):
+    """
+    Runs benchmarks (and the import one, if imports) and returns the
+    results document, ready for json.
+    """
+    results = []
+    if imports:
+        result = run_import_benchmark(repeat)
+        if progress:
+            progress(result)
+        results.append(result)
+    for benchmark in benchmarks:
+        result = run_benchmark(benchmark, repeat, memory)
+        if progress:
+            progress(result)
+        results.append(result)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'memory': 'tracemalloc' if tracemalloc else 'maxrss',
+            'repeat': repeat,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def save(document, path):
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.2, memory_threshold=None, min_seconds=0.001):
+    """
+    Returns the regressions of current against baseline, as a list of
+    (name, metric, baseline value, current value). A benchmark regresses
+    when it's more than threshold (a fraction) slower, or uses more than
+    memory_threshold (threshold by default) and over a megabyte more peak
+    memory. Timings under min_seconds on both runs are too noisy to compare.
+    """
+    if memory_threshold is None:
+        memory_threshold = threshold
+    before = dict((result['name'], result) for result in baseline['results'])
+    regressions = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None or old['seconds'] is None:
+            continue
+        if result.get('error') and not old.get('error'):
+            regressions.append((result['name'], 'error', None, result['error']))
+            continue
+        if result['seconds'] is None:
+            continue
+        if (max(old['seconds'], result['seconds']) >= min_seconds and
+                result['seconds'] > old['seconds'] * (1 + threshold)):
+            regressions.append((result['name'], 'seconds', old['seconds'],
+                                result['seconds']))
+        old_memory, memory = old.get('peak_memory_kb'), result.get('peak_memory_kb')
+        if (old_memory is not None and memory is not None and
+                memory > old_memory * (1 + memory_threshold) and memory - old_memory > 1024):
+            regressions.append((result['name'], 'peak_memory_kb', old_memory, memory))
+    return regressions
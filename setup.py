@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from distutils.core import setup
+from setuptools import setup
 
 
 setup(
@@ -11,7 +11,7 @@ setup(
     author_email="dev+babel@pculture.org",
     url="https://github.com/pculture/babelsubs",
     license='LICENSE.txt',
-    packages=['babelsubs'],
+    packages=['babelsubs', 'babelsubs.parsers', 'babelsubs.generators'],
     setup_requires=[],
     install_requires=[
         'lxml==2.3',
@@ -20,6 +20,11 @@ setup(
     ],
     dependency_links=[
         'https://github.com/jsocol/bleachmastertarball/master#egg=bleach-dev'
-    ]
+    ],
+    entry_points={
+        'console_scripts': [
+            'babelsubs = babelsubs.cli:main',
+        ],
+    },
 
 )